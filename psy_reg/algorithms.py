@@ -0,0 +1,2984 @@
+"""Vectorized algorithms for psy-reg
+
+This module defines numerical engines that are used by the formatoptions in
+:mod:`psy_reg.plotters` to avoid expensive python loops, e.g. when
+estimating a confidence interval through bootstrapping."""
+
+# SPDX-FileCopyrightText: 2021-2024 Helmholtz-Zentrum hereon GmbH
+# SPDX-FileCopyrightText: 2020-2021 Helmholtz-Zentrum Geesthacht
+# SPDX-FileCopyrightText: 2016-2024 University of Lausanne
+#
+# SPDX-License-Identifier: LGPL-3.0-only
+
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+import numpy as np
+from psyplot import rcParams
+from scipy import stats
+from scipy.optimize import minimize_scalar
+from scipy.special import comb
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+try:
+    from scipy.interpolate import make_smoothing_spline
+except ImportError:  # scipy < 1.10
+    make_smoothing_spline = None
+    SPLINE_BATCHES = False
+else:
+    #: True, if :func:`scipy.interpolate.make_smoothing_spline` accepts the
+    #: y-data of several splines at once (which came with its `axis`)
+    SPLINE_BATCHES = (
+        "axis" in inspect.signature(make_smoothing_spline).parameters
+    )
+
+
+def is_dask_array(arr):
+    """Check whether an array is a dask array (without importing dask)"""
+    return type(arr).__module__.split(".")[0] == "dask" and hasattr(
+        arr, "to_delayed"
+    )
+
+
+def _compute_blocks(func, x, y, *args):
+    """Apply a function to the corresponding blocks of two dask arrays
+
+    The blocks are processed in parallel with the current dask scheduler and
+    the list of results is returned."""
+    import dask
+    import dask.array as dsa
+
+    x, y = dsa.asarray(x), dsa.asarray(y)
+    if x.chunks != y.chunks:
+        y = y.rechunk(x.chunks)
+    func = dask.delayed(func, pure=True)
+    return dask.compute(
+        *(
+            func(xb, yb, *args)
+            for xb, yb in zip(x.to_delayed().ravel(), y.to_delayed().ravel())
+        )
+    )
+
+
+def get_random_state(random_seed=None):
+    """Get the random state for the bootstrap algorithm
+
+    Parameters
+    ----------
+    random_seed: int
+        The seed for the :class:`numpy.random.RandomState`. If None, the
+        ``'plotter.linreg.bootstrap.random_seed'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is used
+
+    Returns
+    -------
+    numpy.random.RandomState
+        The random state that is used to draw the resamples"""
+    return np.random.RandomState(
+        random_seed
+        if random_seed is not None
+        else rcParams["plotter.linreg.bootstrap.random_seed"]
+    )
+
+
+def get_block_size(n, n_boot, ncopies=1, max_memory=None):
+    """Get the number of resamples that can be processed at once
+
+    Parameters
+    ----------
+    n: int
+        The number of data points in one resample
+    n_boot: int
+        The total number of resamples
+    ncopies: int
+        The number of arrays of shape ``(block_size, n)`` and 8 bytes per
+        item that are held in memory at the same time
+    max_memory: float
+        The memory budget in megabytes. If None, the
+        ``'plotter.linreg.bootstrap.max_memory'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is used
+
+    Returns
+    -------
+    int
+        The number of resamples per block (at least 1)"""
+    if max_memory is None:
+        max_memory = rcParams["plotter.linreg.bootstrap.max_memory"]
+    per_resample = max(n, 1) * 8 * ncopies
+    return int(max(1, min(n_boot, max_memory * 2**20 // per_resample)))
+
+
+def iter_resamples(n, n_boot, random_state, block_size):
+    """Iterate over blocks of bootstrap resample indices
+
+    The indices are drawn in the same order as by the
+    :func:`psy_reg.plotters.bootstrap` function, i.e. the concatenation of
+    all blocks equals ``n_boot`` successive calls of
+    ``random_state.randint(0, n, n)``.
+
+    Parameters
+    ----------
+    n: int
+        The number of data points
+    n_boot: int
+        The number of resamples
+    random_state: numpy.random.RandomState
+        The random state to draw the resamples
+    block_size: int
+        The maximum number of resamples per block (see
+        :func:`get_block_size`)
+
+    Yields
+    ------
+    np.ndarray of shape ``(m, n)``
+        The indices of the ``m <= block_size`` next resamples"""
+    for start in range(0, int(n_boot), block_size):
+        size = min(block_size, int(n_boot) - start)
+        yield random_state.randint(0, n, (size, n))
+
+
+def iter_multinomial(weights, n_boot, random_state, block_size):
+    """Iterate over blocks of bootstrap resample counts of weighted points
+
+    This is the equivalent of :func:`iter_resamples` for data that has been
+    compressed into weighted points (e.g. the cells of a histogram). Each
+    resample draws the total number of data points from the multinomial
+    distribution of the `weights`.
+
+    Parameters
+    ----------
+    weights: np.ndarray
+        The number of data points that each point represents
+    n_boot: int
+        The number of resamples
+    random_state: numpy.random.RandomState
+        The random state to draw the resamples
+    block_size: int
+        The maximum number of resamples per block (see
+        :func:`get_block_size`)
+
+    Yields
+    ------
+    np.ndarray of shape ``(m, len(weights))``
+        How often each point is drawn in the ``m <= block_size`` next
+        resamples"""
+    weights = np.asarray(weights, dtype=float)
+    total = weights.sum()
+    pvals = weights / total
+    for start in range(0, int(n_boot), block_size):
+        size = min(block_size, int(n_boot) - start)
+        yield random_state.multinomial(int(round(total)), pvals, size)
+
+
+def linear_bootstrap(
+    x, y, n_boot, fix=None, random_seed=None, max_memory=None, weights=None
+):
+    """Bootstrap the intercept and slope of a linear fit
+
+    This function draws the same resamples as the
+    :func:`psy_reg.plotters.bootstrap` function but computes the ordinary
+    least squares solution of all resamples at once from (weighted) sums
+    instead of fitting one model per resample. Several arrays of the same
+    length can be bootstrapped at once by passing 2D `x` and `y`, in which
+    case every array is resampled with the same indices.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data of shape ``(n, )`` or ``(m, n)`` for ``m`` arrays
+    y: np.ndarray
+        The y-data with the same shape as `x`
+    n_boot: int
+        The number of resamples
+    fix: list of float
+        The fix point ``(x', y')`` that the fit has to go through (see the
+        :attr:`~psy_reg.plotters.LinRegPlotter.fix` formatoption). For 2D
+        data, this may also be an array of shape ``(m, 2)``
+    random_seed: int
+        The seed for the random number generator (see
+        :func:`get_random_state`)
+    max_memory: float
+        The memory budget in megabytes (see :func:`get_block_size`)
+    weights: np.ndarray
+        The number of data points that each point of 1D data represents
+        (e.g. the counts of the cells of a histogram). If given, the
+        resamples are drawn from the multinomial distribution of the weights
+        (see :func:`iter_multinomial`)
+
+    Returns
+    -------
+    np.ndarray
+        The intercepts of the ``n_boot`` resamples (with shape
+        ``(m, n_boot)`` for 2D data)
+    np.ndarray
+        The slopes of the ``n_boot`` resamples (with shape ``(m, n_boot)``
+        for 2D data)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if weights is not None:
+        return _weighted_linear_bootstrap(
+            x, y, n_boot, weights, fix, random_seed, max_memory
+        )
+    batched = x.ndim == 2
+    x = np.atleast_2d(x)
+    y = np.atleast_2d(y)
+    m, n = x.shape
+    # shift the data for numerical stability. This is either the fix point
+    # or the center of the data
+    if fix is not None:
+        fix = np.broadcast_to(np.asarray(fix, dtype=float), (m, 2))
+        x0, y0 = fix[:, :1], fix[:, 1:]
+    else:
+        x0, y0 = x.mean(axis=1, keepdims=True), y.mean(axis=1, keepdims=True)
+    x = x - x0
+    y = y - y0
+    n_boot = int(n_boot)
+    intercepts = np.empty((m, n_boot))
+    slopes = np.empty((m, n_boot))
+    # we hold the indices and the resampled x and y at the same time
+    block_size = get_block_size(n * m, n_boot, 3, max_memory)
+    start = 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for indices in iter_resamples(
+            n, n_boot, get_random_state(random_seed), block_size
+        ):
+            end = start + len(indices)
+            xs = x[:, indices]
+            ys = y[:, indices]
+            sxx = np.einsum("kij,kij->ki", xs, xs)
+            sxy = np.einsum("kij,kij->ki", xs, ys)
+            if fix is None:
+                mx = xs.mean(axis=2)
+                my = ys.mean(axis=2)
+                slope = (sxy - n * mx * my) / (sxx - n * mx * mx)
+                intercept = my - slope * mx
+            else:
+                slope = sxy / sxx
+                intercept = 0
+            slopes[:, start:end] = slope
+            intercepts[:, start:end] = intercept + y0 - slope * x0
+            start = end
+    if not batched:
+        return intercepts[0], slopes[0]
+    return intercepts, slopes
+
+
+def _weighted_linear_bootstrap(
+    x, y, n_boot, weights, fix, random_seed, max_memory
+):
+    """Bootstrap a linear fit of weighted points (see linear_bootstrap)"""
+    weights = np.asarray(weights, dtype=float)
+    if fix is not None:
+        x0, y0 = fix
+    else:
+        x0 = np.average(x, weights=weights)
+        y0 = np.average(y, weights=weights)
+    x = x - x0
+    y = y - y0
+    n_boot = int(n_boot)
+    intercepts = np.empty(n_boot)
+    slopes = np.empty(n_boot)
+    # we hold the counts and their products with x and y at the same time
+    block_size = get_block_size(len(x), n_boot, 3, max_memory)
+    start = 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for counts in iter_multinomial(
+            weights, n_boot, get_random_state(random_seed), block_size
+        ):
+            end = start + len(counts)
+            n = counts.sum(axis=1)
+            sxx = counts.dot(x * x)
+            sxy = counts.dot(x * y)
+            if fix is None:
+                mx = counts.dot(x) / n
+                my = counts.dot(y) / n
+                slope = (sxy - n * mx * my) / (sxx - n * mx * mx)
+                intercept = my - slope * mx
+            else:
+                slope = sxy / sxx
+                intercept = 0
+            slopes[start:end] = slope
+            intercepts[start:end] = intercept + y0 - slope * x0
+            start = end
+    return intercepts, slopes
+
+
+@contextmanager
+def limit_blas_threads(limit=1):
+    """Limit the number of threads of the BLAS libraries
+
+    This context manager uses the optional :mod:`threadpoolctl` package to
+    avoid an oversubscription of the CPUs by the workers of the
+    :func:`parallel_bootstrap`. If :mod:`threadpoolctl` is not installed, it
+    does nothing.
+
+    Notes
+    -----
+    The limits apply to the entire process. They must therefore be set
+    around a pool of threads rather than within its workers, as
+    concurrent workers would otherwise restore the limits of each other."""
+    if threadpool_limits is None:
+        yield
+    else:
+        with threadpool_limits(limits=limit):
+            yield
+
+
+def _init_process_worker(limit=1):
+    """Limit the BLAS threads of a worker process of a bootstrap"""
+    if threadpool_limits is not None:
+        threadpool_limits(limits=limit)
+
+
+def _bootstrap_chunk(x, y, func, seed, size):
+    """Compute `size` bootstrap resamples with an independent random stream"""
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    boot_dist = []
+    for i in range(size):
+        resampler = rng.integers(0, n, n)
+        boot_dist.append(
+            func(x.take(resampler, axis=0), y.take(resampler, axis=0))
+        )
+    return np.array(boot_dist)
+
+
+def parallel_bootstrap(
+    x,
+    y,
+    func,
+    n_boot,
+    random_seed=None,
+    workers=None,
+    executor=None,
+    chunksize=None,
+):
+    """Run the bootstrap algorithm in a pool of threads or processes
+
+    The `n_boot` resamples are split into chunks of `chunksize` resamples and
+    every chunk draws its resamples from an independent random stream that is
+    spawned from a :class:`numpy.random.SeedSequence`. The results are
+    therefore the same for a given seed, no matter how many workers are used.
+    Note however that they differ from the results of the serial
+    :func:`psy_reg.plotters.bootstrap` function.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data
+    y: np.ndarray
+        The y-data
+    func: callable
+        The function that takes the resampled `x` and `y` and returns the
+        statistic. If `executor` is ``'process'``, this function must be
+        picklable (see :class:`psy_reg.plotters.LineFit`)
+    n_boot: int
+        The number of resamples
+    random_seed: int
+        The seed for the :class:`numpy.random.SeedSequence`. If None, the
+        ``'plotter.linreg.bootstrap.random_seed'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is used
+    workers: int
+        The number of workers. If None, the
+        ``'plotter.linreg.bootstrap.workers'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is used
+    executor: {'thread' | 'process'}
+        Whether to use a :class:`~concurrent.futures.ThreadPoolExecutor` or a
+        :class:`~concurrent.futures.ProcessPoolExecutor`. If None, the
+        ``'plotter.linreg.bootstrap.executor'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is used
+    chunksize: int
+        The number of resamples per random stream. If None, the
+        ``'plotter.linreg.bootstrap.chunksize'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is used
+
+    Returns
+    -------
+    np.ndarray
+        The results of `func` for the `n_boot` resamples"""
+    if random_seed is None:
+        random_seed = rcParams["plotter.linreg.bootstrap.random_seed"]
+    if workers is None:
+        workers = rcParams["plotter.linreg.bootstrap.workers"]
+    workers = workers or os.cpu_count()
+    if executor is None:
+        executor = rcParams["plotter.linreg.bootstrap.executor"]
+    if chunksize is None:
+        chunksize = rcParams["plotter.linreg.bootstrap.chunksize"]
+    n_boot = int(n_boot)
+    sizes = [min(chunksize, n_boot - i) for i in range(0, n_boot, chunksize)]
+    seeds = np.random.SeedSequence(random_seed).spawn(len(sizes))
+    func = partial(_bootstrap_chunk, np.asarray(x), np.asarray(y), func)
+    if executor == "process":
+        # the limits of the BLAS threads only affect the worker processes
+        with ProcessPoolExecutor(
+            workers, initializer=_init_process_worker
+        ) as pool:
+            return np.concatenate(list(pool.map(func, seeds, sizes)))
+    # the limits of the BLAS threads apply to all threads of the pool
+    with limit_blas_threads(), ThreadPoolExecutor(workers) as pool:
+        return np.concatenate(list(pool.map(func, seeds, sizes)))
+
+
+def analytic_ci(design, cov, y_line, which=95, dof=None):
+    r"""Calculate a confidence band from the covariance of the parameters
+
+    The standard error of the prediction at every point of the line is
+    computed as :math:`\sqrt{d^T \Sigma d}`, where :math:`d` is the
+    corresponding row of the `design` matrix and :math:`\Sigma` the
+    covariance matrix of the parameters.
+
+    Parameters
+    ----------
+    design: np.ndarray of shape ``(len(y_line), p)``
+        The design matrix (or the gradient of the model with respect to the
+        ``p`` parameters) evaluated at the points of the line
+    cov: np.ndarray of shape ``(p, p)``
+        The covariance matrix of the parameters
+    y_line: np.ndarray
+        The predicted values of the line
+    which: float
+        The size of the confidence interval between 0 and 100
+    dof: int
+        The residual degrees of freedom. If not None, the quantiles of the
+        student t distribution are used, otherwise the ones of the normal
+        distribution
+
+    Returns
+    -------
+    np.ndarray of shape ``(2, len(y_line))``
+        The lower and upper bound of the confidence interval"""
+    q = 0.5 + which / 200.0
+    if dof is None:
+        crit = stats.norm.ppf(q)
+    else:
+        crit = stats.t.ppf(q, dof)
+    design = np.asarray(design, dtype=float)
+    se = np.sqrt(np.einsum("ij,jk,ik->i", design, np.asarray(cov), design))
+    return np.array([y_line - crit * se, y_line + crit * se])
+
+
+class LinearSums(object):
+    """Sufficient statistics for a linear least squares fit
+
+    This class accumulates the number of data points and the sums of `x`,
+    `y`, `x**2`, `y**2` and `x*y` from which the ordinary least squares fit
+    (optionally through a fix point) is computed in closed form. The data
+    can be added chunk by chunk through the :meth:`update` method, such that
+    only one chunk has to be held in memory at once. Dask arrays are reduced
+    block by block in parallel with the current dask scheduler. For
+    numerical stability, the data is shifted by the mean of the first chunk.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data to initialize the sums with
+    y: np.ndarray
+        The y-data to initialize the sums with
+    chunksize: int
+        The number of data points that are processed at once (see
+        :meth:`update`)
+    weights: np.ndarray
+        The number of data points that each point represents (see
+        :meth:`update`)"""
+
+    def __init__(self, x=None, y=None, chunksize=None, weights=None):
+        self.n = 0
+        self.x0 = self.y0 = None
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+        if x is not None:
+            self.update(x, y, chunksize, weights)
+
+    def update(self, x, y, chunksize=None, weights=None):
+        """Add data to the sums
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The x-data
+        y: np.ndarray
+            The y-data
+        chunksize: int
+            The number of data points that are processed at once. If None,
+            the ``'plotter.linreg.ols.chunksize'`` item of the
+            :attr:`~psyplot.config.rcsetup.rcParams` is used
+        weights: np.ndarray
+            The number of data points that each point of in-memory data
+            represents (e.g. the counts of the cells of a histogram). The
+            sums are then the same as for the data where each point is
+            repeated according to its weight
+
+        Returns
+        -------
+        LinearSums
+            The instance itself"""
+        if is_dask_array(x) or is_dask_array(y):
+            return self.merge(*_compute_blocks(LinearSums, x, y, chunksize))
+        if chunksize is None:
+            chunksize = rcParams["plotter.linreg.ols.chunksize"]
+        x = np.ravel(x)
+        y = np.ravel(y)
+        if weights is not None:
+            weights = np.ravel(weights)
+        for start in range(0, len(x), chunksize):
+            xc = np.asarray(x[start : start + chunksize], dtype=float)
+            yc = np.asarray(y[start : start + chunksize], dtype=float)
+            if weights is None:
+                wc = np.ones_like(xc)
+            else:
+                wc = np.asarray(weights[start : start + chunksize], float)
+            if self.x0 is None:
+                self.x0 = np.average(xc, weights=wc)
+                self.y0 = np.average(yc, weights=wc)
+            xc = xc - self.x0
+            yc = yc - self.y0
+            self.n += len(xc) if weights is None else wc.sum()
+            self.sx += wc.dot(xc)
+            self.sy += wc.dot(yc)
+            self.sxx += (wc * xc).dot(xc)
+            self.syy += (wc * yc).dot(yc)
+            self.sxy += (wc * xc).dot(yc)
+        return self
+
+    @classmethod
+    def along(cls, x, y):
+        """Compute the sums along the last axis of arrays
+
+        Missing values (NaN) in `x` or `y` are ignored. All sums (and the
+        results of the :meth:`fit`) have the shape of the other axes.
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The x-data (broadcastable to `y`)
+        y: np.ndarray
+            The y-data
+
+        Returns
+        -------
+        LinearSums
+            The sums with array attributes"""
+        x, y = np.broadcast_arrays(
+            np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        )
+        mask = ~(np.isnan(x) | np.isnan(y))
+        obj = cls()
+        obj.n = n = mask.sum(axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            obj.x0 = np.where(mask, x, 0).sum(axis=-1) / n
+            obj.y0 = np.where(mask, y, 0).sum(axis=-1) / n
+        x = np.where(mask, x - obj.x0[..., np.newaxis], 0)
+        y = np.where(mask, y - obj.y0[..., np.newaxis], 0)
+        obj.sx = x.sum(axis=-1)
+        obj.sy = y.sum(axis=-1)
+        obj.sxx = (x * x).sum(axis=-1)
+        obj.syy = (y * y).sum(axis=-1)
+        obj.sxy = (x * y).sum(axis=-1)
+        return obj
+
+    @classmethod
+    def batch(cls, xs, ys):
+        """Compute the sums of several arrays at once
+
+        The arrays are concatenated and the sums of all arrays are computed
+        with a few vectorized operations.
+
+        Parameters
+        ----------
+        xs: list of np.ndarray
+            The non-empty 1D x-data of the arrays
+        ys: list of np.ndarray
+            The 1D y-data of the arrays
+
+        Returns
+        -------
+        list of LinearSums
+            The sums for each array"""
+        x, y, lengths, offsets = _concatenate(xs, ys)
+        x0 = np.add.reduceat(x, offsets) / lengths
+        y0 = np.add.reduceat(y, offsets) / lengths
+        x = x - np.repeat(x0, lengths)
+        y = y - np.repeat(y0, lengths)
+        sums = [
+            np.add.reduceat(arr, offsets)
+            for arr in [x, y, x * x, y * y, x * y]
+        ]
+        ret = []
+        for j, n in enumerate(lengths):
+            obj = cls()
+            obj.n = int(n)
+            obj.x0, obj.y0 = x0[j], y0[j]
+            obj.sx, obj.sy, obj.sxx, obj.syy, obj.sxy = (a[j] for a in sums)
+            ret.append(obj)
+        return ret
+
+    @classmethod
+    def groups(cls, x, y, codes, ngroups=None):
+        """Compute the sums of groups of the data in one pass
+
+        The sums of all groups are aggregated with :func:`numpy.bincount`.
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The 1D x-data
+        y: np.ndarray
+            The 1D y-data
+        codes: np.ndarray of int
+            The index of the group of each data point
+        ngroups: int
+            The number of groups. If None, it is inferred from the `codes`
+
+        Returns
+        -------
+        LinearSums
+            The sums with array attributes of length `ngroups`"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        codes = np.asarray(codes)
+        obj = cls()
+        obj.n = n = np.bincount(codes, minlength=ngroups or 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            obj.x0 = np.bincount(codes, x, len(n)) / n
+            obj.y0 = np.bincount(codes, y, len(n)) / n
+        x = x - obj.x0[codes]
+        y = y - obj.y0[codes]
+        obj.sx, obj.sy, obj.sxx, obj.syy, obj.sxy = (
+            np.bincount(codes, arr, len(n))
+            for arr in [x, y, x * x, y * y, x * y]
+        )
+        return obj
+
+    def merge(self, *others):
+        """Add the sums of other instances
+
+        Parameters
+        ----------
+        ``*others``
+            Other :class:`LinearSums` instances, e.g. computed for other
+            chunks of the data
+
+        Returns
+        -------
+        LinearSums
+            The instance itself"""
+        for other in others:
+            if not other.n:
+                continue
+            elif self.x0 is None:
+                self.x0, self.y0 = other.x0, other.y0
+            # shift the sums of `other` to the origin of this instance
+            dx, dy, n = other.x0 - self.x0, other.y0 - self.y0, other.n
+            self.sxx += other.sxx + 2 * dx * other.sx + n * dx * dx
+            self.syy += other.syy + 2 * dy * other.sy + n * dy * dy
+            self.sxy += other.sxy + dx * other.sy + dy * other.sx + n * dx * dy
+            self.sx += other.sx + n * dx
+            self.sy += other.sy + n * dy
+            self.n += n
+        return self
+
+    def fit(self, fix=None):
+        """Compute the least squares fit from the sums
+
+        Parameters
+        ----------
+        fix: list of float
+            The fix point ``(x', y')`` that the fit has to go through
+
+        Returns
+        -------
+        LinearFitResults
+            The fitted parameters with their covariance matrix"""
+        n = self.n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if fix is None:
+                mx, my = self.sx / n, self.sy / n
+                sxx = self.sxx - n * mx * mx
+                syy = self.syy - n * my * my
+                sxy = self.sxy - n * mx * my
+                slope = sxy / sxx
+                ssr = np.maximum(syy - slope * sxy, 0.0)
+                dof = n - 2
+                scale = ssr / dof
+                xmean = mx + self.x0
+                intercept = my + self.y0 - slope * xmean
+                covariance = -scale * xmean / sxx
+                cov = np.stack(
+                    [
+                        np.stack(
+                            [
+                                scale * (1.0 / n + xmean * xmean / sxx),
+                                covariance,
+                            ],
+                            -1,
+                        ),
+                        np.stack([covariance, scale / sxx], -1),
+                    ],
+                    -2,
+                )
+                params = np.stack([intercept, slope], -1)
+            else:
+                dx, dy = self.x0 - fix[0], self.y0 - fix[1]
+                sxx = self.sxx + 2 * dx * self.sx + n * dx * dx
+                syy = self.syy + 2 * dy * self.sy + n * dy * dy
+                sxy = self.sxy + dx * self.sy + dy * self.sx + n * dx * dy
+                slope = sxy / sxx
+                ssr = np.maximum(syy - slope * sxy, 0.0)
+                dof = n - 1
+                scale = ssr / dof
+                cov = np.asarray(scale / sxx)[..., np.newaxis, np.newaxis]
+                params = np.asarray(slope)[..., np.newaxis]
+            rsquared = 1 - ssr / syy
+        return LinearFitResults(params, cov, n, dof, rsquared)
+
+
+class LinearFitResults(object):
+    """The results of a linear fit computed from :class:`LinearSums`
+
+    This lightweight class provides the attributes of the
+    :class:`statsmodels.regression.linear_model.RegressionResults` that are
+    used by psy-reg.
+
+    Parameters
+    ----------
+    params: np.ndarray
+        The intercept and the slope or, for a fit through a fix point, only
+        the slope
+    cov: np.ndarray
+        The covariance matrix of the `params`
+    nobs: int
+        The number of data points
+    df_resid: int
+        The residual degrees of freedom
+    rsquared: float
+        The coefficient of determination. For a fit through a fix point,
+        this is the uncentered $R^2$ as in statsmodels"""
+
+    #: The confidence intervals are based on the student t distribution
+    use_t = True
+
+    def __init__(self, params, cov, nobs, df_resid, rsquared):
+        self.params = params
+        self.cov = cov
+        self.nobs = nobs
+        self.df_resid = df_resid
+        self.rsquared = rsquared
+
+    @property
+    def bse(self):
+        """The standard errors of the parameters"""
+        return np.sqrt(np.diagonal(self.cov, axis1=-2, axis2=-1))
+
+    def cov_params(self):
+        """The covariance matrix of the parameters"""
+        return self.cov
+
+    def __getitem__(self, key):
+        """Get the results of one fit of vectorized results
+
+        Parameters
+        ----------
+        key: int
+            The index of the fit (e.g. the group of :meth:`LinearSums.groups`)
+
+        Returns
+        -------
+        LinearFitResults
+            The results of the fit with key `key`"""
+        return LinearFitResults(
+            self.params[key],
+            self.cov[key],
+            self.nobs[key],
+            self.df_resid[key],
+            self.rsquared[key],
+        )
+
+
+class CumulativeSums(object):
+    """Cumulative sufficient statistics of data that is sorted by x
+
+    This class computes the cumulative sums of the number of data points and
+    of `x`, `y`, `x**2`, `y**2` and `x*y` once, such that the
+    :class:`LinearSums` of any range of the data are obtained in
+    ``O(log n)`` (see :meth:`window`). For numerical stability, the data is
+    shifted by its mean. Missing values (NaN) are ignored.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x-data, sorted in increasing order
+    y: np.ndarray
+        The 1D y-data
+    weights: np.ndarray
+        The number of data points that each point represents"""
+
+    def __init__(self, x, y, weights=None):
+        self.x = x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        w = valid if weights is None else np.where(valid, weights, 0)
+        if valid.any():
+            self.x0 = np.average(x[valid], weights=w[valid])
+            self.y0 = np.average(y[valid], weights=w[valid])
+            self.ymin, self.ymax = y[valid].min(), y[valid].max()
+        else:
+            self.x0 = self.y0 = 0.0
+            self.ymin, self.ymax = np.inf, -np.inf
+        x = np.where(valid, x - self.x0, 0)
+        y = np.where(valid, y - self.y0, 0)
+        self.cumsums = np.zeros((6, len(x) + 1))
+        np.cumsum(
+            [w, w * x, w * y, w * x * x, w * y * y, w * x * y],
+            axis=1,
+            out=self.cumsums[:, 1:],
+        )
+
+    def sums(self, start, stop):
+        """Get the sums of the data between two indices
+
+        Parameters
+        ----------
+        start: int or np.ndarray
+            The index of the first data point
+        stop: int or np.ndarray
+            The index after the last data point
+
+        Returns
+        -------
+        LinearSums
+            The sums of ``x[start:stop]`` and ``y[start:stop]`` (with array
+            attributes if `start` and `stop` are arrays)"""
+        diff = self.cumsums[:, stop] - self.cumsums[:, start]
+        obj = LinearSums()
+        obj.n = np.round(diff[0]).astype(int)
+        obj.x0, obj.y0 = self.x0, self.y0
+        obj.sx, obj.sy, obj.sxx, obj.syy, obj.sxy = diff[1:]
+        return obj
+
+    def window(self, xmin, xmax):
+        """Get the sums of the data within an x-range
+
+        Parameters
+        ----------
+        xmin: float
+            The minimum x-value (inclusive)
+        xmax: float
+            The maximum x-value (inclusive)
+
+        Returns
+        -------
+        LinearSums
+            The sums of the data with ``xmin <= x <= xmax``"""
+        start = np.searchsorted(self.x, xmin, "left")
+        stop = np.searchsorted(self.x, xmax, "right")
+        return self.sums(start, max(start, stop))
+
+
+def _hinge_system(cumsums, x, breakpoints):
+    """Get the normal equations of continuous piecewise linear fits
+
+    Parameters
+    ----------
+    cumsums: np.ndarray of shape ``(6, n + 1)``
+        The cumulative sums of the data (see :class:`CumulativeSums`)
+    x: np.ndarray
+        The sorted and shifted x-data of the cumulative sums
+    breakpoints: np.ndarray of shape ``(..., k)``
+        The sorted and shifted breakpoints of the fits
+
+    Returns
+    -------
+    np.ndarray of shape ``(..., k + 2, k + 2)``
+        The Gram matrices of the intercept, the slope and the hinge
+        functions ``max(x - breakpoint, 0)``
+    np.ndarray of shape ``(..., k + 2)``
+        The right hand sides of the normal equations
+    float
+        The sum of the squared y-data"""
+    n, sx, sy, sxx, syy, sxy = cumsums[:, -1]
+    # the sums of the data beyond each breakpoint
+    index = np.searchsorted(x, breakpoints, "right")
+    total = cumsums[:, -1].reshape((-1,) + (1,) * index.ndim)
+    tail = total - cumsums[:, index]
+    tn, tsx, tsy, tsxx, tsyy, tsxy = tail
+    nbreaks = breakpoints.shape[-1]
+    gram = np.empty(breakpoints.shape[:-1] + (nbreaks + 2,) * 2)
+    gram[..., 0, 0] = n
+    gram[..., 0, 1] = gram[..., 1, 0] = sx
+    gram[..., 1, 1] = sxx
+    gram[..., 0, 2:] = gram[..., 2:, 0] = tsx - breakpoints * tn
+    gram[..., 1, 2:] = gram[..., 2:, 1] = tsxx - breakpoints * tsx
+    for i in range(nbreaks):
+        bi = breakpoints[..., i]
+        for j in range(i, nbreaks):
+            # the product of the hinges is nonzero beyond the later one
+            bj = breakpoints[..., j]
+            gram[..., 2 + i, 2 + j] = gram[..., 2 + j, 2 + i] = (
+                tsxx[..., j] - (bi + bj) * tsx[..., j] + bi * bj * tn[..., j]
+            )
+    rhs = np.empty(breakpoints.shape[:-1] + (nbreaks + 2,))
+    rhs[..., 0] = sy
+    rhs[..., 1] = sxy
+    rhs[..., 2:] = tsxy - breakpoints * tsy
+    return gram, rhs, syy
+
+
+def _hinge_sse(cumsums, x, breakpoints):
+    """Get the residual sum of squares of continuous piecewise linear fits"""
+    gram, rhs, syy = _hinge_system(cumsums, x, breakpoints)
+    params = np.einsum("...ij,...j->...i", np.linalg.pinv(gram), rhs)
+    return syy - np.einsum("...i,...i->...", params, rhs)
+
+
+def segmented(x, y, nbreaks=1, weights=None, min_size=3, max_candidates=1000):
+    """Fit a continuous piecewise linear function to the data
+
+    The model is ``y = a + b * x + sum(c_j * max(x - t_j, 0))`` with the
+    breakpoints ``t_j``. The data is sorted once and the least squares fits
+    of any set of breakpoints are then computed from the cumulative sums of
+    the data (see :class:`CumulativeSums`) without another pass over the
+    data. The breakpoints are scanned on (at most `max_candidates`) data
+    points and then refined between the neighbouring candidates. A single
+    breakpoint is the global optimum of this scan. Several breakpoints are
+    optimized one after another until they do not change anymore, which may
+    end in a local optimum.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x-data
+    y: np.ndarray
+        The 1D y-data
+    nbreaks: int
+        The number of breakpoints
+    weights: np.ndarray
+        The number of data points that each point represents
+    min_size: int
+        The minimum number of data points per segment
+    max_candidates: int
+        The maximum number of candidates for the scan of a breakpoint
+
+    Returns
+    -------
+    SegmentedFitResults
+        The results of the fit"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[order]
+    cumsums = CumulativeSums(x, y, weights)
+    xc = x - cumsums.x0
+    counts = cumsums.cumsums[0]
+    total = counts[-1]
+    if total < (nbreaks + 1) * min_size:
+        raise ValueError(
+            "Need at least %i data points for %i breakpoints"
+            % ((nbreaks + 1) * min_size, nbreaks)
+        )
+    # the candidates are the unique x-values that leave enough data points
+    # for the first and the last segment
+    candidates = np.unique(xc)
+    ncum = counts[np.searchsorted(xc, candidates, "right")]
+    candidates = candidates[(ncum >= min_size) & (total - ncum >= min_size)]
+    if len(candidates) > max_candidates:
+        candidates = candidates[
+            np.unique(
+                np.linspace(0, len(candidates) - 1, max_candidates).round()
+            ).astype(int)
+        ]
+    if len(candidates) < nbreaks:
+        raise ValueError("Not enough distinct x-values for the breakpoints")
+
+    def count(bound):
+        return counts[np.searchsorted(xc, bound, "right")]
+
+    def scan(breakpoints, j):
+        """Get the best candidate for the breakpoint `j`"""
+        lower = breakpoints[j - 1] if j else -np.inf
+        upper = breakpoints[j + 1] if j < nbreaks - 1 else np.inf
+        ncand = count(candidates)
+        valid = (ncand - (count(lower) if j else 0) >= min_size) & (
+            (count(upper) if j < nbreaks - 1 else total) - ncand >= min_size
+        )
+        valid &= (candidates > lower) & (candidates < upper)
+        if not valid.any():
+            return breakpoints[j], None
+        trials = np.repeat(breakpoints[np.newaxis], valid.sum(), axis=0)
+        trials[:, j] = candidates[valid]
+        sse = _hinge_sse(cumsums.cumsums, xc, trials)
+        best = np.argmin(sse)
+        return trials[best, j], np.flatnonzero(valid)[best]
+
+    # start from equally spaced candidates
+    breakpoints = candidates[
+        (np.arange(1, nbreaks + 1) * len(candidates)) // (nbreaks + 1)
+    ]
+    positions = [None] * nbreaks
+    for _ in range(max(20 * (nbreaks > 1), 1)):
+        previous = breakpoints.copy()
+        for j in range(nbreaks):
+            breakpoints[j], positions[j] = scan(breakpoints, j)
+        if (breakpoints == previous).all():
+            break
+    # refine the breakpoints between the neighbouring candidates
+    for j, pos in enumerate(positions):
+        if pos is None:
+            continue
+        lower = candidates[max(pos - 1, 0)]
+        upper = candidates[min(pos + 1, len(candidates) - 1)]
+        if j:
+            lower = max(lower, breakpoints[j - 1])
+        if j < nbreaks - 1:
+            upper = min(upper, breakpoints[j + 1])
+        trials = breakpoints.copy()
+
+        def objective(value):
+            trials[j] = value
+            return _hinge_sse(cumsums.cumsums, xc, trials)
+
+        best = breakpoints[j]
+        res = minimize_scalar(
+            objective, bounds=(lower, upper), method="bounded"
+        )
+        if res.fun < objective(best):
+            best = res.x
+        breakpoints[j] = best
+    gram, rhs, syy = _hinge_system(cumsums.cumsums, xc, breakpoints)
+    return SegmentedFitResults(
+        gram, rhs, syy, total, breakpoints, cumsums.x0, cumsums.y0
+    )
+
+
+class SegmentedFitResults(object):
+    """The results of a continuous piecewise linear fit
+
+    This class is returned by the :func:`segmented` function.
+
+    Parameters
+    ----------
+    gram: np.ndarray
+        The Gram matrix of the shifted data
+    rhs: np.ndarray
+        The right hand side of the normal equations
+    syy: float
+        The sum of the squared (shifted) y-data
+    nobs: float
+        The number of data points
+    breakpoints: np.ndarray
+        The shifted breakpoints
+    x0: float
+        The shift of the x-data
+    y0: float
+        The shift of the y-data
+
+    Attributes
+    ----------
+    breakpoints: np.ndarray
+        The breakpoints
+    intercept: float
+        The intercept of the first segment
+    slopes: np.ndarray
+        The slopes of the segments
+    rsquared: float
+        The coefficient of determination
+    nobs: float
+        The number of data points
+    df_resid: float
+        The residual degrees of freedom (the breakpoints count as
+        parameters)"""
+
+    def __init__(self, gram, rhs, syy, nobs, breakpoints, x0, y0):
+        nbreaks = len(breakpoints)
+        inv = np.linalg.pinv(gram)
+        self.params = inv.dot(rhs)
+        self.x0, self.y0 = x0, y0
+        self.breakpoints = breakpoints + x0
+        self.nobs = nobs
+        self.df_resid = nobs - 2 * nbreaks - 2
+        ssr = max(syy - self.params.dot(rhs), 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.rsquared = 1 - ssr / syy
+            self._cov = inv * ssr / self.df_resid
+        # the slope of the segment j is the sum of the first j + 1 slopes
+        self._slope_matrix = np.tril(np.ones((nbreaks + 1, nbreaks + 2)), 1)
+        self._slope_matrix[:, 0] = 0
+
+    def cov_params(self):
+        """The covariance matrix of the parameters of :meth:`design`"""
+        return self._cov
+
+    def design(self, x):
+        """Get the design matrix of the fit
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The 1D x-data
+
+        Returns
+        -------
+        np.ndarray of shape ``(len(x), k + 2)``
+            The columns for the (shifted) intercept, the slope and the hinge
+            functions ``max(x - breakpoint, 0)`` of the ``k`` breakpoints"""
+        x = np.asarray(x, dtype=float)
+        return np.c_[
+            np.ones_like(x),
+            x - self.x0,
+            np.maximum(x[:, np.newaxis] - self.breakpoints, 0),
+        ]
+
+    def predict(self, x):
+        """Evaluate the fit
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The 1D x-data
+
+        Returns
+        -------
+        np.ndarray
+            The fitted values"""
+        return self.y0 + self.design(x).dot(self.params)
+
+    @property
+    def slopes(self):
+        return self._slope_matrix.dot(self.params)
+
+    @property
+    def slopes_err(self):
+        """The standard errors of the :attr:`slopes`"""
+        mat = self._slope_matrix
+        return np.sqrt(np.diag(mat.dot(self._cov).dot(mat.T)))
+
+    @property
+    def intercept(self):
+        return self.y0 + self.params[0] - self.params[1] * self.x0
+
+    @property
+    def intercept_err(self):
+        """The standard error of the :attr:`intercept`"""
+        vec = np.zeros(len(self.params))
+        vec[:2] = 1, -self.x0
+        return np.sqrt(vec.dot(self._cov).dot(vec))
+
+    @property
+    def attrs(self):
+        """The parameters of the fit with their standard errors
+
+        The dictionary contains the ``'intercept'`` and the
+        ``'breakpoint<j>'`` and ``'slope<j>'`` for ``j = 0, 1, ...`` (i.e.
+        ``'slope0'`` is the slope left of ``'breakpoint0'``) as well as
+        their standard errors (``'<param>_err'``) and the ``'rsquared'``
+        """
+        ret = {
+            "intercept": self.intercept,
+            "intercept_err": self.intercept_err,
+            "rsquared": self.rsquared,
+        }
+        for j, val in enumerate(self.breakpoints):
+            ret["breakpoint%i" % j] = val
+        for j, (val, err) in enumerate(zip(self.slopes, self.slopes_err)):
+            ret["slope%i" % j] = val
+            ret["slope%i_err" % j] = err
+        return ret
+
+
+#: The tuning constant of Huber's T norm (as in statsmodels)
+HUBER_T = 1.345
+
+#: The normalization of the median absolute deviation
+MAD_NORM = stats.norm.ppf(0.75)
+
+
+def _huber_wls(x, y, w, through_origin):
+    """Weighted least squares of every row in `x` and `y`"""
+    wx = w * x
+    sxx = np.einsum("ij,ij->i", wx, x)
+    sxy = np.einsum("ij,ij->i", wx, y)
+    if through_origin:
+        return np.zeros(len(x)), sxy / sxx
+    sw = w.sum(axis=1)
+    sx = wx.sum(axis=1)
+    sy = np.einsum("ij,ij->i", w, y)
+    slope = (sw * sxy - sx * sy) / (sw * sxx - sx * sx)
+    return (sy - slope * sx) / sw, slope
+
+
+def _huber_rho(z, t):
+    """The objective function of Huber's T norm"""
+    z = np.abs(z)
+    return np.where(z <= t, 0.5 * z * z, z * t - 0.5 * t * t)
+
+
+def _huber_irls(x, y, through_origin, t, tol, maxiter):
+    """Iteratively reweighted least squares of every row in `x` and `y`
+
+    Every row is iterated until its deviance converged. Converged rows are
+    removed from the iteration."""
+    n = x.shape[1]
+    dof = n - (1 if through_origin else 2)
+    intercept, slope = _huber_wls(x, y, np.ones_like(y), through_origin)
+    resid = y - intercept[:, np.newaxis] - slope[:, np.newaxis] * x
+    scale = np.median(np.abs(resid), axis=1) / MAD_NORM
+    variance = (resid * resid).sum(axis=1) / dof
+    dev = _huber_rho(resid / variance[:, np.newaxis], t).sum(axis=1)
+    iterations = np.ones(len(x), dtype=int)
+    active = np.ones(len(x), dtype=bool)
+    niter = 1
+    while True:
+        # a scale of 0 means a perfect fit of the weighted data
+        active &= scale != 0
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        xa, ya = x[idx], y[idx]
+        z = np.abs(resid[idx] / scale[idx, np.newaxis])
+        w = t / np.maximum(z, t)
+        b0, b1 = _huber_wls(xa, ya, w, through_origin)
+        r = ya - b0[:, np.newaxis] - b1[:, np.newaxis] * xa
+        variance = (w * r * r).sum(axis=1) / dof
+        new_dev = _huber_rho(r / variance[:, np.newaxis], t).sum(axis=1)
+        intercept[idx] = b0
+        slope[idx] = b1
+        resid[idx] = r
+        scale[idx] = np.median(np.abs(r), axis=1) / MAD_NORM
+        niter += 1
+        iterations[idx] = niter
+        converged = ~(np.abs(new_dev - dev[idx]) > tol) | (niter >= maxiter)
+        dev[idx] = new_dev
+        active[idx[converged]] = False
+    return intercept, slope, resid, scale, iterations
+
+
+def _shift_linear(x, y, fix):
+    """Shift 2D data by the fix point or by its center"""
+    if fix is not None:
+        fix = np.broadcast_to(np.asarray(fix, dtype=float), (len(x), 2))
+        x0, y0 = fix[:, :1], fix[:, 1:]
+    else:
+        x0, y0 = x.mean(axis=1, keepdims=True), y.mean(axis=1, keepdims=True)
+    return x - x0, y - y0, x0, y0
+
+
+def huber_irls(x, y, fix=None, t=HUBER_T, tol=1e-8, maxiter=50):
+    """Make a robust linear fit with Huber's T norm
+
+    This function implements the iteratively reweighted least squares
+    algorithm of the :class:`statsmodels.robust.robust_linear_model.RLM` with
+    its default settings (Huber's T norm, median absolute deviation as scale
+    estimate and the deviance as convergence criterion) in pure numpy. The
+    iteration starts from the ordinary least squares solution. Several arrays
+    of the same length can be fitted at once by passing 2D `x` and `y`. In
+    this case, every array is iterated until it converged.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data of shape ``(n, )`` or ``(m, n)`` for ``m`` arrays
+    y: np.ndarray
+        The y-data with the same shape as `x`
+    fix: list of float
+        The fix point ``(x', y')`` that the fit has to go through. For 2D
+        data, this may also be an array of shape ``(m, 2)``
+    t: float
+        The tuning constant of Huber's T norm
+    tol: float
+        The convergence tolerance of the deviance
+    maxiter: int
+        The maximum number of iterations
+
+    Returns
+    -------
+    RobustFitResults
+        The fitted parameters with their covariance matrix"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    batched = x.ndim == 2
+    xs, ys, x0, y0 = _shift_linear(np.atleast_2d(x), np.atleast_2d(y), fix)
+    n = xs.shape[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        intercept, slope, resid, scale, iterations = _huber_irls(
+            xs, ys, fix is not None, t, tol, maxiter
+        )
+        nparams = 1 if fix is not None else 2
+        dof = n - nparams
+        # covariance matrix of type H1 as in statsmodels
+        sresid = np.where(
+            scale[:, np.newaxis] == 0, 0, resid / scale[:, np.newaxis]
+        )
+        psi_deriv = (np.abs(sresid) <= t).astype(float)
+        psi = np.clip(sresid, -t, t)
+        m = psi_deriv.mean(axis=1)
+        k = 1 + nparams / n * psi_deriv.var(axis=1) / m**2
+        factor = k**2 * (psi * psi).sum(axis=1) * scale**2 / dof / m**2
+        if fix is not None:
+            params = slope[:, np.newaxis]
+            cov = (factor / (xs * xs).sum(axis=1))[:, np.newaxis, np.newaxis]
+        else:
+            xmean = x0[:, 0]
+            intercept = intercept + y0[:, 0] - slope * xmean
+            params = np.stack([intercept, slope], -1)
+            sxx = ((xs - xs.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+            covariance = -xmean / sxx
+            cov = factor[:, np.newaxis, np.newaxis] * np.stack(
+                [
+                    np.stack([1.0 / n + xmean * xmean / sxx, covariance], -1),
+                    np.stack([covariance, 1.0 / sxx], -1),
+                ],
+                -2,
+            )
+    if not batched:
+        params, cov, scale, iterations = (
+            params[0],
+            cov[0],
+            scale[0],
+            iterations[0],
+        )
+    return RobustFitResults(params, cov, n, dof, scale, iterations)
+
+
+class RobustFitResults(LinearFitResults):
+    """The results of a robust linear fit computed by :func:`huber_irls`
+
+    Parameters
+    ----------
+    params: np.ndarray
+        The intercept and the slope or, for a fit through a fix point, only
+        the slope
+    cov: np.ndarray
+        The covariance matrix of the `params`
+    nobs: int
+        The number of data points
+    df_resid: int
+        The residual degrees of freedom
+    scale: float
+        The final estimate of the scale of the residuals
+    iterations: int
+        The number of iterations until the fit converged"""
+
+    #: The confidence intervals are based on the normal distribution
+    use_t = False
+
+    def __init__(self, params, cov, nobs, df_resid, scale, iterations):
+        self.params = params
+        self.cov = cov
+        self.nobs = nobs
+        self.df_resid = df_resid
+        self.scale = scale
+        self.iterations = iterations
+
+
+def robust_bootstrap(
+    x,
+    y,
+    n_boot,
+    fix=None,
+    random_seed=None,
+    max_memory=None,
+    t=HUBER_T,
+    tol=1e-8,
+    maxiter=50,
+):
+    """Bootstrap the intercept and slope of a robust linear fit
+
+    This function draws the same resamples as the :func:`linear_bootstrap`
+    function and iterates the robust fits of all resamples in a block at
+    once (see :func:`huber_irls`). Resamples that converged are removed from
+    the iteration.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data of shape ``(n, )`` or ``(m, n)`` for ``m`` arrays
+    y: np.ndarray
+        The y-data with the same shape as `x`
+    n_boot: int
+        The number of resamples
+    fix: list of float
+        The fix point ``(x', y')`` that the fit has to go through. For 2D
+        data, this may also be an array of shape ``(m, 2)``
+    random_seed: int
+        The seed for the random number generator (see
+        :func:`get_random_state`)
+    max_memory: float
+        The memory budget in megabytes (see :func:`get_block_size`)
+    t, tol, maxiter
+        The parameters of the iteration (see :func:`huber_irls`)
+
+    Returns
+    -------
+    np.ndarray
+        The intercepts of the ``n_boot`` resamples (with shape
+        ``(m, n_boot)`` for 2D data)
+    np.ndarray
+        The slopes of the ``n_boot`` resamples (with shape ``(m, n_boot)``
+        for 2D data)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    batched = x.ndim == 2
+    x, y, x0, y0 = _shift_linear(np.atleast_2d(x), np.atleast_2d(y), fix)
+    m, n = x.shape
+    n_boot = int(n_boot)
+    intercepts = np.empty((m, n_boot))
+    slopes = np.empty((m, n_boot))
+    # we hold the indices, the resampled data, the weights and residuals
+    block_size = get_block_size(n * m, n_boot, 6, max_memory)
+    start = 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for indices in iter_resamples(
+            n, n_boot, get_random_state(random_seed), block_size
+        ):
+            end = start + len(indices)
+            xs = x[:, indices].reshape(-1, n)
+            ys = y[:, indices].reshape(-1, n)
+            intercept, slope = _huber_irls(
+                xs, ys, fix is not None, t, tol, maxiter
+            )[:2]
+            slope = slope.reshape(m, -1)
+            slopes[:, start:end] = slope
+            intercepts[:, start:end] = (
+                intercept.reshape(m, -1) + y0 - slope * x0
+            )
+            start = end
+    if not batched:
+        return intercepts[0], slopes[0]
+    return intercepts, slopes
+
+
+def _median_through(x, y, fix):
+    """The median of the slopes to a fix point"""
+    dx = x - fix[0]
+    valid = dx != 0
+    slope = np.median((y[valid] - fix[1]) / dx[valid])
+    return fix[1] - slope * fix[0], slope
+
+
+def _line_keys(x, y, slope):
+    """Get the sort keys of the points along the dual line of a slope
+
+    The points are sorted by their intercepts ``y - slope * x`` (the first
+    key has the highest priority). Infinite slopes correspond to the limits
+    of the order."""
+    if slope == -np.inf:
+        return [x, y]
+    elif slope == np.inf:
+        return [-x, y]
+    return [y - slope * x]
+
+
+def _inversions(ranks):
+    """Find the inversions of a permutation with a bottom-up merge sort
+
+    Parameters
+    ----------
+    ranks: np.ndarray
+        The permutation of ``range(n)``
+
+    Returns
+    -------
+    counts: np.ndarray
+        The number of inversions of every entry
+    starts: np.ndarray
+        The position of the first inversion of every entry in `lefts`
+    lefts: np.ndarray
+        The left positions of the inversions
+    rights: np.ndarray
+        The right position of every entry"""
+    n = len(ranks)
+    pos = np.arange(n)
+    counts, starts, lefts, rights = [], [], [], []
+    offset = 0
+    width = 1
+    while width < n:
+        block = pos // (2 * width)
+        right = (pos // width) % 2 == 1
+        keys = block * n + ranks
+        idx = np.argsort(keys[~right])
+        left_keys = keys[~right][idx]
+        start = np.searchsorted(left_keys, keys[right], "right")
+        end = np.searchsorted(left_keys, (block[right] + 1) * n)
+        counts.append(end - start)
+        starts.append(start + offset)
+        lefts.append(pos[~right][idx])
+        rights.append(pos[right])
+        offset += len(idx)
+        width *= 2
+    if not counts:
+        return (np.zeros(0, dtype=int),) * 4
+    return tuple(map(np.concatenate, [counts, starts, lefts, rights]))
+
+
+class _Slab(object):
+    """The pairs of points whose slopes lie in the interval ``(lo, hi]``
+
+    These pairs are the inversions between the orders of the points along
+    the dual lines at `lo` and at `hi` (see :func:`_inversions`)."""
+
+    def __init__(self, x, y, lo, hi):
+        n = len(x)
+        keys_lo = _line_keys(x, y, lo)
+        keys_hi = _line_keys(x, y, hi)
+        self.order = order = np.lexsort((keys_lo + keys_hi)[::-1])
+        # points with the same intercept at lo must not form a pair
+        changed = np.zeros(max(n - 1, 0), dtype=bool)
+        for key in keys_lo:
+            key = key[order]
+            changed |= key[1:] != key[:-1]
+        group = np.r_[0, np.cumsum(changed)]
+        keys_hi = [key[order] for key in keys_hi]
+        ranks = np.empty(n, dtype=np.int64)
+        ranks[np.lexsort([np.arange(n), -group] + keys_hi[::-1])] = np.arange(
+            n
+        )
+        self.counts, self.starts, self.lefts, self.rights = _inversions(ranks)
+        self.size = int(self.counts.sum())
+
+    def pairs(self, indices=None):
+        """Get the indices of the points of the pairs at (sorted) `indices`
+
+        If `indices` is None, all pairs are returned"""
+        first = np.cumsum(self.counts) - self.counts
+        if indices is None:
+            entry = np.repeat(np.arange(len(self.counts)), self.counts)
+            indices = np.arange(self.size)
+        else:
+            entry = np.searchsorted(first, indices, "right") - 1
+        left = self.lefts[self.starts[entry] + indices - first[entry]]
+        return self.order[left], self.order[self.rights[entry]]
+
+    def slopes(self, x, y, indices=None):
+        """Get the slopes of the pairs at (sorted) `indices`"""
+        i, j = self.pairs(indices)
+        return (y[j] - y[i]) / (x[j] - x[i])
+
+
+def _gap_bounds(sample, positions):
+    """Get bounds in between the distinct values of a sorted sample
+
+    Parameters
+    ----------
+    sample: np.ndarray
+        The sorted sample
+    positions: tuple of float
+        The positions of the lower and upper bound in the `sample`
+
+    Returns
+    -------
+    float
+        The lower bound or minus infinity
+    float
+        The upper bound or infinity"""
+    lo, hi = -np.inf, np.inf
+    if positions[0] >= 0:
+        value = sample[int(positions[0])]
+        i = np.searchsorted(sample, value) - 1
+        # adjacent floats have no value in between
+        if i >= 0 and sample[i] < 0.5 * (sample[i] + value) < value:
+            lo = 0.5 * (sample[i] + value)
+    if positions[1] < len(sample):
+        value = sample[int(positions[1])]
+        i = np.searchsorted(sample, value, "right")
+        if i < len(sample) and value < 0.5 * (sample[i] + value) < sample[i]:
+            hi = 0.5 * (sample[i] + value)
+    return lo, hi
+
+
+def theil_sen(x, y, fix=None, max_memory=None, random_seed=0):
+    """Make a Theil-Sen fit (median of the pairwise slopes)
+
+    The median of the slopes of all pairs of points with different `x` is
+    selected exactly without computing all ``n * (n - 1) / 2`` slopes. The
+    interval that contains the median is contracted with the quantiles of
+    random pairs out of this interval, and the pairs in an interval are
+    counted and drawn as the inversions between the orders of the points
+    at its bounds with ``O(n log(n)**2)`` operations. The result is the same
+    as for :func:`scipy.stats.theilslopes`.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data
+    y: np.ndarray
+        The y-data
+    fix: list of float
+        The fix point ``(x', y')`` that the fit has to go through. The slope
+        is then the median of the slopes between the data points and the fix
+        point
+    max_memory: float
+        The memory budget in megabytes that determines how many slopes are
+        computed at once (see :func:`get_block_size`)
+    random_seed: int
+        The seed for drawing the random pairs. It only affects the speed but
+        not the result
+
+    Returns
+    -------
+    float
+        The intercept (the median of `y` minus the slope times the median of
+        `x` as in :func:`scipy.stats.theilslopes`)
+    float
+        The slope"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if fix is not None:
+        return _median_through(x, y, fix)
+    n = len(x)
+    ties = np.unique(x, return_counts=True)[1]
+    npairs = n * (n - 1) // 2 - int((ties * (ties - 1) // 2).sum())
+    if npairs == 0:
+        return np.nan, np.nan
+    ranks = np.array([(npairs - 1) // 2, npairs // 2])
+    # we hold the indices of the pairs, their differences and slopes
+    max_pairs = max(get_block_size(1, npairs, 5, max_memory), 4 * n)
+    if npairs <= max_pairs:
+        i, j = np.triu_indices(n, 1)
+        dx = x[j] - x[i]
+        valid = dx != 0
+        slopes = (y[j] - y[i])[valid] / dx[valid]
+        slope = np.partition(slopes, ranks)[ranks].mean()
+        return np.median(y) - slope * np.median(x), slope
+    random_state = get_random_state(random_seed)
+    lo, hi = -np.inf, np.inf
+    below = 0  # the number of slopes <= lo
+    slab = _Slab(x, y, lo, hi)
+    slope = None
+    stalled = False
+    while slab.size > max_pairs:
+        indices = np.sort(random_state.randint(0, slab.size, max_pairs))
+        sample = np.sort(slab.slopes(x, y, indices))
+        q = (ranks - below + 0.5) / slab.size
+        if stalled or sample[0] == sample[-1]:
+            # the median is probably in a large group of slopes that are
+            # equal up to rounding errors
+            slope = sample[min(int(q.mean() * max_pairs), max_pairs - 1)]
+            delta = 1e-9 * abs(slope) or np.finfo(float).tiny
+            new_lo, new_hi = slope - delta, slope + delta
+        else:
+            # choose the bounds such that the median is in between with a
+            # probability of more than 99.7 percent. The bounds are placed
+            # in between the sampled slopes to not split equal slopes
+            margin = 3 * np.sqrt(q * (1 - q) / max_pairs) + 1.0 / max_pairs
+            new_lo, new_hi = _gap_bounds(
+                sample, (q - [margin[0], -margin[1]]) * max_pairs
+            )
+        bounds = lo, hi
+        # the number of slopes <= hi
+        upto = below + slab.size
+        if new_hi < hi:
+            nhi = _Slab(x, y, new_hi, hi).size
+            if upto - nhi > ranks[1]:
+                hi = new_hi
+        if lo < new_lo:
+            nlo = _Slab(x, y, lo, new_lo).size
+            if below + nlo <= ranks[0]:
+                lo, below = new_lo, below + nlo
+        stalled = slope is None and (lo, hi) == bounds
+        slab = _Slab(x, y, lo, hi)
+        if slope is not None and new_lo <= lo and hi <= new_hi:
+            if slab.size > max_pairs:
+                # all remaining slopes are equal up to rounding errors
+                break
+        slope = None
+    if slope is None:
+        slopes = slab.slopes(x, y)
+        slope = np.partition(slopes, ranks - below)[ranks - below].mean()
+    return np.median(y) - slope * np.median(x), slope
+
+
+def siegel(x, y, fix=None, max_pairs=None, random_seed=0):
+    """Make a fit with Siegel's repeated medians
+
+    The slope is the median over all points of the median slope between the
+    point and the other points. If the number of pairs is larger than
+    `max_pairs`, the median slope of every point is estimated from
+    ``max_pairs / n`` random other points.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data
+    y: np.ndarray
+        The y-data
+    fix: list of float
+        The fix point ``(x', y')`` that the fit has to go through. The slope
+        is then the median of the slopes between the data points and the fix
+        point
+    max_pairs: int
+        The maximum number of slopes to compute. If None, the
+        ``'plotter.linreg.siegel.max_pairs'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is used
+    random_seed: int
+        The seed for drawing the random points
+
+    Returns
+    -------
+    float
+        The intercept (the median of ``y - slope * x`` as in
+        :func:`scipy.stats.siegelslopes`)
+    float
+        The slope"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if fix is not None:
+        return _median_through(x, y, fix)
+    if max_pairs is None:
+        max_pairs = rcParams["plotter.linreg.siegel.max_pairs"]
+    n = len(x)
+    exact = n * n <= max_pairs
+    partners = n if exact else max(int(max_pairs) // n, 1)
+    random_state = get_random_state(random_seed)
+    medians = np.empty(n)
+    # we hold the partners, the differences and the sorted slopes
+    block_size = get_block_size(partners, n, 4)
+    for start in range(0, n, block_size):
+        rows = np.arange(start, min(start + block_size, n))
+        if exact:
+            cols = np.arange(n)[np.newaxis]
+        else:
+            cols = random_state.randint(0, n, (len(rows), partners))
+        dx = x[cols] - x[rows, np.newaxis]
+        valid = dx != 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = np.where(valid, (y[cols] - y[rows, np.newaxis]) / dx, 0)
+        # sort the invalid slopes to the end
+        slopes = np.sort(np.where(valid, slopes, np.inf), axis=1)
+        nvalid = valid.sum(axis=1)
+        ranks = np.stack([(nvalid - 1) // 2, nvalid // 2], 1)
+        medians[rows] = np.take_along_axis(
+            slopes, np.maximum(ranks, 0), axis=1
+        ).mean(axis=1)
+        medians[rows[nvalid == 0]] = np.nan
+    slope = np.nanmedian(medians)
+    return np.median(y - slope * x), slope
+
+
+def _row_medians(values):
+    """Get the medians along the last axis, ignoring NaNs
+
+    Parameters
+    ----------
+    values: np.ndarray
+        The values with NaN for invalid entries
+
+    Returns
+    -------
+    np.ndarray
+        The medians of the valid values (NaN if there are none)"""
+    nvalid = (~np.isnan(values)).sum(axis=-1)
+    ranks = np.maximum(np.stack([(nvalid - 1) // 2, nvalid // 2], -1), 0)
+    if not ranks.size:
+        return np.full(nvalid.shape, np.nan)
+    # NaNs are partitioned to the end, so we only have to sort the values
+    # between the smallest and the largest rank
+    lo, hi = ranks.min(), ranks.max()
+    values = np.partition(values, [lo, hi], axis=-1)[..., lo : hi + 1]
+    values = np.sort(values, axis=-1)
+    medians = np.take_along_axis(values, ranks - lo, axis=-1).mean(axis=-1)
+    return np.where(nvalid == 0, np.nan, medians)
+
+
+def _subsample_median_fits(x, y, indices, func):
+    """Make median-based fits for a block of subsamples at once
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data
+    y: np.ndarray
+        The y-data
+    indices: np.ndarray of shape ``(m, size)``
+        The indices of the points of ``m`` subsamples
+    func: callable
+        The fit function (:func:`theil_sen` or :func:`siegel`)
+
+    Returns
+    -------
+    np.ndarray
+        The intercepts of the subsamples
+    np.ndarray
+        The slopes of the subsamples"""
+    xr = x[indices]
+    yr = y[indices]
+    if func is siegel:
+        # the slopes between all points of a subsample
+        dx = xr[:, np.newaxis] - xr[:, :, np.newaxis]
+        dy = yr[:, np.newaxis] - yr[:, :, np.newaxis]
+    else:
+        # the slopes of all pairs of a subsample
+        i, j = np.triu_indices(indices.shape[1], 1)
+        dx = xr[:, j] - xr[:, i]
+        dy = yr[:, j] - yr[:, i]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = np.where(dx != 0, dy / dx, np.nan)
+    del dx, dy
+    if func is siegel:
+        slopes = _row_medians(_row_medians(slopes))
+        intercepts = np.median(yr - slopes[:, np.newaxis] * xr, axis=1)
+    else:
+        slopes = _row_medians(slopes)
+        intercepts = np.median(yr, axis=1) - slopes * np.median(xr, axis=1)
+    return intercepts, slopes
+
+
+def median_bootstrap(
+    x,
+    y,
+    n_boot,
+    func,
+    fix=None,
+    random_seed=None,
+    max_memory=None,
+    max_size=None,
+    params=None,
+):
+    """Bootstrap the intercept and slope of a median-based linear fit
+
+    This function draws the same resamples as the :func:`linear_bootstrap`
+    function. Fits through a fix point are computed for all resamples in a
+    block at once.
+
+    Without a fix point, the fits of every resample cost ``O(n**2)`` (or at
+    least ``O(n log(n)**2)`` for :func:`theil_sen`). Data with more than
+    `max_size` points is therefore bootstrapped with resamples of
+    `max_size` points (the m-out-of-n bootstrap) that are fitted exactly in
+    blocks. Their deviations from the fit to the full data are scaled with
+    ``sqrt(max_size / n)`` to the spread of resamples of `n` points.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data
+    y: np.ndarray
+        The y-data
+    n_boot: int
+        The number of resamples
+    func: callable
+        The fit function (:func:`theil_sen` or :func:`siegel`)
+    fix: list of float
+        The fix point ``(x', y')`` that the fit has to go through
+    random_seed: int
+        The seed for the random number generator (see
+        :func:`get_random_state`)
+    max_memory: float
+        The memory budget in megabytes (see :func:`get_block_size`)
+    max_size: int
+        The maximum number of points per resample without `fix`. If None,
+        the ``'plotter.linreg.bootstrap.median_size'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is used
+    params: np.ndarray
+        The intercept and slope of the fit to the full data. If None and
+        the resamples are smaller than the data, they are computed with
+        `func`
+
+    Returns
+    -------
+    np.ndarray
+        The intercepts of the ``n_boot`` resamples
+    np.ndarray
+        The slopes of the ``n_boot`` resamples"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    n_boot = int(n_boot)
+    if max_size is None:
+        max_size = rcParams["plotter.linreg.bootstrap.median_size"]
+    intercepts = np.empty(n_boot)
+    slopes = np.empty(n_boot)
+    random_state = get_random_state(random_seed)
+    if fix is None and n > max_size:
+        size = int(max_size)
+        if params is None:
+            params = func(x, y)
+        # we hold the differences and the slopes of the pairs
+        npairs = size * size if func is siegel else size * (size - 1) // 2
+        block_size = get_block_size(npairs, n_boot, 4, max_memory)
+        for start in range(0, n_boot, block_size):
+            end = min(start + block_size, n_boot)
+            indices = random_state.randint(0, n, (end - start, size))
+            (
+                intercepts[start:end],
+                slopes[start:end],
+            ) = _subsample_median_fits(x, y, indices, func)
+        scale = np.sqrt(size / n)
+        intercepts = params[0] + scale * (intercepts - params[0])
+        slopes = params[1] + scale * (slopes - params[1])
+        return intercepts, slopes
+    if fix is None:
+        block_size = 1
+    else:
+        block_size = get_block_size(n, n_boot, 4, max_memory)
+        dx = x - fix[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            point_slopes = np.where(dx != 0, (y - fix[1]) / dx, np.nan)
+    start = 0
+    for indices in iter_resamples(n, n_boot, random_state, block_size):
+        end = start + len(indices)
+        if fix is None:
+            intercepts[start], slopes[start] = func(
+                x[indices[0]], y[indices[0]]
+            )
+        else:
+            slope = _row_medians(point_slopes[indices])
+            slopes[start:end] = slope
+            intercepts[start:end] = fix[1] - slope * fix[0]
+        start = end
+    return intercepts, slopes
+
+
+def unique_points(x, y):
+    """Collapse identical pairs of x and y into unique points
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x-data
+    y: np.ndarray
+        The 1D y-data
+
+    Returns
+    -------
+    np.ndarray
+        The x-data of the unique points
+    np.ndarray
+        The y-data of the unique points
+    np.ndarray
+        How often each unique point occurs in the data"""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+    starts = np.r_[0, ((x[1:] != x[:-1]) | (y[1:] != y[:-1])).nonzero()[0] + 1]
+    counts = np.diff(np.r_[starts, len(x)])
+    return x[starts], y[starts], counts
+
+
+def _concatenate(xs, ys):
+    """Concatenate ragged arrays and get the lengths and offsets"""
+    lengths = np.array([len(x) for x in xs])
+    offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+    x = np.concatenate(xs).astype(float)
+    y = np.concatenate(ys).astype(float)
+    return x, y, lengths, offsets
+
+
+def _poly_moments(x, y, deg, center, scale, y0, weights=None):
+    """Compute the normal equations of a polynomial fit for one chunk"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float) - y0
+    vander = np.vander((x - center) / scale, deg + 1, increasing=True)
+    if weights is None:
+        return vander.T.dot(vander), vander.T.dot(y), y.dot(y), len(x)
+    weights = np.asarray(weights, dtype=float)
+    wvander = vander * weights[:, np.newaxis]
+    return (
+        wvander.T.dot(vander),
+        wvander.T.dot(y),
+        (weights * y).dot(y),
+        weights.sum(),
+    )
+
+
+def _solve_poly(gram, rhs, yy, n, center, scale, y0):
+    """Solve the normal equations of normalized polynomials
+
+    The polynomials are defined for ``t = (x - center) / scale`` and the
+    y-data that has been shifted by `y0`. All parameters can have leading
+    dimensions for several fits.
+
+    Returns
+    -------
+    np.ndarray
+        The coefficients of the polynomials in `x`, highest power first
+    np.ndarray
+        The covariance matrices of the coefficients (see
+        :func:`numpy.polyfit`)
+    np.ndarray
+        The coefficients of determination"""
+    order = gram.shape[-1]
+    if np.any(np.asarray(n) <= order):
+        raise ValueError(
+            "the number of data points must exceed order to scale the "
+            "covariance matrix"
+        )
+    params = np.linalg.solve(gram, rhs[..., np.newaxis])[..., 0]
+    resid = np.maximum(yy - np.einsum("...i,...i", params, rhs), 0.0)
+    cov = np.linalg.inv(gram) * (resid / (n - order))[..., None, None]
+    # transform the parameters from the normalized to the original x, i.e.
+    # the coefficient of x**j in ((x - center) / scale)**k
+    j, k = np.indices((order, order))
+    center = np.asarray(center, dtype=float)[..., None, None]
+    scale = np.asarray(scale, dtype=float)[..., None, None]
+    transform = comb(k, j) * (-center) ** np.maximum(k - j, 0) / scale**k
+    params = np.einsum("...jk,...k->...j", transform, params)
+    params[..., 0] += y0
+    cov = transform @ cov @ np.swapaxes(transform, -1, -2)
+    # the total sum of squares around the mean (`y0` is not necessarily the
+    # mean of the y-data, e.g. for the PolynomialSums)
+    ss_tot = yy - rhs[..., 0] ** 2 / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsquared = 1 - resid / ss_tot
+    return params[..., ::-1], cov[..., ::-1, ::-1], rsquared
+
+
+def polyfit(x, y, deg, weights=None):
+    """Fit a polynomial to the data
+
+    For numpy arrays, this function is equivalent to
+    ``numpy.polyfit(x, y, deg, cov=True)``. For dask arrays, the normal
+    equations of the (normalized) polynomial are accumulated block by block
+    in parallel with the current dask scheduler, such that the data does not
+    have to be loaded into memory at once. Weighted points (e.g. the cells
+    of a histogram) are fitted as if each point was repeated according to
+    its weight.
+
+    Parameters
+    ----------
+    x: np.ndarray or dask.array.Array
+        The 1D x-data
+    y: np.ndarray or dask.array.Array
+        The 1D y-data
+    deg: int
+        The degree of the polynomial
+    weights: np.ndarray
+        The number of data points that each point of in-memory data
+        represents
+
+    Returns
+    -------
+    np.ndarray
+        The coefficients of the polynomial, highest power first
+    np.ndarray
+        The covariance matrix of the coefficients (see :func:`numpy.polyfit`)
+    """
+    if weights is not None:
+        x = np.asarray(x, dtype=float)
+        center = (x.min() + x.max()) / 2.0
+        scale = (x.max() - x.min()) / 2.0 or 1.0
+        y0 = np.average(y, weights=weights)
+        moments = _poly_moments(x, y, deg, center, scale, y0, weights)
+        return _solve_poly(*moments, center, scale, y0)[:2]
+    if not (is_dask_array(x) or is_dask_array(y)):
+        return np.polyfit(x, y, deg, cov=True)
+    import dask
+
+    xmin, xmax, y0 = dask.compute(x.min(), x.max(), y.mean())
+    center = (xmin + xmax) / 2.0
+    scale = (xmax - xmin) / 2.0 or 1.0
+    moments = _compute_blocks(_poly_moments, x, y, deg, center, scale, y0)
+    gram, rhs, yy, n = map(sum, zip(*moments))
+    return _solve_poly(gram, rhs, yy, n, center, scale, y0)[:2]
+
+
+class PolynomialSums(object):
+    """Sufficient statistics for a polynomial least squares fit
+
+    This class accumulates the normal equations of the normalized
+    polynomials such that new data can be added through the :meth:`update`
+    method without revisiting the previous data. The normalization is
+    defined by the data that initializes the sums.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x-data to initialize the sums with
+    y: np.ndarray
+        The 1D y-data to initialize the sums with
+    deg: int
+        The degree of the polynomial"""
+
+    def __init__(self, x, y, deg):
+        x = np.asarray(x, dtype=float)
+        self.deg = deg
+        if len(x):
+            self.center = (x.min() + x.max()) / 2.0
+            self.scale = (x.max() - x.min()) / 2.0 or 1.0
+            self.y0 = np.mean(y)
+        else:
+            self.center, self.scale, self.y0 = 0.0, 1.0, 0.0
+        self.gram, self.rhs, self.yy, self.n = _poly_moments(
+            x, y, deg, self.center, self.scale, self.y0
+        )
+
+    def update(self, x, y):
+        """Add data to the sums
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The 1D x-data
+        y: np.ndarray
+            The 1D y-data
+
+        Returns
+        -------
+        PolynomialSums
+            The instance itself"""
+        gram, rhs, yy, n = _poly_moments(
+            x, y, self.deg, self.center, self.scale, self.y0
+        )
+        self.gram = self.gram + gram
+        self.rhs = self.rhs + rhs
+        self.yy += yy
+        self.n += n
+        return self
+
+    def fit(self):
+        """Compute the least squares fit from the sums
+
+        Returns
+        -------
+        np.ndarray
+            The coefficients of the polynomial, highest power first
+        np.ndarray
+            The covariance matrix of the coefficients (see
+            :func:`numpy.polyfit`)
+        float
+            The coefficient of determination"""
+        return _solve_poly(
+            self.gram,
+            self.rhs,
+            self.yy,
+            self.n,
+            self.center,
+            self.scale,
+            self.y0,
+        )
+
+
+def batch_polyfit(xs, ys, deg):
+    """Fit polynomials to several arrays at once
+
+    The arrays are concatenated and the normal equations of the normalized
+    polynomials are computed from power sums of all arrays at once.
+
+    Parameters
+    ----------
+    xs: list of np.ndarray
+        The 1D x-data of the arrays
+    ys: list of np.ndarray
+        The 1D y-data of the arrays
+    deg: int
+        The degree of the polynomials
+
+    Returns
+    -------
+    np.ndarray of shape ``(m, deg + 1)``
+        The coefficients of the polynomials, highest power first
+    np.ndarray of shape ``(m, deg + 1, deg + 1)``
+        The covariance matrices of the coefficients (see
+        :func:`numpy.polyfit`)
+    np.ndarray of shape ``(m, )``
+        The coefficients of determination"""
+    x, y, lengths, offsets = _concatenate(xs, ys)
+    order = deg + 1
+    xmin = np.minimum.reduceat(x, offsets)
+    xmax = np.maximum.reduceat(x, offsets)
+    center = (xmin + xmax) / 2.0
+    scale = (xmax - xmin) / 2.0
+    scale[scale == 0] = 1.0
+    y0 = np.add.reduceat(y, offsets) / lengths
+    t = (x - np.repeat(center, lengths)) / np.repeat(scale, lengths)
+    y = y - np.repeat(y0, lengths)
+    powers = np.vander(t, 2 * order - 1, increasing=True)
+    power_sums = np.add.reduceat(powers, offsets)
+    j, k = np.indices((order, order))
+    gram = power_sums[:, j + k]
+    rhs = np.add.reduceat(powers[:, :order] * y[:, np.newaxis], offsets)
+    yy = np.add.reduceat(y * y, offsets)
+    return _solve_poly(gram, rhs, yy, lengths, center, scale, y0)
+
+
+def polyfit_along(x, y, deg):
+    """Fit polynomials along the last axis of arrays
+
+    Missing values (NaN) in `x` or `y` are ignored. The normal equations of
+    the normalized polynomials are computed from power sums along the last
+    axis for all other axes at once.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The x-data (broadcastable to `y`)
+    y: np.ndarray
+        The y-data
+    deg: int
+        The degree of the polynomials
+
+    Returns
+    -------
+    np.ndarray of shape ``y.shape[:-1] + (deg + 1, )``
+        The coefficients of the polynomials, highest power first. They are
+        NaN, where the polynomial could not be fitted
+    np.ndarray of shape ``y.shape[:-1] + (deg + 1, deg + 1)``
+        The covariance matrices of the coefficients (see
+        :func:`numpy.polyfit`)
+    np.ndarray of shape ``y.shape[:-1]``
+        The coefficients of determination
+    np.ndarray of shape ``y.shape[:-1]``
+        The number of valid data points"""
+    x, y = np.broadcast_arrays(
+        np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    )
+    order = deg + 1
+    mask = ~(np.isnan(x) | np.isnan(y))
+    n = mask.sum(axis=-1)
+    xmin = np.where(mask, x, np.inf).min(axis=-1)
+    xmax = np.where(mask, x, -np.inf).max(axis=-1)
+    invalid = (n <= order) | ~(xmax > xmin)
+    # the extents of the missing grid points are infinite
+    with np.errstate(invalid="ignore", divide="ignore"):
+        center = np.where(invalid, 0, (xmin + xmax) / 2.0)
+        scale = np.where(invalid, 1, (xmax - xmin) / 2.0)
+        y0 = np.where(
+            invalid, 0, np.where(mask, y, 0).sum(axis=-1) / n.clip(1)
+        )
+    t = np.where(mask, (x - center[..., None]) / scale[..., None], 0)
+    y = np.where(mask, y - y0[..., None], 0)
+    powers = np.stack(
+        [np.where(mask, t**p, 0) for p in range(2 * order - 1)], -1
+    )
+    power_sums = powers.sum(axis=-2)
+    j, k = np.indices((order, order))
+    gram = power_sums[..., j + k]
+    rhs = (powers[..., :order] * y[..., None]).sum(axis=-2)
+    yy = (y * y).sum(axis=-1)
+    # fit the invalid grid points to a dummy system to set them to NaN later
+    gram[invalid] = np.eye(order)
+    yy = np.where(invalid, 1, yy)
+    params, cov, rsquared = _solve_poly(
+        gram, rhs, yy, np.where(invalid, order + 1, n), center, scale, y0
+    )
+    params[invalid] = np.nan
+    cov[invalid] = np.nan
+    rsquared = np.where(invalid, np.nan, rsquared)
+    return params, cov, rsquared, n
+
+
+def poly_bootstrap(
+    x, y, deg, n_boot, x_line, random_seed=None, max_memory=None, weights=None
+):
+    """Bootstrap a polynomial fit
+
+    This function draws the same resamples as the
+    :func:`psy_reg.plotters.bootstrap` function but solves the normal
+    equations of all resamples in a block at once: The powers of the
+    normalized x-data are computed only once and the power sums of the
+    resamples are the products of their counts with these powers (as in
+    :func:`batch_polyfit`). Neither the covariance matrices nor the
+    coefficients of determination are computed.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x-data
+    y: np.ndarray
+        The 1D y-data
+    deg: int
+        The degree of the polynomial
+    n_boot: int
+        The number of resamples
+    x_line: np.ndarray
+        The x-data to evaluate the fits on
+    random_seed: int
+        The seed for the random number generator (see
+        :func:`get_random_state`)
+    max_memory: float
+        The memory budget in megabytes (see :func:`get_block_size`)
+    weights: np.ndarray
+        The number of data points that each point represents. If given, the
+        resamples are drawn from the multinomial distribution of the weights
+        (see :func:`iter_multinomial`)
+
+    Returns
+    -------
+    np.ndarray of shape ``(n_boot, len(x_line))``
+        The fits of the resamples evaluated on `x_line`"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    order = deg + 1
+    center = (x.min() + x.max()) / 2.0
+    scale = (x.max() - x.min()) / 2.0 or 1.0
+    y0 = np.average(y, weights=weights)
+    powers = np.vander((x - center) / scale, 2 * order - 1, increasing=True)
+    ypowers = powers[:, :order] * (y - y0)[:, np.newaxis]
+    vander_line = np.vander(
+        (np.asarray(x_line, dtype=float) - center) / scale,
+        order,
+        increasing=True,
+    )
+    j, k = np.indices((order, order))
+    n_boot = int(n_boot)
+    ret = np.empty((n_boot, len(vander_line)))
+    # we hold the indices, their offsets and the counts at the same time
+    block_size = get_block_size(n, n_boot, 3, max_memory)
+    random_state = get_random_state(random_seed)
+    if weights is None:
+        blocks = iter_resamples(n, n_boot, random_state, block_size)
+    else:
+        blocks = iter_multinomial(weights, n_boot, random_state, block_size)
+    start = 0
+    for block in blocks:
+        end = start + len(block)
+        if weights is None:
+            # count how often each point is drawn in every resample
+            offsets = block + n * np.arange(len(block))[:, np.newaxis]
+            counts = np.bincount(
+                offsets.ravel(), minlength=len(block) * n
+            ).reshape(len(block), n)
+        else:
+            counts = block
+        counts = counts.astype(float)
+        gram = counts.dot(powers)[:, j + k]
+        rhs = counts.dot(ypowers)[..., np.newaxis]
+        try:
+            params = np.linalg.solve(gram, rhs)
+        except np.linalg.LinAlgError:
+            # some resamples do not have enough distinct x-values
+            params = np.linalg.pinv(gram) @ rhs
+        ret[start:end] = y0 + params[..., 0].dot(vander_line.T)
+        start = end
+    return ret
+
+
+#: The criteria for the degree selection of :func:`polyfit_auto`
+POLY_CRITERIA = ["aic", "bic", "press"]
+
+
+def polyfit_auto(x, y, max_deg=6, criterion="bic", weights=None):
+    """Fit polynomials of all degrees up to `max_deg` and select the best
+
+    The polynomials of all degrees are fitted from one QR decomposition of
+    the Vandermonde matrix of the normalized x-data: The fit of degree ``d``
+    only uses the first ``d + 1`` columns of the factorization, such that
+    the residual sums of squares and the diagonals of the hat matrices of
+    all degrees are cumulative sums over these columns. The degree is then
+    selected by the Akaike (``'aic'``) or Bayesian (``'bic'``) information
+    criterion (as in statsmodels) or the leave-one-out cross-validation
+    error (``'press'``, the predicted residual sum of squares
+    ``sum((resid / (1 - hat))**2)``).
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x-data
+    y: np.ndarray
+        The 1D y-data
+    max_deg: int
+        The maximum degree of the polynomial. It is reduced if there are not
+        enough (distinct) data points
+    criterion: {'aic', 'bic', 'press'}
+        The criterion to select the degree
+    weights: np.ndarray
+        The number of data points that each point represents. For the
+        ``'press'``, each weighted point is left out with all the data
+        points that it represents
+
+    Returns
+    -------
+    PolynomialSelection
+        The fit of the selected degree"""
+    if criterion not in POLY_CRITERIA:
+        raise ValueError(
+            "criterion must be one of %s, not %r" % (POLY_CRITERIA, criterion)
+        )
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if weights is None:
+        weights = np.ones_like(x)
+    else:
+        weights = np.asarray(weights, dtype=float)
+    n = weights.sum()
+    center = (x.min() + x.max()) / 2.0
+    scale = (x.max() - x.min()) / 2.0 or 1.0
+    y0 = np.average(y, weights=weights)
+    sqrtw = np.sqrt(weights)
+    max_deg = int(min(max_deg, len(x) - 2, n - 2))
+    if max_deg < 0:
+        raise ValueError("Need at least 2 data points for a polynomial fit")
+    vander = np.vander((x - center) / scale, max_deg + 1, increasing=True)
+    q, r = np.linalg.qr(vander * sqrtw[:, np.newaxis])
+    # drop the degrees whose additional power is (almost) collinear
+    diag = np.abs(np.diag(r))
+    collinear = diag <= diag[0] * 1e-10
+    if collinear.any():
+        max_deg = max(np.argmax(collinear) - 1, 0)
+        q, r = q[:, : max_deg + 1], r[: max_deg + 1, : max_deg + 1]
+    yw = (y - y0) * sqrtw
+    z = q.T.dot(yw)
+    yy = yw.dot(yw)
+    # residual sums of squares of all degrees
+    ssr = np.maximum(yy - np.cumsum(z**2), 0.0)
+    nparams = np.arange(1, max_deg + 2)
+    scores = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        llf = -n / 2.0 * (np.log(2 * np.pi * ssr / n) + 1)
+        scores["aic"] = 2 * nparams - 2 * llf
+        scores["bic"] = np.log(n) * nparams - 2 * llf
+        # the residuals and the leverages of all degrees (of the weighted
+        # points with the weighted residuals)
+        resid = yw[:, np.newaxis] - np.cumsum(q * z, axis=1)
+        hat = np.cumsum(q**2, axis=1)
+        scores["press"] = ((resid / (1 - hat)) ** 2).sum(axis=0)
+    deg = int(np.nanargmin(scores[criterion]))
+    order = deg + 1
+    rd = r[:order, :order]
+    params, cov, rsquared = _solve_poly(
+        rd.T.dot(rd), rd.T.dot(z[:order]), yy, n, center, scale, y0
+    )
+    return PolynomialSelection(params, cov, rsquared, n, criterion, scores)
+
+
+class PolynomialSelection(object):
+    """The polynomial fit of an automatically selected degree
+
+    This class is returned by the :func:`polyfit_auto` function.
+
+    Parameters
+    ----------
+    params: np.ndarray
+        The coefficients of the polynomial, highest power first
+    cov: np.ndarray
+        The covariance matrix of the coefficients
+    rsquared: float
+        The coefficient of determination
+    nobs: float
+        The number of data points
+    criterion: str
+        The criterion that selected the degree
+    scores: dict
+        The scores of all degrees (starting with 0) for each criterion
+
+    Attributes
+    ----------
+    deg: int
+        The selected degree
+    df_resid: float
+        The residual degrees of freedom"""
+
+    def __init__(self, params, cov, rsquared, nobs, criterion, scores):
+        self.params = params
+        self.cov = cov
+        self.rsquared = rsquared
+        self.nobs = nobs
+        self.criterion = criterion
+        self.scores = scores
+        self.deg = len(params) - 1
+        self.df_resid = nobs - len(params)
+
+    def predict(self, x):
+        """Evaluate the polynomial
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The x-data
+
+        Returns
+        -------
+        np.ndarray
+            The fitted values"""
+        return np.polyval(self.params, x)
+
+    @property
+    def attrs(self):
+        """The attributes of the fit
+
+        The dictionary contains the coefficients ``'c0'``, ``'c1'``, ... of
+        the selected ``'degree'``, the ``'rsquared'``, the ``'criterion'``
+        and the scores of all degrees for each criterion (``'aic'``,
+        ``'bic'`` and ``'press'``)"""
+        ret = dict(
+            zip(("c%i" % i for i in range(self.deg + 1)), self.params[::-1])
+        )
+        ret["rsquared"] = self.rsquared
+        ret["degree"] = self.deg
+        ret["criterion"] = self.criterion
+        for key, val in self.scores.items():
+            ret[key] = val.tolist()
+        return ret
+
+
+def _lowess_solve(weights, offsets, counts, sx, sy, sxx, sxy, ym):
+    """Solve the local linear fits of binned data
+
+    Parameters
+    ----------
+    weights: np.ndarray of shape ``(m, nbins)``
+        The kernel weights of the bins for the ``m`` local fits
+    offsets: np.ndarray of shape ``(m, nbins)``
+        The distances of the bin centroids from the points of the local fits
+    counts, sx, sy, sxx, sxy: np.ndarray of shape ``(..., nbins)``
+        The number of data points per bin and the sums of the deviations of
+        the data from the bin centroids and of their squares and products
+    ym: np.ndarray of shape ``(nbins, )``
+        The y-centroids of the bins
+
+    Returns
+    -------
+    np.ndarray of shape ``(..., m)``
+        The local fits at the points
+    np.ndarray of shape ``(..., m)``
+        The slopes of the local fits
+    np.ndarray of shape ``(..., m)``
+        The first row of the inverse weighted Gram matrices (see
+        :meth:`LowessFit.stderr`)"""
+    woff = weights * offsets
+    cy = counts * ym
+    s0 = counts @ weights.T
+    s1 = sx @ weights.T + counts @ woff.T
+    s2 = sxx @ weights.T + 2 * sx @ woff.T + counts @ (woff * offsets).T
+    t0 = (sy + cy) @ weights.T
+    t1 = (sxy + sx * ym) @ weights.T + (sy + cy) @ woff.T
+    det = s0 * s2 - s1 * s1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # fall back to the weighted mean if all weight is on one x-value
+        local = det > 1e-12 * s0 * s2
+        p = np.where(local, s2 / det, 1 / s0)
+        q = np.where(local, -s1 / det, 0)
+        level = p * t0 + q * t1
+        slope = np.where(local, (s0 * t1 - s1 * t0) / det, 0)
+    return level, slope, (p, q)
+
+
+class LowessFit(object):
+    """A locally weighted linear regression (LOWESS) of binned data
+
+    The data is aggregated into the sums of equally spaced bins along the
+    x-axis (or of its unique x-values, if there are not more data points
+    than bins) in one pass. The local linear fits with the tricube kernel of
+    the nearest ``frac * n`` data points are then only computed on the
+    points where the fit is evaluated, with the bin centroids as the
+    distances to the kernel. This costs ``O(n + m * nbins)`` for ``m``
+    evaluation points instead of ``O(n**2)``. There are no robustifying
+    iterations.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x-data
+    y: np.ndarray
+        The 1D y-data
+    frac: float
+        The fraction of the data that is used for each local fit
+    bins: int
+        The maximum number of bins
+    weights: np.ndarray
+        The number of data points that each point represents
+
+    Attributes
+    ----------
+    n: float
+        The number of data points
+    rsquared: float
+        The coefficient of determination of the fit at the bin centroids
+    dof: float
+        The residual degrees of freedom, i.e. `n` minus the trace of the
+        smoother matrix
+    sigma: float
+        The estimated standard deviation of the residuals"""
+
+    def __init__(self, x, y, frac=2.0 / 3.0, bins=1000, weights=None):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.frac = frac
+        if len(x) <= bins:
+            self._unique = np.unique(x)
+        else:
+            self._unique = None
+            self._xmin = x.min()
+            self._width = (x.max() - self._xmin) / bins or 1.0
+            self._nbins = bins
+            self._bin_map = None
+        codes = self.bin(x)
+        if self._unique is None:
+            # drop the empty bins
+            keep = np.bincount(codes, minlength=bins) > 0
+            self._bin_map = np.cumsum(keep) - 1
+            codes = self._bin_map[codes]
+        nbins = codes.max() + 1
+        counts = np.bincount(codes, weights, nbins).astype(float)
+        self.counts = counts
+        self.n = counts.sum()
+        self.xm = np.bincount(codes, x if weights is None else weights * x)
+        self.ym = np.bincount(codes, y if weights is None else weights * y)
+        self.xm /= counts
+        self.ym /= counts
+        dx = x - self.xm[codes]
+        dy = y - self.ym[codes]
+        if weights is not None:
+            dx, dy = dx * np.sqrt(weights), dy * np.sqrt(weights)
+        self.sxx, self.sxy, self.syy = (
+            np.bincount(codes, arr, nbins)
+            for arr in [dx * dx, dx * dy, dy * dy]
+        )
+
+        # evaluate the fit at the bin centroids for the residuals
+        level, slope, (p, q) = self._solve(self.xm)
+        rss = (
+            self.syy
+            - 2 * slope * self.sxy
+            + slope**2 * self.sxx
+            + counts * (self.ym - level) ** 2
+        ).sum()
+        ymean = counts.dot(self.ym) / self.n
+        sst = (self.syy + counts * (self.ym - ymean) ** 2).sum()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.rsquared = 1 - rss / sst
+            self.dof = self.n - counts.dot(p)
+            self.sigma = np.sqrt(rss / self.dof)
+
+    def bin(self, x):
+        """Get the bins of x-data
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The x-data within the range of the fitted data
+
+        Returns
+        -------
+        np.ndarray of int
+            The index of the bin of each value in `x`"""
+        if self._unique is not None:
+            return np.searchsorted(self._unique, x)
+        codes = np.clip(
+            ((x - self._xmin) / self._width).astype(int), 0, self._nbins - 1
+        )
+        if self._bin_map is None:
+            return codes
+        return self._bin_map[codes]
+
+    def kernel(self, x_line):
+        """Get the kernel weights of the bins for the local fits
+
+        Parameters
+        ----------
+        x_line: np.ndarray
+            The points of the local fits
+
+        Returns
+        -------
+        np.ndarray of shape ``(len(x_line), nbins)``
+            The tricube weights of the bins
+        np.ndarray of shape ``(len(x_line), nbins)``
+            The distances of the bin centroids from `x_line`"""
+        x_line = np.asarray(x_line, dtype=float)
+        offsets = self.xm[np.newaxis] - x_line[:, np.newaxis]
+        dist = np.abs(offsets)
+        order = np.argsort(dist, axis=1)
+        cumcounts = np.cumsum(self.counts[order], axis=1)
+        # the radius is the distance to the nearest frac * n data points
+        nearest = (cumcounts < self.frac * self.n).sum(axis=1)
+        nearest = np.minimum(nearest, len(self.xm) - 1)
+        radius = np.take_along_axis(
+            np.take_along_axis(dist, order, 1), nearest[:, np.newaxis], 1
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            u = np.minimum(dist / radius, 1.0)
+        weights = 1 - u * u * u
+        weights *= weights * weights
+        weights = np.where(radius > 0, weights, dist == 0)
+        return weights, offsets
+
+    def _solve(self, x_line):
+        weights, offsets = self.kernel(x_line)
+        zeros = np.zeros_like(self.counts)
+        return _lowess_solve(
+            weights,
+            offsets,
+            self.counts,
+            zeros,
+            zeros,
+            self.sxx,
+            self.sxy,
+            self.ym,
+        )
+
+    def predict(self, x_line):
+        """Evaluate the fit
+
+        Parameters
+        ----------
+        x_line: np.ndarray
+            The x-data to evaluate the fit on
+
+        Returns
+        -------
+        np.ndarray
+            The local fits at `x_line`"""
+        return self._solve(x_line)[0]
+
+    def stderr(self, x_line):
+        """Estimate the standard error of the fit
+
+        The LOWESS fit is a linear smoother, i.e. the fit at ``x'`` is
+        ``sum(l_i * y_i)`` and its variance is ``sigma**2 * sum(l_i**2)``.
+
+        Parameters
+        ----------
+        x_line: np.ndarray
+            The x-data to evaluate the fit on
+
+        Returns
+        -------
+        np.ndarray
+            The standard errors of the fit at `x_line`"""
+        weights, offsets = self.kernel(x_line)
+        zeros = np.zeros_like(self.counts)
+        p, q = _lowess_solve(
+            weights,
+            offsets,
+            self.counts,
+            zeros,
+            zeros,
+            self.sxx,
+            self.sxy,
+            self.ym,
+        )[2]
+        w2 = weights * weights
+        w2off = w2 * offsets
+        sumsq = (
+            p**2 * (w2 @ self.counts)
+            + 2 * p * q * (w2off @ self.counts)
+            + q**2 * (w2 @ self.sxx + (w2off * offsets) @ self.counts)
+        )
+        return self.sigma * np.sqrt(sumsq)
+
+    def bootstrap(
+        self,
+        x,
+        y,
+        x_line,
+        n_boot,
+        random_seed=None,
+        max_memory=None,
+        weights=None,
+    ):
+        """Bootstrap the fit
+
+        The resamples are aggregated into the bins of this fit and their
+        local fits are solved all at once with the kernel weights of this
+        fit.
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The x-data that has been used for this fit
+        y: np.ndarray
+            The y-data that has been used for this fit
+        x_line: np.ndarray
+            The x-data to evaluate the fits on
+        n_boot: int
+            The number of resamples
+        random_seed: int
+            The seed for the random number generator (see
+            :func:`get_random_state`)
+        max_memory: float
+            The memory budget in megabytes (see :func:`get_block_size`)
+        weights: np.ndarray
+            The number of data points that each point represents (see
+            :func:`iter_multinomial`)
+
+        Returns
+        -------
+        np.ndarray of shape ``(n_boot, len(x_line))``
+            The fits of the resamples evaluated on `x_line`"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        codes = self.bin(x)
+        dx = x - self.xm[codes]
+        dy = y - self.ym[codes]
+        features = [np.ones_like(dx), dx, dy, dx * dx, dx * dy]
+        kernel, offsets = self.kernel(x_line)
+        npoints, nbins = len(x), len(self.xm)
+        n_boot = int(n_boot)
+        ret = np.empty((n_boot, len(kernel)))
+        # we hold the counts, the bin indices and one feature at once
+        block_size = get_block_size(npoints, n_boot, 4, max_memory)
+        random_state = get_random_state(random_seed)
+        if weights is None:
+            blocks = (
+                np.bincount(
+                    (
+                        indices + npoints * np.arange(len(indices))[:, None]
+                    ).ravel(),
+                    minlength=indices.size,
+                ).reshape(indices.shape)
+                for indices in iter_resamples(
+                    npoints, n_boot, random_state, block_size
+                )
+            )
+        else:
+            blocks = iter_multinomial(
+                weights, n_boot, random_state, block_size
+            )
+        start = 0
+        for counts in blocks:
+            end = start + len(counts)
+            flat = (codes + nbins * np.arange(len(counts))[:, None]).ravel()
+            sums = [
+                np.bincount(
+                    flat, (counts * feature).ravel(), len(counts) * nbins
+                ).reshape(len(counts), nbins)
+                for feature in features
+            ]
+            ret[start:end] = _lowess_solve(kernel, offsets, *sums, self.ym)[0]
+            start = end
+        return ret
+
+
+class SmoothingSpline(object):
+    """A cubic smoothing spline
+
+    The spline minimizes ``sum(w * (y - f(x))**2) + lam * int(f''(x)**2)``.
+    It is computed by :func:`scipy.interpolate.make_smoothing_spline` which
+    solves a banded system in ``O(n)`` for the unique x-values (the data
+    points with the same x-value are aggregated into their weighted mean).
+    If there are more data points than `bins`, the data is aggregated into
+    the weighted centroids of equally spaced bins along the x-axis instead.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        The 1D x-data
+    y: np.ndarray
+        The 1D y-data
+    lam: float
+        The smoothing parameter. If None, it is selected by generalized
+        cross-validation
+    weights: np.ndarray
+        The number of data points that each point represents
+    bins: int
+        The maximum number of knots of the spline. If None, all unique
+        x-values are knots
+
+    Attributes
+    ----------
+    spline: scipy.interpolate.BSpline
+        The fitted spline
+    lam: float
+        The smoothing parameter of the fit
+    n: float
+        The number of data points
+    rsquared: float
+        The coefficient of determination"""
+
+    def __init__(self, x, y, lam=None, weights=None, bins=None):
+        if make_smoothing_spline is None:
+            raise ImportError(
+                "Smoothing splines require scipy>=1.10 with the "
+                "scipy.interpolate.make_smoothing_spline function!"
+            )
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        w = np.ones_like(x) if weights is None else np.asarray(weights, float)
+        if bins is not None and len(x) > bins:
+            xmin = x.min()
+            width = (x.max() - xmin) / bins or 1.0
+            codes = np.minimum(((x - xmin) / width).astype(int), bins - 1)
+            # drop the empty bins
+            keep = np.bincount(codes, minlength=bins) > 0
+            inverse = (np.cumsum(keep) - 1)[codes]
+            self.weights = np.bincount(inverse, w)
+            self.x = np.bincount(inverse, w * x) / self.weights
+        else:
+            self.x, inverse = np.unique(x, return_inverse=True)
+            self.weights = np.bincount(inverse, w)
+        self.y = np.bincount(inverse, w * y) / self.weights
+        self.n = w.sum()
+        self.spline = make_smoothing_spline(
+            self.x, self.y, w=self.weights, lam=lam
+        )
+        self.lam = self._get_lam() if lam is None else lam
+        ss_res = (w * (y - self.spline(x)) ** 2).sum()
+        ss_tot = (w * (y - np.average(y, weights=w)) ** 2).sum()
+        self.rsquared = 1 - ss_res / ss_tot
+
+    def _get_lam(self):
+        """Get the smoothing parameter of the spline
+
+        The jumps of the third derivative of the spline at the knots are
+        the weighted residuals divided by the smoothing parameter."""
+        third = self.spline.derivative(3)(0.5 * (self.x[1:] + self.x[:-1]))
+        jumps = np.diff(np.r_[0, third, 0])
+        residuals = self.weights * (self.y - self.spline(self.x))
+        denom = jumps.dot(jumps)
+        return residuals.dot(jumps) / denom if denom else 0.0
+
+    def predict(self, x_line):
+        """Evaluate the spline
+
+        Parameters
+        ----------
+        x_line: np.ndarray
+            The x-data to evaluate the spline on
+
+        Returns
+        -------
+        np.ndarray
+            The values of the spline"""
+        return self.spline(x_line)
+
+    def bootstrap(self, x_line, n_boot, random_seed=None, max_memory=None):
+        """Bootstrap the spline through its residuals
+
+        The (standardized) residuals of the unique x-values are resampled
+        and added to the fit. Since the smoothing parameter and the
+        x-values are the same for all resamples, the splines of a block of
+        resamples are computed with one factorization of the banded system
+        (if scipy supports it, see :data:`SPLINE_BATCHES`, otherwise one
+        after another).
+
+        Parameters
+        ----------
+        x_line: np.ndarray
+            The x-data to evaluate the splines on
+        n_boot: int
+            The number of resamples
+        random_seed: int
+            The seed for the random number generator (see
+            :func:`get_random_state`)
+        max_memory: float
+            The memory budget in megabytes (see :func:`get_block_size`)
+
+        Returns
+        -------
+        np.ndarray of shape ``(n_boot, len(x_line))``
+            The splines of the resamples evaluated on `x_line`"""
+        fitted = self.spline(self.x)
+        scale = np.sqrt(self.weights)
+        residuals = scale * (self.y - fitted)
+        n_boot = int(n_boot)
+        ret = np.empty((n_boot, len(x_line)))
+        # we hold the indices, the resampled data and the coefficients
+        block_size = get_block_size(len(self.x), n_boot, 3, max_memory)
+        start = 0
+        for indices in iter_resamples(
+            len(self.x), n_boot, get_random_state(random_seed), block_size
+        ):
+            end = start + len(indices)
+            y = fitted + residuals[indices] / scale
+            if SPLINE_BATCHES:
+                spline = make_smoothing_spline(
+                    self.x, y.T, w=self.weights, lam=self.lam
+                )
+                ret[start:end] = spline(x_line).T
+            else:
+                for j, yj in enumerate(y, start):
+                    spline = make_smoothing_spline(
+                        self.x, yj, w=self.weights, lam=self.lam
+                    )
+                    ret[j] = spline(x_line)
+            start = end
+        return ret
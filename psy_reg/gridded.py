@@ -0,0 +1,270 @@
+"""Regressions along one dimension of gridded data
+
+This module defines the :func:`fit_along` function that fits the data of
+every grid cell along one dimension (e.g. the time) at once and returns the
+parameters of the fits as an :class:`xarray.Dataset`, e.g. to visualize
+trend maps with the :class:`psy_reg.plotters.FitMapPlotter`, and the
+:func:`rolling_fit` function for moving-window fits of a series."""
+
+# SPDX-FileCopyrightText: 2021-2024 Helmholtz-Zentrum hereon GmbH
+# SPDX-FileCopyrightText: 2020-2021 Helmholtz-Zentrum Geesthacht
+# SPDX-FileCopyrightText: 2016-2024 University of Lausanne
+#
+# SPDX-License-Identifier: LGPL-3.0-only
+
+import numpy as np
+import xarray as xr
+from scipy import stats
+
+from psy_reg.algorithms import CumulativeSums, LinearSums, polyfit_along
+
+
+def get_fit_params(fit, fix=None):
+    """Get the names of the parameters of a fit
+
+    Parameters
+    ----------
+    fit: str
+        The fit method (see :func:`fit_along`)
+    fix: list of float
+        The fix point of a linear fit
+
+    Returns
+    -------
+    list of str
+        The names of the fitted parameters"""
+    if fit.lower().startswith("poly"):
+        return ["c%i" % i for i in range(int(fit[4:]) + 1)]
+    elif fit not in ["fit", "linear"]:
+        raise ValueError(
+            "Only linear ('fit' or 'linear') and polynomial ('poly<deg>') "
+            "fits are supported for gridded data, not %r" % (fit,)
+        )
+    return ["slope"] if fix is not None else ["intercept", "slope"]
+
+
+def _fit_kernel(x, y, fit, fix, ci):
+    """Fit along the last axis and stack the results along a new axis"""
+    if fit.lower().startswith("poly"):
+        params, cov, rsquared, n = polyfit_along(x, y, int(fit[4:]))
+        # sort from the lowest to the highest power
+        params = params[..., ::-1]
+        err = np.sqrt(np.diagonal(cov, axis1=-2, axis2=-1))[..., ::-1]
+        dof = n - params.shape[-1]
+    else:
+        results = LinearSums.along(x, y).fit(fix)
+        params = results.params
+        err = results.bse
+        rsquared = results.rsquared
+        n = results.nobs
+        dof = results.df_resid
+    ret = [params, err]
+    if ci is not None:
+        with np.errstate(invalid="ignore"):
+            crit = stats.t.ppf(0.5 + ci / 200.0, dof)
+        ret.append(2 * crit[..., np.newaxis] * err)
+    ret.append(rsquared[..., np.newaxis])
+    ret.append(n[..., np.newaxis])
+    return np.concatenate(ret, axis=-1).astype(float)
+
+
+def fit_along(da, dim=None, fit="fit", fix=None, ci=95, coord=None):
+    """Fit the data along one dimension for all other grid points at once
+
+    The fits are computed with vectorized sufficient statistics (for linear
+    fits, see :meth:`psy_reg.algorithms.LinearSums.along`) or batched normal
+    equations (for polynomials, see :func:`psy_reg.algorithms.polyfit_along`)
+    for all grid points at once. Dask arrays are processed chunk by chunk.
+    Missing values are ignored.
+
+    Parameters
+    ----------
+    da: xarray.DataArray
+        The data to fit
+    dim: str
+        The dimension to fit along. If None, the first dimension of `da` is
+        used
+    fit: str
+        The fit method. Either ``'fit'`` (or ``'linear'``) for a linear fit
+        or ``'poly<deg>'`` for a polynomial of degree ``<deg>``
+    fix: float or list of float
+        The point ``(x', y')`` that a linear fit has to go through. A single
+        float ``f`` stands for ``(0, f)``
+    ci: float
+        The size of the confidence interval between 0 and 100 for the widths
+        of the confidence intervals of the parameters. If None, they are not
+        computed
+    coord: str or xarray.DataArray
+        The x-data for the fit. If None, the coordinate of `dim` is used
+
+    Returns
+    -------
+    xarray.Dataset
+        The dataset with the dimensions of `da` but `dim`. It contains the
+        fitted parameters (``'intercept'`` and ``'slope'`` for a linear fit
+        or ``'c0'``, ``'c1'``, ... for a polynomial), their standard errors
+        (``'<param>_err'``), the widths of their confidence intervals
+        (``'<param>_ci'``), the coefficient of determination
+        (``'rsquared'``) and the number of data points (``'nobs'``)"""
+    if dim is None:
+        dim = da.dims[0]
+    if coord is None:
+        x = da[dim]
+    elif isinstance(coord, str):
+        x = da.coords[coord]
+    else:
+        x = coord
+    if fix is not None and np.ndim(fix) == 0:
+        fix = [0, fix]
+    params = get_fit_params(fit, fix)
+    names = params + [p + "_err" for p in params]
+    if ci is not None:
+        names += [p + "_ci" for p in params]
+    names += ["rsquared", "nobs"]
+    stacked = xr.apply_ufunc(
+        _fit_kernel,
+        x,
+        da,
+        input_core_dims=[[dim], [dim]],
+        output_core_dims=[["parameter"]],
+        kwargs=dict(fit=fit, fix=fix, ci=ci),
+        dask="parallelized",
+        output_dtypes=[float],
+        dask_gufunc_kwargs=dict(
+            output_sizes={"parameter": len(names)}, allow_rechunk=True
+        ),
+    )
+    ds = stacked.assign_coords(parameter=names).to_dataset("parameter")
+    ds = ds.drop_vars("parameter", errors="ignore")
+    name = da.name or "data"
+    for param in params:
+        ds[param].attrs["long_name"] = "%s of the fit of %s" % (param, name)
+        ds[param + "_err"].attrs["long_name"] = "Standard error of " + param
+        if ci is not None:
+            ds[param + "_ci"].attrs["long_name"] = (
+                "Width of the %s%% confidence interval of %s" % (ci, param)
+            )
+    ds["rsquared"].attrs["long_name"] = "Coefficient of determination"
+    ds["nobs"].attrs["long_name"] = "Number of data points"
+    ds.attrs.update(fit=fit, fit_dim=dim)
+    if fix is not None:
+        ds.attrs["fix"] = list(fix)
+    if ci is not None:
+        ds.attrs["ci"] = ci
+    return ds
+
+
+#: The parameters of the :func:`rolling_fit`
+ROLLING_PARAMS = ["intercept", "slope", "slope_err", "rsquared", "nobs"]
+
+
+def rolling_fit(
+    da,
+    window,
+    fit="fit",
+    fix=None,
+    xrange=None,
+    yrange=None,
+    center=False,
+    min_periods=None,
+    coord=None,
+):
+    """Fit a line within a moving window of a series
+
+    The least squares fits of all window positions are computed from the
+    cumulative sums of the data (see
+    :class:`psy_reg.algorithms.CumulativeSums`), i.e. in ``O(n)`` for all
+    windows instead of one fit per window. Missing values are ignored.
+
+    Parameters
+    ----------
+    da: xarray.DataArray
+        The 1D data to fit
+    window: int
+        The number of data points of the window
+    fit: str
+        The fit method. Only linear fits (``'fit'`` or ``'linear'``) are
+        supported
+    fix: float or list of float
+        The point ``(x', y')`` that the fits have to go through. A single
+        float ``f`` stands for ``(0, f)`` (see the
+        :attr:`~psy_reg.plotters.LinRegPlotter.fix` formatoption)
+    xrange: tuple of float
+        The minimum and maximum x-value of the data points that are used
+        (see the :attr:`~psy_reg.plotters.LinRegPlotter.xrange`
+        formatoption). If None, all data points are used
+    yrange: tuple of float
+        The minimum and maximum y-value of the data points that are used
+    center: bool
+        If True, the fits are labeled at the center of their window,
+        otherwise at the end (as for :meth:`xarray.DataArray.rolling`)
+    min_periods: int
+        The minimum number of valid data points within a window. If None,
+        it defaults to `window`. Fits of windows with less data points are
+        NaN
+    coord: str or xarray.DataArray
+        The x-data for the fit. If None, the coordinate of `da` is used
+
+    Returns
+    -------
+    xarray.DataArray
+        The fits with the ``'parameter'`` dimension (``'intercept'``,
+        ``'slope'``, ``'slope_err'``, ``'rsquared'`` and ``'nobs'``) and the
+        dimension of `da`, e.g. ``rolling_fit(da, 30).sel(parameter='slope')``
+        can be visualized with the
+        :class:`psy_simple.plotters.LinePlotter`"""
+    if da.ndim != 1:
+        raise ValueError(
+            "Rolling fits are only supported for 1D data, not for %iD"
+            % da.ndim
+        )
+    get_fit_params(fit, fix)
+    if fit.lower().startswith("poly"):
+        raise ValueError("Rolling fits are only supported for linear fits")
+    dim = da.dims[0]
+    if coord is None:
+        x = da[dim]
+    elif isinstance(coord, str):
+        x = da.coords[coord]
+    else:
+        x = coord
+    if fix is not None and np.ndim(fix) == 0:
+        fix = [0, fix]
+    if min_periods is None:
+        min_periods = window
+    x = np.asarray(x.values, dtype=float)
+    y = np.asarray(da.values, dtype=float)
+    mask = np.ones(len(x), dtype=bool)
+    if xrange is not None:
+        mask &= (x >= xrange[0]) & (x <= xrange[1])
+    if yrange is not None:
+        mask &= (y >= yrange[0]) & (y <= yrange[1])
+    cumsums = CumulativeSums(x, np.where(mask, y, np.nan))
+    # the windows are truncated at the start and the end of the series
+    stop = np.arange(1, len(x) + 1) + (window // 2 if center else 0)
+    start = np.clip(stop - window, 0, len(x))
+    stop = np.minimum(stop, len(x))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        results = cumsums.sums(start, stop).fit(fix)
+    slope = results.params[:, -1]
+    if fix is None:
+        intercept = results.params[:, 0]
+    else:
+        intercept = fix[1] - slope * fix[0]
+    nobs = results.nobs
+    data = np.array(
+        [intercept, slope, results.bse[:, -1], results.rsquared, nobs],
+        dtype=float,
+    )
+    data[:-1, nobs < max(min_periods, 1)] = np.nan
+    ret = xr.DataArray(
+        data,
+        dims=("parameter", dim),
+        coords={"parameter": ROLLING_PARAMS, dim: da[dim]},
+        name=da.name,
+        attrs=da.attrs.copy(),
+    )
+    ret.attrs.update(fit=fit, window=window, center=int(center))
+    if fix is not None:
+        ret.attrs["fix"] = list(fix)
+    return ret
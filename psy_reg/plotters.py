@@ -14,8 +14,11 @@ to fit a linear model to the data and visualize it."""
 from __future__ import division
 
 import inspect
+import zlib
+from collections import OrderedDict, defaultdict
+from copy import deepcopy
 from functools import partial
-from itertools import cycle, islice, repeat
+from itertools import count, cycle, islice, repeat
 
 import numpy as np
 import psy_simple.base as psypb
@@ -26,9 +29,34 @@ from psyplot import rcParams
 from psyplot.data import CFDecoder, InteractiveList, safe_list
 from psyplot.docstring import docstrings
 from psyplot.plotter import END, START, Formatoption, Plotter
+from scipy import stats
 from xarray import DataArray, Variable
 
-from psy_reg.utils import GenericModel
+from psy_reg.algorithms import (
+    CumulativeSums,
+    LinearSums,
+    LowessFit,
+    PolynomialSums,
+    SmoothingSpline,
+    analytic_ci,
+    batch_polyfit,
+    huber_irls,
+    is_dask_array,
+    iter_multinomial,
+    linear_bootstrap,
+    median_bootstrap,
+    parallel_bootstrap,
+    poly_bootstrap,
+    polyfit,
+    polyfit_auto,
+    robust_bootstrap,
+    segmented,
+    siegel,
+    theil_sen,
+    unique_points,
+)
+from psy_reg.gridded import fit_along, rolling_fit
+from psy_reg.utils import GenericModel, fingerprint, function_model, rsquared
 
 
 class LinRegTranspose(psyps.Transpose):
@@ -205,7 +233,9 @@ class InitialParameters(Formatoption):
 
     Note that the automatic estimation uses the boundaries of the
     :attr:`param_bounds` formatoption. This only works if the boundaries are
-    given for each parameter and finite.
+    given for each parameter and finite. The estimate is computed only once
+    per array and the bootstrap resamples of the :attr:`ci` formatoption are
+    initialized with the parameters of the fit to the full data.
 
     Possible types
     --------------
@@ -231,6 +261,14 @@ class InitialParameters(Formatoption):
 
     connections = ["fit"]
 
+    #: The maximum number of automatically estimated parameters that are kept
+    #: in memory
+    cache_size = 32
+
+    def __init__(self, *args, **kwargs):
+        super(InitialParameters, self).__init__(*args, **kwargs)
+        self._cache = {}
+
     def update(self, value):
         # the parameters are set via the :attr:`p0` property
         pass
@@ -244,12 +282,489 @@ class InitialParameters(Formatoption):
         return val
 
     def _estimate_p0(self, i):
+        """Estimate the initial parameters for the array at `i`
+
+        The estimation is memoized for the model, the data and the
+        boundaries such that it is only computed once per array"""
         model = self.fit.model
         bounds = self.param_bounds.bounds[i]
         da = next(islice(self.iter_raw_data, i, i + 1))
         x, xname, y, yname = self.fit.get_xy(i, da)
 
-        return model.estimate_p0(x, y, bounds)
+        key = (model, repr(bounds), fingerprint(x, y))
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        p0 = self._cache[key] = model.estimate_p0(x, y, bounds)
+        if len(self._cache) > self.cache_size:
+            del self._cache[next(iter(self._cache))]
+        return p0
+
+
+def fit_generic(model, x, y, x_line, **kwargs):
+    """Fit a model with a ``fit`` and ``predict`` method
+
+    Parameters
+    ----------
+    model: object
+        The model with a ``model.fit(x, y).predict(x)`` signature
+    x: np.ndarray
+        The x-data for the fit
+    y: np.ndarray
+        The y-data for the fit
+    x_line: np.ndarray
+        The x-data to evaluate the fit on
+
+    Returns
+    -------
+    np.ndarray
+        `x_line`
+    np.ndarray
+        The predicted values on `x_line`
+    dict
+        The attributes of the fit
+    object
+        The fitted model"""
+    fit = model.fit(x, y)
+    return x_line, fit.predict(x_line), getattr(fit, "attrs", {}), fit
+
+
+def fit_curve(model, x, y, x_line, **kwargs):
+    """Fit a :class:`~psy_reg.utils.GenericModel` to the data
+
+    Parameters
+    ----------
+    model: type
+        The :class:`~psy_reg.utils.GenericModel` subclass
+    x: np.ndarray
+        The x-data for the fit
+    y: np.ndarray
+        The y-data for the fit
+    x_line: np.ndarray
+        The x-data to evaluate the fit on
+    ``**kwargs``
+        Any other keyword argument for the :func:`scipy.optimize.curve_fit`
+        function
+
+    Returns
+    -------
+    np.ndarray
+        `x_line`
+    np.ndarray
+        The predicted values on `x_line`
+    dict
+        The attributes of the fit
+    object
+        The fitted model"""
+    kwargs.pop("fix", None)
+    fit = model.fit(x, y, **kwargs)
+    return x_line, fit.predict(x_line), getattr(fit, "attrs", {}), fit
+
+
+def fit_poly(model, x, y, x_line, **kwargs):
+    """Fit a polynomial to the data
+
+    Parameters
+    ----------
+    model: function
+        The function to compute the polynomial coefficients and their
+        covariance matrix from `x` and `y` (see
+        :func:`psy_reg.algorithms.polyfit`)
+
+    Notes
+    -----
+    The other parameters and the return values are the same as for the
+    :func:`fit_generic` function"""
+    weights = kwargs.get("weights")
+    if weights is not None:
+        params, pcov = model(x, y, weights=weights)
+    else:
+        params, pcov = model(x, y)
+    # calculate rsquared (with the horner scheme that also works for dask)
+    fitted = 0
+    for c in params:
+        fitted = fitted * x + c
+    if weights is not None:
+        return poly_line(params, pcov, rsquared(fitted, y, weights), x_line)
+    ss_res = ((y - fitted) ** 2).sum()
+    ss_tot = ((y - y.mean()) ** 2).sum()
+    if is_dask_array(ss_res):
+        import dask
+
+        ss_res, ss_tot = dask.compute(ss_res, ss_tot)
+    return poly_line(params, pcov, 1 - (ss_res / ss_tot), x_line)
+
+
+def fit_poly_auto(model, x, y, x_line, weights=None, **kwargs):
+    """Fit a polynomial of an automatically selected degree to the data
+
+    The maximum degree and the selection criterion are taken from the
+    ``'plotter.linreg.poly_auto.max_deg'`` and
+    ``'plotter.linreg.poly_auto.criterion'`` items of the
+    :attr:`~psyplot.config.rcsetup.rcParams`, unless `model` defines them.
+
+    Parameters
+    ----------
+    model: function
+        The function to create the
+        :class:`psy_reg.algorithms.PolynomialSelection` from `x` and `y`
+        (see :func:`psy_reg.algorithms.polyfit_auto`)
+    weights: np.ndarray
+        The number of data points that each point represents
+
+    Notes
+    -----
+    The other parameters and the return values are the same as for the
+    :func:`fit_generic` function"""
+    keywords = {
+        "max_deg": rcParams["plotter.linreg.poly_auto.max_deg"],
+        "criterion": rcParams["plotter.linreg.poly_auto.criterion"],
+    }
+    keywords.update(getattr(model, "keywords", {}))
+    fit = model(x, y, weights=weights, **keywords)
+    return x_line, fit.predict(x_line), fit.attrs, fit
+
+
+def poly_line(params, pcov, rsquared, x_line):
+    """Evaluate a polynomial fit on the line and get its attributes
+
+    Parameters
+    ----------
+    params: np.ndarray
+        The coefficients of the polynomial, highest power first
+    pcov: np.ndarray
+        The covariance matrix of the coefficients
+    rsquared: float
+        The coefficient of determination
+    x_line: np.ndarray
+        The x-data to evaluate the fit on
+
+    Notes
+    -----
+    The return values are the same as for the :func:`fit_generic` function
+    """
+    d = dict(zip(("c%i" % i for i in range(len(params))), params[::-1]))
+    if pcov.size == 1:
+        d["c0_err"] = np.sqrt(pcov)[0, 0]
+    d["rsquared"] = rsquared
+    return x_line, np.poly1d(params)(x_line), d, pcov
+
+
+def fit_lowess(model, x, y, x_line, weights=None, **kwargs):
+    """Make a locally weighted linear regression (LOWESS)
+
+    The fraction of the data for each local fit and the number of bins are
+    taken from the ``'plotter.linreg.lowess.frac'`` and
+    ``'plotter.linreg.lowess.bins'`` items of the
+    :attr:`~psyplot.config.rcsetup.rcParams`.
+
+    Parameters
+    ----------
+    model: type
+        The :class:`psy_reg.algorithms.LowessFit` class
+    weights: np.ndarray
+        The number of data points that each point represents
+
+    Notes
+    -----
+    The other parameters and the return values are the same as for the
+    :func:`fit_generic` function"""
+    fit = model(
+        x,
+        y,
+        frac=rcParams["plotter.linreg.lowess.frac"],
+        bins=rcParams["plotter.linreg.lowess.bins"],
+        weights=weights,
+    )
+    return x_line, fit.predict(x_line), {"rsquared": fit.rsquared}, fit
+
+
+def fit_spline(model, x, y, x_line, weights=None, **kwargs):
+    """Fit a smoothing spline to the data
+
+    The maximum number of knots is taken from the
+    ``'plotter.linreg.spline.bins'`` item of the
+    :attr:`~psyplot.config.rcsetup.rcParams`.
+
+    Parameters
+    ----------
+    model: function
+        The function to create the
+        :class:`psy_reg.algorithms.SmoothingSpline` from `x` and `y`
+    weights: np.ndarray
+        The number of data points that each point represents
+
+    Notes
+    -----
+    The other parameters and the return values are the same as for the
+    :func:`fit_generic` function"""
+    fit = model(
+        x, y, weights=weights, bins=rcParams["plotter.linreg.spline.bins"]
+    )
+    attrs = {"rsquared": fit.rsquared, "lam": fit.lam}
+    return x_line, fit.predict(x_line), attrs, fit
+
+
+def fit_segmented(model, x, y, x_line, weights=None, **kwargs):
+    """Fit a continuous piecewise linear function to the data
+
+    Parameters
+    ----------
+    model: function
+        The function to create the
+        :class:`psy_reg.algorithms.SegmentedFitResults` from `x` and `y`
+        (see :func:`psy_reg.algorithms.segmented`)
+    weights: np.ndarray
+        The number of data points that each point represents
+
+    Notes
+    -----
+    The other parameters and the return values are the same as for the
+    :func:`fit_generic` function"""
+    fit = model(x, y, weights=weights)
+    return x_line, fit.predict(x_line), fit.attrs, fit
+
+
+def fit_statsmodels(model, x, y, x_line, fix=None, weights=None):
+    """Make a linear fit of x to y with statsmodels
+
+    Ordinary least squares fits of 1D data are computed in closed form by the
+    :class:`psy_reg.algorithms.LinearSums`, unless the
+    ``'plotter.linreg.ols.engine'`` item of the
+    :attr:`~psyplot.config.rcsetup.rcParams` is ``'statsmodels'``. Robust
+    fits of 1D data are computed by the :func:`psy_reg.algorithms.huber_irls`
+    function, unless the ``'plotter.linreg.robust.engine'`` item is
+    ``'statsmodels'``.
+
+    Parameters
+    ----------
+    model: type
+        The statsmodels model class (:class:`statsmodels.api.OLS` or
+        :class:`statsmodels.api.RLM`)
+    fix: list of float
+        The point ``(x', y')`` that the fit has to go through
+    weights: np.ndarray
+        The number of data points that each point represents. This is only
+        supported for ordinary least squares fits of 1D data which are then
+        always computed by the :class:`psy_reg.algorithms.LinearSums`
+
+    Notes
+    -----
+    The other parameters and the return values are the same as for the
+    :func:`fit_generic` function"""
+    if (
+        model is sm.OLS
+        and x.ndim == 1
+        and (
+            weights is not None
+            or rcParams["plotter.linreg.ols.engine"] == "sums"
+        )
+    ):
+        sums = LinearSums(x, y, weights=weights)
+        return linear_line(sums.fit(fix), x_line, fix)
+    elif (
+        model is sm.RLM
+        and x.ndim == 1
+        and rcParams["plotter.linreg.robust.engine"] == "irls"
+    ):
+        return linear_line(huber_irls(x, y, fix), x_line, fix)
+    if fix is None:
+        if x.ndim < 2:
+            x = sm.add_constant(x)
+    elif fix != [0, 0]:
+        x = x - fix[0]
+        y = y - fix[1]
+    return linear_line(model(y, x).fit(), x_line, fix)
+
+
+def fit_median(model, x, y, x_line, fix=None):
+    """Make a linear fit based on the median of slopes
+
+    Parameters
+    ----------
+    model: function
+        The function that computes the intercept and the slope (see
+        :func:`psy_reg.algorithms.theil_sen` and
+        :func:`psy_reg.algorithms.siegel`)
+    fix: list of float
+        The point ``(x', y')`` that the fit has to go through
+
+    Notes
+    -----
+    The other parameters and the return values are the same as for the
+    :func:`fit_generic` function"""
+    intercept, slope = model(x, y, fix)
+    d = dict(
+        slope=slope,
+        intercept=intercept,
+        rsquared=rsquared(intercept + slope * x, y),
+    )
+    return x_line, intercept + slope * x_line, d, np.array([intercept, slope])
+
+
+def linear_line(fit, x_line, fix=None):
+    """Evaluate a linear fit on the line and get its attributes
+
+    Parameters
+    ----------
+    fit: object
+        The statsmodels results or the
+        :class:`psy_reg.algorithms.LinearFitResults` of the fit
+    x_line: np.ndarray
+        The x-data to evaluate the fit on
+    fix: list of float
+        The point ``(x', y')`` that the fit went through
+
+    Notes
+    -----
+    The return values are the same as for the :func:`fit_generic` function
+    """
+    d = dict(zip(["slope", "intercept"], fit.params[::-1]))
+    d.update(zip(["slope_err", "intercept_err"], np.asarray(fit.bse)[::-1]))
+    if fix is not None:
+        d["intercept"] = fix[1] - d["slope"] * fix[0]
+    y_line = d["intercept"] + d["slope"] * x_line
+    if hasattr(fit, "rsquared"):
+        d["rsquared"] = fit.rsquared
+    return x_line, y_line, d, fit
+
+
+#: mapping from the :attr:`LinearRegressionFit.method` to the fit function
+fit_functions = {
+    "generic": fit_generic,
+    "curve_fit": fit_curve,
+    "poly": fit_poly,
+    "poly_auto": fit_poly_auto,
+    "statsmodels": fit_statsmodels,
+    "median": fit_median,
+    "lowess": fit_lowess,
+    "spline": fit_spline,
+    "segmented": fit_segmented,
+}
+
+
+def predict_fit(method, fit, attrs, x_line):
+    """Evaluate a fit that has been computed by one of the fit functions
+
+    Parameters
+    ----------
+    method: str
+        The fit method (one of the keys in :attr:`fit_functions`)
+    fit: object
+        The fitted model as returned by the fit function
+    attrs: dict
+        The attributes as returned by the fit function
+    x_line: np.ndarray
+        The x-data to evaluate the fit on
+
+    Returns
+    -------
+    np.ndarray
+        The predicted values on `x_line`"""
+    if method in ["statsmodels", "median"]:
+        return attrs["intercept"] + attrs["slope"] * x_line
+    elif method == "poly":
+        deg = len(fit) - 1
+        return np.poly1d([attrs["c%i" % i] for i in range(deg, -1, -1)])(
+            x_line
+        )
+    return fit.predict(x_line)
+
+
+class LineFit(object):
+    """A picklable function to fit a model and evaluate it on a line
+
+    Instances of this class can be sent to worker processes of the parallel
+    bootstrap (see :func:`psy_reg.algorithms.parallel_bootstrap`).
+
+    Parameters
+    ----------
+    method: str
+        The fit method (one of the keys in :attr:`fit_functions`)
+    model: object
+        The model to fit
+    x_line: np.ndarray
+        The x-data to evaluate the fit on
+    ``**kwargs``
+        Any other keyword argument for the fit function"""
+
+    def __init__(self, method, model, x_line, **kwargs):
+        self.method = method
+        self.model = model
+        self.x_line = x_line
+        self.kwargs = kwargs
+
+    def __call__(self, x, y):
+        model = self.model
+        if self.method == "generic":
+            # generic models are fitted in place, so we use a copy to be safe
+            # when running in multiple threads
+            model = deepcopy(model)
+        return fit_functions[self.method](
+            model, x, y, self.x_line, **self.kwargs
+        )[1]
+
+
+def _checksum(arr, value=0):
+    """Update the CRC-32 checksum `value` with the data of an array
+
+    The checksum of the rows of an array can be extended with the following
+    rows, i.e. ``_checksum(arr[n:], _checksum(arr[:n])) == _checksum(arr)``
+    """
+    arr = np.ascontiguousarray(arr)
+    if arr.dtype.hasobject:
+        for item in arr.ravel().tolist():
+            value = zlib.crc32((repr(item) + "\0").encode("utf-8"), value)
+        return value
+    return zlib.crc32(arr.view(np.uint8).ravel(), value)
+
+
+def _data_fingerprint(*variables):
+    """Get the fingerprint of the entire data of variables
+
+    In-memory data is identified by its data type, shape and CRC-32
+    checksum (see :func:`_extend_fingerprint`), dask arrays are identified
+    by the name of their graph"""
+    ret = []
+    for var in variables:
+        data = var.data
+        if is_dask_array(data):
+            ret.append(data.name)
+        else:
+            data = np.asarray(data)
+            ret.append((data.dtype.str, data.shape, _checksum(data)))
+    return tuple(ret)
+
+
+def _extend_fingerprint(fingerprint, variables, start):
+    """Extend the fingerprint of 1D in-memory data with appended data
+
+    Parameters
+    ----------
+    fingerprint: tuple
+        The fingerprint of the first `start` values of the `variables` (see
+        :func:`_data_fingerprint`)
+    variables: list of xarray.Variable
+        The 1D variables with the appended data
+    start: int
+        The number of values that are included in `fingerprint`
+
+    Returns
+    -------
+    tuple
+        The fingerprint of the entire data of the `variables`. Only the
+        appended data is hashed."""
+    ret = []
+    for (dtype, shape, value), var in zip(fingerprint, variables):
+        data = np.asarray(var.data)
+        ret.append((dtype, data.shape, _checksum(data[start:], value)))
+    return tuple(ret)
+
+
+def _tail_fingerprint(variables, size):
+    """Get the fingerprint of the last values before `size` of 1D variables"""
+    return _data_fingerprint(*(v[max(size - 16, 0) : size] for v in variables))
 
 
 class LinearRegressionFit(Formatoption):
@@ -264,8 +779,35 @@ class LinearRegressionFit(Formatoption):
         make a linear fit
     'robust'
         make a robust linear fit
+    'theilsen'
+        make a robust linear fit with the median of the slopes between all
+        pairs of points (Theil-Sen estimator, see
+        :func:`psy_reg.algorithms.theil_sen`)
+    'siegel'
+        make a robust linear fit with Siegel's repeated medians (see
+        :func:`psy_reg.algorithms.siegel`)
+    'lowess'
+        make a locally weighted linear regression of binned data (see
+        :class:`psy_reg.algorithms.LowessFit` and the
+        ``'plotter.linreg.lowess.frac'`` and ``'plotter.linreg.lowess.bins'``
+        items of the :attr:`~psyplot.config.rcsetup.rcParams`)
     'poly<deg>'
         Make a polynomial fit of the order ``'<deg>'``
+    'poly_auto' or 'poly_auto<deg>'
+        Make a polynomial fit of the order up to ``'<deg>'`` that is
+        selected by the ``'plotter.linreg.poly_auto.criterion'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` (see
+        :func:`psy_reg.algorithms.polyfit_auto`). If ``'<deg>'`` is not
+        given, the ``'plotter.linreg.poly_auto.max_deg'`` item is used
+    'spline' or 'spline<lam>'
+        Make a cubic smoothing spline fit with the smoothing parameter
+        ``'<lam>'`` (e.g. ``'spline0.5'``) or, if not given, with the one
+        that is selected by generalized cross-validation (see
+        :class:`psy_reg.algorithms.SmoothingSpline`)
+    'segmented' or 'segmented<k>'
+        Make a continuous piecewise linear fit with ``'<k>'`` breakpoints
+        (one, if not given, e.g. ``'segmented2'`` for three segments, see
+        :func:`psy_reg.algorithms.segmented`)
     function
         A callable function that takes an x-array and a y-array as input and
         can be used for the :func:`scipy.optimize.curve_fit` function
@@ -277,14 +819,25 @@ class LinearRegressionFit(Formatoption):
 
     Notes
     -----
-    You can access the intercept, slope and rsquared by the correponding
-    attribute. E.g.::
+    You can access the intercept, slope and rsquared (and, for linear fits,
+    the standard errors ``slope_err`` and ``intercept_err``) by the
+    correponding attribute. E.g.::
 
         >>> plotter.update(
         ...     legendlabels="%%(intercept)s + %%(slope)s * x, "
         ...     "$R^2$=%%(rsquared)s"
         ... )
 
+    Segmented fits provide the ``breakpoint0``, ``breakpoint1``, ... and
+    the slopes of the segments ``slope0``, ``slope1``, ... (with their
+    standard errors ``slope0_err``, ...) instead, e.g.::
+
+        >>> plotter.update(
+        ...     fit="segmented",
+        ...     legendlabels="%%(slope0)1.2f until %%(breakpoint0)1.2f, "
+        ...     "then %%(slope1)1.2f",
+        ... )
+
     See Also
     --------
     fix
@@ -299,6 +852,7 @@ class LinearRegressionFit(Formatoption):
         "line_xlim",
         "p0",
         "param_bounds",
+        "groupby",
     ]
 
     priority = START
@@ -318,42 +872,430 @@ class LinearRegressionFit(Formatoption):
     def __init__(self, *args, **kwargs):
         super(LinearRegressionFit, self).__init__(*args, **kwargs)
         self._kwargs = {}
+        self._methods = {}
+        self._states = {}
+        self._state_ids = count()
+        self._cumsums = {}
+        self._increments = {}
+        self._fingerprints = {}
+        self.groups = None
 
     def update(self, value):
-        self.fits = [None] * len(list(self.iter_data))
+        n = len(list(self.iter_data))
+        self.fits = [None] * n
+        self._methods.clear()
+        self._fingerprints.clear()
+        for i in [i for i in self._states if i >= n or value is None]:
+            del self._states[i]
+        for i in [i for i in self._cumsums if i >= n or value is None]:
+            del self._cumsums[i]
+        if not rcParams["plotter.linreg.incremental"]:
+            self._increments.clear()
+        for i in [i for i in self._increments if i >= n or value is None]:
+            del self._increments[i]
+        if self.groups is not None:
+            # the decoders of the previous groups do not match anymore
+            self.plotter.plot_data_decoder = None
+        self.groups = None
         if value is None:
             return
-        transpose = self.transpose.value
+        elif self.groupby.value is not None:
+            return self.update_groups()
+        arrays = []
         for i, da in enumerate(self.iter_raw_data):
-            kwargs = self.get_kwargs(i)
-            x, xname, y, yname = self.get_xy(i, da)
-            x_line = self.get_xline(i)
             if self.coord.value is not None:
                 da = self.coord.replace_coord(i)
-            x_line, y_line, attrs, fit = self.make_fit(
-                i, x, y, x_line=x_line, **kwargs
+            arrays.append(da)
+        x_lines = [self.get_xline(i) for i in range(len(arrays))]
+        batch = self.make_batch_fits(arrays, x_lines)
+        for i, da in enumerate(arrays):
+            kwargs = self.get_kwargs(i)
+            x_line = x_lines[i]
+            state = None if i in batch else self.get_state(i, da)
+            sums = None
+            incremental = (
+                i not in batch
+                and state is None
+                and self.supports_increments(i, da)
+            )
+            if i not in batch and state is None and not incremental:
+                sums = self.get_range_sums(i, da)
+            if i in batch:
+                x_line, y_line, attrs, fit, nobs = batch[i]
+                xname, yname = self.get_names(da)
+                self.set_state(i, da, attrs, fit, nobs)
+            elif incremental:
+                xname, yname = self.get_names(da)
+                x_line, y_line, attrs, fit, nobs = self.incremental_fit(
+                    i, da, x_line, kwargs.get("fix")
+                )
+                self.set_state(i, da, attrs, fit, nobs)
+            elif sums is not None:
+                xname, yname = self.get_names(da)
+                fix = kwargs.get("fix")
+                x_line, y_line, attrs, fit = linear_line(
+                    sums.fit(fix), x_line, fix
+                )
+                self.set_state(i, da, attrs, fit, sums.n)
+            elif state is None:
+                x, xname, y, yname, weights = self.get_xy(
+                    i, da, lazy=self.supports_dask(i), weighted=True
+                )
+                if weights is not None:
+                    kwargs["weights"] = weights
+                x_line, y_line, attrs, fit = self.make_fit(
+                    i, x, y, x_line=x_line, **kwargs
+                )
+                # models that are fitted in place may be refitted during
+                # the bootstrap, so we cannot reuse them
+                if self.method is not None and fit is not self.model:
+                    # the number of lazily masked data points is unknown,
+                    # unless the fit counted them
+                    if is_dask_array(x):
+                        nobs = getattr(fit, "nobs", None)
+                    elif weights is not None:
+                        nobs = weights.sum()
+                    else:
+                        nobs = len(x)
+                    self.set_state(i, da, attrs, fit, nobs)
+            else:
+                # only the line changed, so we do not have to refit
+                xname, yname = self.get_names(da)
+                attrs = state["attrs"].copy()
+                fit = state["fit"]
+                self.set_method(i)
+                y_line = predict_fit(self.method, fit, attrs, x_line)
+            da_fit = self.make_fit_array(
+                da, x_line, y_line, attrs, xname, yname
             )
-            if transpose:
-                x_line, y_line = y_line, x_line
-            attrs.update(da.attrs)
-            coord_attrs = da.coords[da.dims[0]].attrs.copy()
-            coords = {xname: Variable((xname,), x_line, attrs=coord_attrs)}
-            da_fit = DataArray(
-                data=y_line,
-                dims=(xname,),
-                name=yname,
-                attrs=attrs,
-                coords=coords,
-            ).assign_coords(**self._get_other_coords(da))
-            da_fit.psy.init_accessor(arr_name=da.psy.arr_name)
             self.fits[i] = fit
-            da_fit.attrs.update(attrs)
-            da_fit.attrs.update(da.attrs)
-            da_fit.coords[da.dims[0]].attrs.update(da.coords[da.dims[0]].attrs)
             self.set_data(da_fit, i)
             self.set_decoder(CFDecoder(da_fit.psy.base), i)
 
+    def make_fit_array(self, da, x_line, y_line, attrs, xname, yname, **kws):
+        """Create the data array of a fitted line
+
+        Parameters
+        ----------
+        da: xarray.DataArray
+            The raw data array
+        x_line: np.ndarray
+            The x-data of the line
+        y_line: np.ndarray
+            The fitted y-data of the line
+        attrs: dict
+            The attributes of the fit
+        xname: str
+            The name of the x-data
+        yname: str
+            The name of the y-data
+        ``**kws``
+            Any other keyword for the initialization of the
+            :attr:`psyplot.data.InteractiveArray` accessor. By default, the
+            `arr_name` of `da` is used
+
+        Returns
+        -------
+        xarray.DataArray
+            The fitted line"""
+        if self.transpose.value:
+            x_line, y_line = y_line, x_line
+        attrs.update(da.attrs)
+        coord_attrs = da.coords[da.dims[0]].attrs.copy()
+        coords = {xname: Variable((xname,), x_line, attrs=coord_attrs)}
+        da_fit = DataArray(
+            data=y_line,
+            dims=(xname,),
+            name=yname,
+            attrs=attrs,
+            coords=coords,
+        ).assign_coords(**self._get_other_coords(da))
+        kws.setdefault("arr_name", da.psy.arr_name)
+        da_fit.psy.init_accessor(**kws)
+        da_fit.attrs.update(attrs)
+        da_fit.attrs.update(da.attrs)
+        da_fit.coords[da.dims[0]].attrs.update(da.coords[da.dims[0]].attrs)
+        return da_fit
+
+    def update_groups(self):
+        """Fit the groups of all arrays separately
+
+        The data of each array is grouped by the coordinate of the
+        :attr:`groupby` formatoption and the linear fits (optionally through
+        the :attr:`fix` point) of all groups are computed in one pass (see
+        :meth:`psy_reg.algorithms.LinearSums.groups`). The plotted data
+        then contains one line per group (and array) and the
+        :attr:`groups` attribute contains the array index, the group label
+        and the x- and y-data of each line."""
+        if self.index_in_list is not None:
+            raise ValueError(
+                "Grouped fits are not supported by the %s"
+                % type(self.plotter).__name__
+            )
+        group = self.groupby.value
+        self.fits = []
+        self.groups = []
+        da_fits = []
+        for i, da in enumerate(self.iter_raw_data):
+            self.set_method(i)
+            if self.method != "statsmodels" or self.model is not sm.OLS:
+                raise ValueError(
+                    "Grouped fits are only supported for linear fits"
+                )
+            if self.coord.value is not None:
+                da = self.coord.replace_coord(i)
+            x, xname, y, yname = self.get_raw_xy(i, da)
+            mask = self.get_mask(i, x, y)
+            if is_dask_array(mask):
+                import dask
+
+                x, y, mask = dask.compute(x, y, mask)
+            labels = np.asarray(da.coords[group].values)
+            x, y, labels = x[mask], y[mask], labels[mask]
+            uniques, codes = np.unique(labels, return_inverse=True)
+            fix = self.get_kwargs(i).get("fix")
+            results = LinearSums.groups(x, y, codes, len(uniques)).fit(fix)
+            order = np.argsort(codes, kind="stable")
+            offsets = np.searchsorted(codes[order], np.arange(len(uniques)))
+            x_line = self.get_xline(i)
+            for j, indices in enumerate(np.split(order, offsets[1:])):
+                label = uniques[j].item()
+                x_line_, y_line, attrs, fit = linear_line(
+                    results[j], x_line, fix
+                )
+                attrs[group] = label
+                da_fits.append(
+                    self.make_fit_array(
+                        da,
+                        x_line_,
+                        y_line,
+                        attrs,
+                        xname,
+                        yname,
+                        arr_name="%s_%s" % (da.psy.arr_name, label),
+                    )
+                )
+                self.fits.append(fit)
+                self.groups.append((i, label, x[indices], y[indices]))
+        self.set_data(InteractiveList(da_fits))
+        self.set_decoder([CFDecoder(arr.psy.base) for arr in da_fits])
+
+    def make_batch_fits(self, arrays, x_lines):
+        """Fit all arrays that support a batched fit at once
+
+        Linear fits (with or without a :attr:`fix` point) and polynomial fits
+        of in-memory arrays that have to be (re)fitted are grouped by their
+        method and solved with a few vectorized operations for all arrays
+        (see :meth:`psy_reg.algorithms.LinearSums.batch` and
+        :func:`psy_reg.algorithms.batch_polyfit`). The batch takes precedence
+        over the cumulative sums (see :meth:`get_range_sums`), unless the
+        :attr:`xrange` excludes some of the data. Then the sums of the window
+        are obtained from the cumulative sums without masking the data.
+
+        Parameters
+        ----------
+        arrays: list of xarray.DataArray
+            The data arrays (with the coordinate of the :attr:`coord`
+            formatoption)
+        x_lines: list of np.ndarray
+            The x-data of the lines for each array
+
+        Returns
+        -------
+        dict
+            A mapping from the index of the array to the results of the fit
+            (see :func:`fit_generic`) and the number of data points. Arrays
+            that cannot be fitted in a batch are not included"""
+        groups = defaultdict(list)
+        for i, da in enumerate(arrays):
+            if (
+                da.chunks is None
+                and self.supports_dask(i)
+                and not self.compresses(i)
+                and self.get_state(i, da) is None
+                and not self.supports_increments(i, da)
+                and not self.uses_range_window(i, da)
+            ):
+                if self.method == "poly":
+                    groups[self.model.keywords["deg"]].append(i)
+                else:
+                    groups[None].append(i)
+        ret = {}
+        for deg, indices in groups.items():
+            if len(indices) < 2:
+                continue
+            xs, ys = [], []
+            for i in indices:
+                x, xname, y, yname = self.get_xy(i, arrays[i])
+                xs.append(x)
+                ys.append(y)
+            # leave the handling of too short arrays to the single fits
+            if min(map(len, xs)) <= (1 if deg is None else deg + 1):
+                continue
+            if deg is None:
+                for i, sums in zip(indices, LinearSums.batch(xs, ys)):
+                    fix = self.get_kwargs(i).get("fix")
+                    ret[i] = linear_line(sums.fit(fix), x_lines[i], fix) + (
+                        sums.n,
+                    )
+            else:
+                params, pcov, rsquared = batch_polyfit(xs, ys, deg)
+                for j, i in enumerate(indices):
+                    ret[i] = poly_line(
+                        params[j], pcov[j], rsquared[j], x_lines[i]
+                    ) + (len(xs[j]),)
+        return ret
+
+    def get_names(self, da):
+        """Get the names of the x- and y-data of an array"""
+        if self.transpose.value:
+            return da.name, da.dims[0]
+        return da.dims[0], da.name
+
+    def _get_fit_settings(self, i):
+        """Get the formatoptions that affect the fit but the ranges"""
+        return (
+            next(islice(cycle(safe_list(self.value)), i, i + 1)),
+            sorted(self.get_kwargs(i).items()),
+            self.transpose.value,
+            self.coord.value,
+            self.p0.value,
+            self.param_bounds.bounds[i],
+            rcParams["plotter.linreg.ols.engine"],
+            rcParams["plotter.linreg.robust.engine"],
+            rcParams["plotter.linreg.compress"],
+            rcParams["plotter.linreg.incremental"],
+            rcParams["plotter.linreg.lowess.frac"],
+            rcParams["plotter.linreg.lowess.bins"],
+            rcParams["plotter.linreg.spline.bins"],
+            rcParams["plotter.linreg.poly_auto.max_deg"],
+            rcParams["plotter.linreg.poly_auto.criterion"],
+        )
+
+    def _get_settings(self, i):
+        """Get a representation of the formatoptions that affect the fit"""
+        ranges = []
+        for fmto in [self.xrange, self.yrange]:
+            arr = np.asarray(fmto.range)
+            ranges.append((arr if arr.ndim == 1 else arr[i]).tolist())
+        return repr(self._get_fit_settings(i) + (ranges,))
+
+    def get_state(self, i, da):
+        """Get the fitted state of an array if it is still valid
+
+        The fitted parameters are stored per array and reused as long as
+        neither the data nor the formatoptions that affect the fit changed.
+        This allows to reevaluate the fit on a new line (e.g. when the
+        :attr:`line_xlim` formatoption changes) without fitting the data
+        again. The data is considered unchanged, if the variables of the
+        array and its coordinate are the same objects and the fingerprint of
+        their entire data did not change (i.e. in-place edits invalidate the
+        state as well, see :meth:`get_fingerprint`).
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The data array (with the coordinate of the :attr:`coord`
+            formatoption)
+
+        Returns
+        -------
+        dict or None
+            The state with the fitted model (``'fit'``), its attributes
+            (``'attrs'``), the number of data points (``'nobs'``) and a
+            unique identifier (``'id'``). None, if the fit has to be
+            computed"""
+        state = self._states.get(i)
+        if state is None:
+            return None
+        variables = (da.variable, da.coords[da.dims[0]].variable)
+        if (
+            any(v is not ref for v, ref in zip(variables, state["variables"]))
+            or state["settings"] != self._get_settings(i)
+            or state["data"] != self.get_fingerprint(i, da)
+        ):
+            return None
+        return state
+
+    def get_fingerprint(self, i, da):
+        """Get the fingerprint of the data of an array
+
+        The data of the array and its coordinate is hashed at most once per
+        update of this formatoption, such that the checks of the fitted
+        state, the cumulative sums and the appended data (see
+        :meth:`get_state`, :meth:`get_range_sums` and
+        :meth:`incremental_fit`) share one pass over the data.
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The data array (with the coordinate of the :attr:`coord`
+            formatoption)
+
+        Returns
+        -------
+        tuple
+            The fingerprint of the data (see :func:`_data_fingerprint`)"""
+        variables = (da.variable, da.coords[da.dims[0]].variable)
+        cached = self._fingerprints.get(i)
+        if cached is None or any(
+            v is not ref for v, ref in zip(variables, cached[0])
+        ):
+            cached = self._fingerprints[i] = (
+                variables,
+                _data_fingerprint(*variables),
+            )
+        return cached[1]
+
+    def set_state(self, i, da, attrs, fit, nobs):
+        """Store the fitted state of an array
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The data array (with the coordinate of the :attr:`coord`
+            formatoption)
+        attrs: dict
+            The attributes of the fit
+        fit: object
+            The fitted model
+        nobs: int
+            The number of data points that were used for the fit
+
+        Returns
+        -------
+        dict
+            The state (see :meth:`get_state`)"""
+        variables = (da.variable, da.coords[da.dims[0]].variable)
+        state = self._states[i] = {
+            "variables": variables,
+            "data": self.get_fingerprint(i, da),
+            "settings": self._get_settings(i),
+            "attrs": attrs.copy(),
+            "fit": fit,
+            "nobs": nobs,
+            "id": next(self._state_ids),
+        }
+        return state
+
     def set_method(self, i):
+        """Set the :attr:`model` and :attr:`method` for the array at `i`
+
+        The resolved model and method are cached until the next update of
+        this formatoption"""
+        try:
+            self.model, self.method = self._methods[i]
+        except KeyError:
+            self._set_method(i)
+            self._methods[i] = self.model, self.method
+
+    def _set_method(self, i):
         value = next(islice(cycle(safe_list(self.value)), i, i + 1))
         if value is None:
             self.model = None
@@ -365,15 +1307,30 @@ class LinearRegressionFit(Formatoption):
             self.model = value
             self.method = "generic"
         elif callable(value):
-
-            class Model(GenericModel):
-                function = staticmethod(value)
-
-            self.model = Model
+            self.model = function_model(value)
             self.method = "curve_fit"
+        elif value.lower().startswith("poly_auto"):
+            if value[9:]:
+                self.model = partial(polyfit_auto, max_deg=int(value[9:]))
+            else:
+                self.model = polyfit_auto
+            self.method = "poly_auto"
         elif value.lower().startswith("poly"):
-            self.model = partial(np.polyfit, deg=int(value[4:]), cov=True)
+            self.model = partial(polyfit, deg=int(value[4:]))
             self.method = "poly"
+        elif value.lower().startswith("spline"):
+            lam = float(value[6:]) if value[6:] else None
+            self.model = partial(SmoothingSpline, lam=lam)
+            self.method = "spline"
+        elif value.lower().startswith("segmented"):
+            self.model = partial(segmented, nbreaks=int(value[9:] or 1))
+            self.method = "segmented"
+        elif value in ["theilsen", "siegel"]:
+            self.model = theil_sen if value == "theilsen" else siegel
+            self.method = "median"
+        elif value == "lowess":
+            self.model = LowessFit
+            self.method = "lowess"
         else:
             self.model = sm.RLM if value == "robust" else sm.OLS
             self.method = "statsmodels"
@@ -394,19 +1351,331 @@ class LinearRegressionFit(Formatoption):
             xmin, xmax = xrange
         return np.linspace(xmin, xmax, 100)
 
-    def get_xy(self, i, da):
-        if self.coord.value is not None:
-            da = self.coord.replace_coord(i)
-        if self.transpose.value:
-            x = da.values
-            xname = da.name
-            y = da.coords[da.dims[0]].values
-            yname = da.dims[0]
+    def supports_dask(self, i):
+        """Check whether the fit of the array at `i` supports dask arrays
+
+        Linear fits (computed by :class:`psy_reg.algorithms.LinearSums`)
+        and polynomial fits (see :func:`psy_reg.algorithms.polyfit`) can be
+        computed block by block from dask arrays without loading the data
+        into memory."""
+        self.set_method(i)
+        if self.method == "poly":
+            return True
+        return (
+            self.method == "statsmodels"
+            and self.model is sm.OLS
+            and rcParams["plotter.linreg.ols.engine"] == "sums"
+        )
+
+    def supports_weights(self, i):
+        """Check whether the fit of the array at `i` supports weighted points
+
+        Linear fits (see :func:`fit_statsmodels`), polynomial fits, LOWESS
+        fits, smoothing splines, segmented fits and fits of callables can fit
+        points that represent several data points (see :meth:`compress`)."""
+        self.set_method(i)
+        if self.method in [
+            "poly",
+            "poly_auto",
+            "curve_fit",
+            "lowess",
+            "spline",
+            "segmented",
+        ]:
+            return True
+        return self.method == "statsmodels" and self.model is sm.OLS
+
+    def compresses(self, i):
+        """Check whether the data of the array at `i` is compressed
+
+        Returns
+        -------
+        bool
+            True, if :meth:`compress` replaces the data points by weighted
+            points"""
+        return rcParams["plotter.linreg.compress"] and self.supports_weights(i)
+
+    def compress(self, i, x, y):
+        """Compress the data of the array at `i` into weighted points
+
+        If the ``'plotter.linreg.compress'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is True, identical pairs of
+        in-memory x- and y-data are collapsed into unique points that are
+        weighted by their number (see
+        :func:`psy_reg.algorithms.unique_points`). The fits and the
+        bootstrap of the unique points give the same results as for all
+        points, but are much faster for quantized data.
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        x: np.ndarray or dask.array.Array
+            The x-data within the :attr:`xrange` and :attr:`yrange`
+        y: np.ndarray or dask.array.Array
+            The y-data within the :attr:`xrange` and :attr:`yrange`
+
+        Returns
+        -------
+        np.ndarray or dask.array.Array
+            The x-data of the points
+        np.ndarray or dask.array.Array
+            The y-data of the points
+        np.ndarray or None
+            The number of data points that each point represents or None,
+            if the data is not compressed (see :meth:`compresses`)"""
+        if not self.compresses(i) or is_dask_array(x) or not len(x):
+            return x, y, None
+        xu, yu, counts = unique_points(x, y)
+        if len(xu) == len(x):  # nothing to compress
+            return x, y, None
+        return xu, yu, counts
+
+    def get_range_sums(self, i, da):
+        """Get the sums of a linear fit from cumulative sums
+
+        For linear fits of 1D in-memory data with a monotonic coordinate,
+        the cumulative sums of the data (see
+        :class:`psy_reg.algorithms.CumulativeSums`) are computed once and
+        stored as long as the data does not change. The sums of the data
+        within a new :attr:`xrange` are then obtained in ``O(log n)``
+        without masking the data. This is not possible, if the
+        :attr:`yrange` excludes some of the data. Only the check for changes
+        of the data passes over it, and that pass is shared with the check
+        of the fitted state (see :meth:`get_fingerprint`).
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The data array (with the coordinate of the :attr:`coord`
+            formatoption)
+
+        Returns
+        -------
+        psy_reg.algorithms.LinearSums or None
+            The sums of the data within the :attr:`xrange` or None, if they
+            cannot be computed from cumulative sums"""
+        self.set_method(i)
+        if (
+            self.method != "statsmodels"
+            or self.model is not sm.OLS
+            or rcParams["plotter.linreg.ols.engine"] != "sums"
+            or self.transpose.value
+            or da.ndim != 1
+            or da.chunks is not None
+            or self.compresses(i)
+        ):
+            return None
+        variables = (da.variable, da.coords[da.dims[0]].variable)
+        cached = self._cumsums.get(i)
+        if (
+            cached is None
+            or any(v is not ref for v, ref in zip(variables, cached[0]))
+            or cached[1] != self.get_fingerprint(i, da)
+        ):
+            x = variables[1].values
+            y = variables[0].values
+            cumsums = None
+            if x.dtype.kind in "fiu" and y.dtype.kind in "fiu":
+                steps = np.diff(x)
+                if (steps >= 0).all():
+                    cumsums = CumulativeSums(x, y)
+                elif (steps <= 0).all():
+                    cumsums = CumulativeSums(x[::-1], y[::-1])
+            cached = self._cumsums[i] = (
+                variables,
+                self.get_fingerprint(i, da),
+                cumsums,
+            )
+        cumsums = cached[2]
+        if cumsums is None:
+            return None
+        xmin, xmax, ymin, ymax = self.get_ranges(i)
+        if ymin > cumsums.ymin or ymax < cumsums.ymax:
+            return None
+        return cumsums.window(xmin, xmax)
+
+    def uses_range_window(self, i, da):
+        """Check whether the array at `i` is fitted within an x-window
+
+        Returns
+        -------
+        bool
+            True, if the sums of the data are obtained from the cumulative
+            sums (see :meth:`get_range_sums`) and the :attr:`xrange`
+            excludes some of the data"""
+        sums = self.get_range_sums(i, da)
+        if sums is None:
+            return False
+        cumsums = self._cumsums[i][2]
+        return sums.n < cumsums.sums(0, len(cumsums.x)).n
+
+    def supports_increments(self, i, da):
+        """Check whether the array at `i` is fitted incrementally
+
+        This is the case, if the ``'plotter.linreg.incremental'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is True, the data is a 1D
+        in-memory array that is not compressed (see :meth:`compresses`) and
+        the fit is linear (optionally through the :attr:`fix` point),
+        polynomial or a model with a ``partial_fit`` method (see
+        :meth:`incremental_fit`)"""
+        if (
+            not rcParams["plotter.linreg.incremental"]
+            or da.ndim != 1
+            or da.chunks is not None
+            or self.compresses(i)
+        ):
+            return False
+        self.set_method(i)
+        if self.method == "statsmodels":
+            return self.model is sm.OLS
+        elif self.method == "generic":
+            return hasattr(self.model, "partial_fit")
+        return self.method == "poly"
+
+    def _is_append(self, i, da, increment, settings, ranges):
+        """Check whether the data of an increment has only been appended
+
+        If the data grew, only the last values of the previous data are
+        compared (see :func:`_tail_fingerprint`), such that the check does
+        not pass over the previous data. Otherwise, the fingerprints of the
+        entire data are compared (see :meth:`get_fingerprint`)."""
+        size = increment["size"]
+        variables = (da.variable, da.coords[da.dims[0]].variable)
+        if len(variables[0]) < size or increment["settings"] != settings:
+            return False
+        elif len(variables[0]) == size:
+            if increment["data"] != self.get_fingerprint(i, da):
+                return False
+        elif increment["tail"] != _tail_fingerprint(variables, size):
+            return False
+        elif ranges == increment["ranges"]:
+            return True
+        # the masks of the previous data do not change as long as the old
+        # and the new ranges include all of it
+        xmin, xmax, ymin, ymax = increment["extent"]
+        return all(
+            r[0] <= xmin and r[1] >= xmax and r[2] <= ymin and r[3] >= ymax
+            for r in [ranges, increment["ranges"]]
+        )
+
+    def incremental_fit(self, i, da, x_line, fix=None):
+        """Fit the data by updating the statistics of the previous fit
+
+        Linear fits and polynomial fits are computed from sufficient
+        statistics (see :class:`psy_reg.algorithms.LinearSums` and
+        :class:`psy_reg.algorithms.PolynomialSums`) and models with a
+        ``partial_fit`` method are fitted on a copy of the :attr:`model`
+        which is then updated via ``partial_fit(x, y)``. If the data only
+        grew along the fit dimension since the last fit (and the settings
+        did not change), only the appended data points are added to these
+        statistics and the fingerprint of the data (see
+        :meth:`get_fingerprint`) is extended with the appended points only.
+        As the previous data is not hashed again, only the last points of it
+        are verified to be unchanged. Without appended data, in-place edits
+        of the data are detected and the statistics are recomputed from the
+        entire data (as for any other change).
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The data array (with the coordinate of the :attr:`coord`
+            formatoption)
+        x_line: np.ndarray
+            The x-data to evaluate the fit on
+        fix: list of float
+            The point ``(x', y')`` that a linear fit has to go through
+
+        Returns
+        -------
+        tuple
+            The results of the fit (see :func:`fit_generic`) and the number
+            of data points"""
+        x, xname, y, yname = self.get_raw_xy(i, da)
+        variables = (da.variable, da.coords[da.dims[0]].variable)
+        settings = self._get_fit_settings(i)
+        ranges = tuple(self.get_ranges(i))
+        increment = self._increments.get(i)
+        if increment is not None and self._is_append(
+            i, da, increment, settings, ranges
+        ):
+            start = increment["size"]
+            extent = increment["extent"]
         else:
-            x = da.coords[da.dims[0]].values
-            xname = da.dims[0]
-            y = da.values
-            yname = da.name
+            increment = None
+            start = 0
+            extent = (np.inf, -np.inf, np.inf, -np.inf)
+        x = np.asarray(x[start:], dtype=float)
+        y = np.asarray(y[start:], dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        if valid.any():
+            extent = (
+                min(extent[0], x[valid].min()),
+                max(extent[1], x[valid].max()),
+                min(extent[2], y[valid].min()),
+                max(extent[3], y[valid].max()),
+            )
+        mask = self.get_mask(i, x, y)
+        x, y = x[mask], y[mask]
+        self.set_method(i)
+        if self.method == "statsmodels":
+            running = LinearSums(x, y)
+            if increment is not None:
+                running = increment["stats"].merge(running)
+            ret = linear_line(running.fit(fix), x_line, fix)
+            nobs = running.n
+        elif self.method == "poly":
+            if increment is None:
+                running = PolynomialSums(x, y, self.model.keywords["deg"])
+            else:
+                running = increment["stats"].update(x, y)
+            ret = poly_line(*running.fit(), x_line)
+            nobs = running.n
+        else:
+            if increment is None:
+                running = deepcopy(self.model).fit(x, y)
+                nobs = len(x)
+            else:
+                running = increment["stats"]
+                nobs = increment["nobs"] + len(x)
+                if len(x):
+                    running = running.partial_fit(x, y) or running
+            ret = (
+                x_line,
+                running.predict(x_line),
+                getattr(running, "attrs", {}),
+            )
+            ret += (running,)
+        if increment is not None:
+            # share the extended fingerprint with set_state
+            self._fingerprints[i] = (
+                variables,
+                _extend_fingerprint(increment["data"], variables, start),
+            )
+        self._increments[i] = {
+            "size": len(variables[0]),
+            "data": self.get_fingerprint(i, da),
+            "tail": _tail_fingerprint(variables, len(variables[0])),
+            "settings": settings,
+            "ranges": ranges,
+            "extent": extent,
+            "stats": running,
+            "nobs": nobs,
+        }
+        return ret + (nobs,)
+
+    def get_ranges(self, i):
+        """Get the :attr:`xrange` and :attr:`yrange` of the array at `i`
+
+        Returns
+        -------
+        tuple of float
+            The minimum and maximum x- and y-values ``(xmin, xmax, ymin,
+            ymax)`` of the data for the fit"""
         xrange = np.asarray(self.xrange.range)
         yrange = np.asarray(self.yrange.range)
         if xrange.ndim == 1:
@@ -415,14 +1684,140 @@ class LinearRegressionFit(Formatoption):
         else:
             xmin, xmax = xrange[i]
             ymin, ymax = yrange[i]
-        mask = (
+        return xmin, xmax, ymin, ymax
+
+    def get_raw_xy(self, i, da):
+        """Get the x- and y-data of an array without masking them
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The raw data array
+
+        Returns
+        -------
+        np.ndarray or dask.array.Array
+            The x-data
+        str
+            The name of the x-data
+        np.ndarray or dask.array.Array
+            The y-data
+        str
+            The name of the y-data"""
+        if self.coord.value is not None:
+            da = self.coord.replace_coord(i)
+        coord = da.coords[da.dims[0]].values
+        if da.chunks is not None:
+            import dask.array as dsa
+
+            data = da.data
+            coord = dsa.from_array(coord, chunks=data.chunks)
+        else:
+            data = da.values
+        if self.transpose.value:
+            return data, da.name, coord, da.dims[0]
+        return coord, da.dims[0], data, da.name
+
+    def get_mask(self, i, x, y):
+        """Get the mask of the data points that are used for the fit
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        x: np.ndarray or dask.array.Array
+            The x-data (see :meth:`get_raw_xy`)
+        y: np.ndarray or dask.array.Array
+            The y-data (see :meth:`get_raw_xy`)
+
+        Returns
+        -------
+        np.ndarray or dask.array.Array
+            True for the valid data points within the :attr:`xrange` and
+            :attr:`yrange`"""
+        xmin, xmax, ymin, ymax = self.get_ranges(i)
+        return (
             ~(np.isnan(x) | np.isnan(y))
             & (x >= xmin)
             & (x <= xmax)
             & (y >= ymin)
             & (y <= ymax)
         )
-        return x[mask], xname, y[mask], yname
+
+    def get_nobs(self, i, da):
+        """Get the number of data points of the fit of the array at `i`
+
+        The number is taken from the fitted state (see :meth:`get_state`).
+        If it is unknown (e.g. for lazily masked dask arrays), the valid data
+        points within the :attr:`xrange` and :attr:`yrange` are counted
+        without loading the data into memory and the count is stored in the
+        state.
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The raw data array
+
+        Returns
+        -------
+        int
+            The number of data points"""
+        state = self._states.get(i)
+        if state is not None and state["nobs"] is not None:
+            return state["nobs"]
+        x, xname, y, yname = self.get_raw_xy(i, da)
+        nobs = self.get_mask(i, x, y).sum()
+        if is_dask_array(nobs):
+            nobs = nobs.compute()
+        nobs = int(nobs)
+        if state is not None:
+            state["nobs"] = nobs
+        return nobs
+
+    def get_xy(self, i, da, lazy=False, weighted=False):
+        """Get the x- and y-data for the fit
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The raw data array
+        lazy: bool
+            If True and the data is backed by a dask array, the data is
+            masked lazily and dask arrays are returned. Otherwise the masked
+            data is computed
+        weighted: bool
+            If True, the data is compressed into weighted points (see
+            :meth:`compress`) and the weights are returned, too
+
+        Returns
+        -------
+        np.ndarray or dask.array.Array
+            The x-data within the :attr:`xrange` and :attr:`yrange`
+        str
+            The name of the x-data
+        np.ndarray or dask.array.Array
+            The y-data within the :attr:`xrange` and :attr:`yrange`
+        str
+            The name of the y-data
+        np.ndarray or None
+            The weights of the points (only if `weighted` is True)"""
+        x, xname, y, yname = self.get_raw_xy(i, da)
+        mask = self.get_mask(i, x, y)
+        x, y = x[mask], y[mask]
+        if is_dask_array(x) and not lazy:
+            import dask
+
+            x, y = dask.compute(x, y)
+        if weighted:
+            x, y, weights = self.compress(i, x, y)
+            return x, xname, y, yname, weights
+        return x, xname, y, yname
 
     def make_fit(self, i, x, y, x_line=None, **kwargs):
         self.set_method(i)
@@ -432,67 +1827,124 @@ class LinearRegressionFit(Formatoption):
             return self._statsmodel_fit(x, y, x_line, **kwargs)
         elif self.method == "poly":
             return self._poly_fit(x, y, x_line, **kwargs)
+        elif self.method == "median":
+            return fit_median(self.model, x, y, x_line, **kwargs)
+        elif self.method == "lowess":
+            kwargs.pop("fix", None)
+            return fit_lowess(self.model, x, y, x_line, **kwargs)
+        elif self.method == "spline":
+            kwargs.pop("fix", None)
+            return fit_spline(self.model, x, y, x_line, **kwargs)
+        elif self.method == "segmented":
+            kwargs.pop("fix", None)
+            return fit_segmented(self.model, x, y, x_line, **kwargs)
+        elif self.method == "poly_auto":
+            kwargs.pop("fix", None)
+            return fit_poly_auto(self.model, x, y, x_line, **kwargs)
         elif self.method == "curve_fit":
-            kwargs["p0"] = self.p0.p0(i)
+            if "p0" not in kwargs:
+                kwargs["p0"] = self.p0.p0(i)
             kwargs["bounds"] = self.param_bounds.bounds[i] or (-np.inf, np.inf)
             return self._scipy_curve_fit(x, y, x_line, **kwargs)
         else:
             return self._generic_fit(x, y, x_line, **kwargs)
 
+    def rolling(self, window, i=0, **kwargs):
+        """Fit the data of an array within a moving window
+
+        The fits share the :attr:`fix`, :attr:`xrange`, :attr:`yrange` and
+        :attr:`coord` of this formatoption and are computed in ``O(n)`` for
+        all windows (see :func:`psy_reg.gridded.rolling_fit`).
+
+        Parameters
+        ----------
+        window: int
+            The number of data points of the window
+        i: int
+            The index of the array
+        ``**kwargs``
+            Any other keyword argument for the
+            :func:`psy_reg.gridded.rolling_fit` function (e.g. `center` or
+            `min_periods`)
+
+        Returns
+        -------
+        xarray.DataArray
+            The fitted parameters of each window (see
+            :func:`psy_reg.gridded.rolling_fit`)"""
+        value = next(islice(cycle(safe_list(self.value)), i, i + 1))
+        if not isinstance(value, str) or value not in ["fit", "linear"]:
+            raise ValueError(
+                "Rolling fits are only supported for linear fits, not for %r"
+                % (value,)
+            )
+        elif self.transpose.value:
+            raise ValueError(
+                "Rolling fits of transposed data are not supported"
+            )
+        if self.coord.value is not None:
+            da = self.coord.replace_coord(i)
+        else:
+            da = list(self.iter_raw_data)[i]
+        xmin, xmax, ymin, ymax = self.get_ranges(i)
+        return rolling_fit(
+            da,
+            window,
+            fix=self.get_kwargs(i).get("fix"),
+            xrange=(xmin, xmax),
+            yrange=(ymin, ymax),
+            **kwargs,
+        )
+
+    def get_line_fit(self, i, x_line, **kwargs):
+        """Get a picklable function to fit the data of one array
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        x_line: np.ndarray
+            The x-data to evaluate the fit on
+        ``**kwargs``
+            Any other keyword argument for the fit (see :meth:`get_kwargs`)
+
+        Returns
+        -------
+        LineFit
+            The function that takes the x- and y-data and returns the fit
+            evaluated on `x_line`"""
+        self.set_method(i)
+        if self.method == "curve_fit":
+            if "p0" not in kwargs:
+                kwargs["p0"] = self.p0.p0(i)
+            kwargs["bounds"] = self.param_bounds.bounds[i] or (-np.inf, np.inf)
+        return LineFit(self.method, self.model, x_line, **kwargs)
+
     def _generic_fit(self, x, y, x_line, **kwargs):
-        fit = self.model.fit(x, y)
-        return x_line, fit.predict(x_line), getattr(fit, "attrs", {}), fit
+        return fit_generic(self.model, x, y, x_line, **kwargs)
 
     def _scipy_curve_fit(self, x, y, x_line, **kwargs):
-        kwargs.pop("fix", None)
-        fit = self.model.fit(x, y, **kwargs)
-        return x_line, fit.predict(x_line), getattr(fit, "attrs", {}), fit
+        return fit_curve(self.model, x, y, x_line, **kwargs)
 
     def _poly_fit(self, x, y, x_line, **kwargs):
-        params, pcov = self.model(x, y)
-        d = dict(zip(("c%i" % i for i in range(len(params))), params[::-1]))
-        if pcov.size == 1:
-            d["c0_err"] = np.sqrt(pcov)[0, 0]
-        # calculate rsquared
-        residuals = y - np.poly1d(params)(x)
-        ss_res = (residuals**2).sum()
-        ss_tot = ((y - y.mean()) ** 2).sum()
-        d["rsquared"] = 1 - (ss_res / ss_tot)
-        return x_line, np.poly1d(params)(x_line), d, pcov
-
-    def _statsmodel_fit(self, x, y, x_line, fix=None):
+        return fit_poly(self.model, x, y, x_line, **kwargs)
+
+    def _statsmodel_fit(self, x, y, x_line, fix=None, weights=None):
         """Make a linear fit of x to y"""
-        adjust = fix is not None and fix != [0, 0]
-        if adjust:
-            x = x - fix[0]
-            y = y - fix[1]
-        if fix is None:
-            if x.ndim < 2:
-                x = sm.add_constant(x)
-            fit = self.model(y, x).fit()
-        else:
-            fit = self.model(y, x).fit()
         if x_line is None:
             xmin, xmax = self.line_xlim.range
             x_line = np.linspace(xmin, xmax, 100)
-        elif adjust:
-            x_line = x_line - fix[0]
-        d = dict(zip(["slope", "intercept"], fit.params[::-1]))
-        y_line = d.get("intercept", 0) + d["slope"] * x_line
-        if adjust:
-            x_line = x_line + fix[0]  # not += to make sure that Ci works fine
-            y_line += fix[1]
-            d["intercept"] = fix[1] - d["slope"] * fix[0]
-        elif fix is not None:
-            d["intercept"] = 0
-        if hasattr(fit, "rsquared"):
-            d["rsquared"] = fit.rsquared
-        return x_line, y_line, d, fit
+        return fit_statsmodels(
+            self.model, x, y, x_line, fix=fix, weights=weights
+        )
 
     def _get_other_coords(self, raw_da):
+        # coordinates along the fit dimension (e.g. the one of the
+        # :attr:`groupby` formatoption) cannot be transferred to the line
         return {
             key: raw_da.coords[key]
             for key in set(raw_da.coords).difference(raw_da.dims)
+            if raw_da.dims[0] not in raw_da.coords[key].dims
         }
 
 
@@ -537,8 +1989,9 @@ class IdealLine(Formatoption):
     None
         Don't draw an ideal line
     list of floats
-        The parameters for the line. If the :attr:`fit` formatoption is in
-        ``'robust'`` or ``'fit'``, then the first value corresponds to the
+        The parameters for the line. If the :attr:`fit` formatoption is one
+        of ``'fit'``, ``'robust'``, ``'theilsen'`` or ``'siegel'``, then the
+        first value corresponds to the
         interception, the second to the slope. Otherwise the list corrensponds
         to the parameters as used in the fit function of the lines
     list of list of floats
@@ -582,7 +2035,7 @@ class IdealLine(Formatoption):
                 x = psyps._get_index_vals(da.to_series().index)
             except AttributeError:  # old psy-simple version
                 x = da.to_series().index
-            if fit_type in ["robust", "fit"]:
+            if fit_type in ["robust", "fit", "theilsen", "siegel"]:
                 y = vals[0] + vals[1] * x
             else:
                 y = fit_type(x, *vals)
@@ -639,6 +2092,42 @@ class FixPoint(Formatoption):
             self.fit._kwargs.pop("fix", None)
 
 
+class GroupBy(Formatoption):
+    """
+    Fit the data of each group separately
+
+    The data is grouped by a coordinate along the fit dimension (e.g. the
+    season or a station cluster) and the :attr:`fit` and :attr:`ci` are
+    computed for each group in one vectorized pass. One line is drawn per
+    group that can be labeled with the name of the coordinate in the
+    :attr:`legendlabels` (e.g. ``'%%(season)s'``). This is only supported for
+    linear fits (optionally through a :attr:`fix` point).
+
+    Possible types
+    --------------
+    None
+        Fit all data at once
+    str
+        The name of the coordinate to group the data by
+
+    See Also
+    --------
+    fit, fix, ci
+    """
+
+    priority = START
+
+    group = "regression"
+
+    name = "Group the data for separate fits"
+
+    data_dependent = True
+
+    def update(self, value):
+        """Does nothing. The work is done by the :class:`fit` formatoption"""
+        pass
+
+
 class NBoot(Formatoption):
     """
     Set the number of bootstrap resamples for the confidence interval
@@ -666,12 +2155,16 @@ class NBoot(Formatoption):
         pass
 
 
-def bootstrap(x, y, func, n_boot, random_seed=None, **kwargs):
+def bootstrap(x, y, func, n_boot, random_seed=None, weights=None, **kwargs):
     """
     Simple bootstrap algorithm used to estimate the confidence interval
 
     This function is motivated by seaborns bootstrap algorithm
-    :func:`seaborn.algorithms.bootstrap`
+    :func:`seaborn.algorithms.bootstrap`. If `weights` are given, the
+    resamples of the weighted points are drawn from the multinomial
+    distribution of the weights (see
+    :func:`psy_reg.algorithms.iter_multinomial`) and `func` is called with
+    the drawn points and their counts as ``weights`` keyword.
     """
     boot_dist = []
     n = len(x)
@@ -680,6 +2173,13 @@ def bootstrap(x, y, func, n_boot, random_seed=None, **kwargs):
         if random_seed is not None
         else rcParams["plotter.linreg.bootstrap.random_seed"]
     )
+    if weights is not None:
+        for counts in iter_multinomial(weights, n_boot, rs, 1):
+            drawn = counts[0] > 0
+            boot_dist.append(
+                func(x[drawn], y[drawn], weights=counts[0][drawn], **kwargs)
+            )
+        return np.array(boot_dist)
     for i in range(int(n_boot)):
         resampler = rs.randint(0, n, n)
         x_ = x.take(resampler, axis=0)
@@ -704,6 +2204,27 @@ class Ci(Formatoption):
     datasets, it may be advisable to avoid that computation by setting
     this parameter to None.
 
+    For linear fits (``fit='fit'`` or ``'linear'``, optionally with a
+    :attr:`fix` point) and polynomials (``fit='poly<deg>'``), the resamples
+    are solved all at once in blocks whose size is limited by the
+    ``'plotter.linreg.bootstrap.max_memory'`` item of the
+    :attr:`~psyplot.config.rcsetup.rcParams`. The resamples of the other
+    fit methods can be distributed to a pool of threads or processes via the
+    ``'plotter.linreg.bootstrap.workers'`` and
+    ``'plotter.linreg.bootstrap.executor'`` items (see
+    :func:`psy_reg.algorithms.parallel_bootstrap`).
+
+    If the ``'plotter.linreg.ci.method'`` item of the
+    :attr:`~psyplot.config.rcsetup.rcParams` is set to ``'analytic'``, the
+    confidence interval is computed in closed form from the covariance matrix
+    of the fitted parameters (or, for LOWESS fits, from the weights of the
+    local fits). This is much faster but only works for linear, robust,
+    polynomial (including ``'poly_auto'``), LOWESS, segmented and callable
+    fits. Other models fall back to the bootstrap. The resamples of LOWESS
+    fits are solved all at once with the kernel of the fit to the full data
+    and smoothing splines are bootstrapped through their residuals with one
+    factorization for a block of resamples.
+
     Possible types
     --------------
     None
@@ -720,54 +2241,439 @@ class Ci(Formatoption):
 
     name = "Draw a confidence interval"
 
+    def __init__(self, *args, **kwargs):
+        super(Ci, self).__init__(*args, **kwargs)
+        self._boot_cache = OrderedDict()
+        self._batch_dists = {}
+
     def initialize_plot(self, *args, **kwargs):
         self.cis = []
         super(Ci, self).initialize_plot(*args, **kwargs)
 
     def update(self, value):
-        def make_fit(x_, y_, **kwargs):
-            return fit_fmt.make_fit(i, x_, y_, **kwargs)[1]
-
         self.remove()
         if value is None or self.fit.value is None:
             return
         fit_fmt = self.fit
-        nboot = self.nboot.value
+        if fit_fmt.groups is not None:
+            return self.update_groups(value)
+        if rcParams["plotter.linreg.ci.method"] == "analytic":
+            self._batch_dists = {}
+        else:
+            self._batch_dists = self.batch_bootstrap(list(self.iter_raw_data))
         for i, (da, da_fit) in enumerate(
             zip(self.iter_raw_data, self.iter_data)
         ):
             if fit_fmt.fits[i] is None:
                 continue
-            x, xname, y, yname = fit_fmt.get_xy(i, da)
             coord = da_fit.coords[da_fit.dims[0]]
             x_line = coord.values
             kwargs = self.fit.get_kwargs(i)
-            boot = bootstrap(
-                x, y, func=make_fit, n_boot=nboot, x_line=x_line, **kwargs
+            fit_fmt.set_method(i)
+            ci_range = None
+            if rcParams["plotter.linreg.ci.method"] == "analytic":
+                nobs = fit_fmt.get_nobs(i, da)
+                ci_range = self.calc_analytic_ci(
+                    i, value, nobs, x_line, da_fit, **kwargs
+                )
+            if ci_range is None:
+                ci_range = self.calc_bootstrap_ci(
+                    i, value, da, x_line, **kwargs
+                )
+            self.set_ci(i, da, da_fit, ci_range)
+        self._batch_dists.clear()
+
+    def update_groups(self, value):
+        """Compute the confidence intervals of the groups of the fit
+
+        The intervals are computed for each line of the
+        :attr:`~LinearRegressionFit.groups` of the :attr:`fit` formatoption,
+        either in closed form or with the vectorized bootstrap of the
+        :func:`psy_reg.algorithms.linear_bootstrap` function."""
+        fit_fmt = self.fit
+        arrays = list(self.iter_raw_data)
+        analytic = rcParams["plotter.linreg.ci.method"] == "analytic"
+        for j, ((i, label, x, y), da_fit) in enumerate(
+            zip(fit_fmt.groups, self.iter_data)
+        ):
+            coord = da_fit.coords[da_fit.dims[0]]
+            x_line = coord.values
+            fix = fit_fmt.get_kwargs(i).get("fix")
+            fit_fmt.set_method(i)
+            if analytic:
+                ci_range = self.calc_analytic_ci(
+                    j, value, len(x), x_line, da_fit, fix=fix
+                )
+            else:
+                intercepts, slopes = linear_bootstrap(
+                    x, y, self.nboot.value, fix=fix
+                )
+                ci_range = calc_ci(
+                    intercepts[:, np.newaxis] + np.outer(slopes, x_line),
+                    value,
+                    0,
+                )
+            self.set_ci(j, arrays[i], da_fit, ci_range)
+
+    def set_ci(self, i, da, da_fit, ci_range):
+        """Set the confidence interval of a fitted line
+
+        Parameters
+        ----------
+        i: int
+            The index of the line in the plotted data
+        da: xarray.DataArray
+            The raw data array
+        da_fit: xarray.DataArray
+            The fitted data as computed by the :attr:`fit` formatoption
+        ci_range: np.ndarray of shape ``(2, len(x_line))``
+            The lower and upper bound of the confidence interval"""
+        coord = da_fit.coords[da_fit.dims[0]]
+        min_range, max_range = np.asarray(ci_range).astype(da.dtype)
+        ds = da_fit.to_dataset()
+        ds["min_err"] = DataArray(
+            min_range,
+            coords={coord.name: coord},
+            dims=(coord.name,),
+            name="min_err",
+        )
+        ds["max_err"] = DataArray(
+            max_range,
+            coords={coord.name: coord},
+            dims=(coord.name,),
+            name="max_err",
+        )
+        new = DataArray(ds.to_array(name=da.name)).assign_coords(
+            **self._get_other_coords(da_fit)
+        )
+        new.psy.init_accessor(base=ds, arr_name=da_fit.psy.arr_name)
+        self.set_data(new, i)
+        new.attrs.update(da_fit.attrs)
+        new.name = da.name
+
+    def robust_irls(self, i):
+        """Check whether a robust fit is bootstrapped with numpy
+
+        Robust fits are bootstrapped with the vectorized
+        :func:`psy_reg.algorithms.robust_bootstrap` function, unless the
+        ``'plotter.linreg.robust.engine'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams` is ``'statsmodels'``. Then
+        every resample is fitted with the statsmodels RLM, as the fit
+        itself."""
+        fit_fmt = self.fit
+        fit_fmt.set_method(i)
+        return (
+            fit_fmt.method == "statsmodels"
+            and fit_fmt.model is sm.RLM
+            and rcParams["plotter.linreg.robust.engine"] == "irls"
+        )
+
+    def batch_bootstrap(self, arrays):
+        """Bootstrap the linear fits of several arrays at once
+
+        Arrays with a linear (or robust) fit and the same number of data
+        points are resampled with the same indices in one call of the
+        :func:`psy_reg.algorithms.linear_bootstrap` (or
+        :func:`psy_reg.algorithms.robust_bootstrap`) function.
+
+        Parameters
+        ----------
+        arrays: list of xarray.DataArray
+            The raw data arrays
+
+        Returns
+        -------
+        dict
+            A mapping from the index of the array to the bootstrapped
+            intercepts and slopes. Arrays that cannot be bootstrapped in a
+            batch or whose distribution is already cached are not included
+        """
+        fit_fmt = self.fit
+        groups = defaultdict(list)
+        for i, da in enumerate(arrays):
+            if fit_fmt.fits[i] is None:
+                continue
+            fit_fmt.set_method(i)
+            state = fit_fmt._states.get(i)
+            if (
+                fit_fmt.method == "statsmodels"
+                and (fit_fmt.model is sm.OLS or self.robust_irls(i))
+                and state is not None
+                and state["nobs"] is not None
+                and not fit_fmt.compresses(i)
+                and self._get_boot_key(i) not in self._boot_cache
+            ):
+                fix = fit_fmt.get_kwargs(i).get("fix")
+                groups[fit_fmt.model, state["nobs"], fix is None].append(i)
+        ret = {}
+        for (model, n, no_fix), indices in groups.items():
+            if len(indices) < 2:
+                continue
+            xs, ys = [], []
+            for i in indices:
+                x, xname, y, yname = fit_fmt.get_xy(i, arrays[i])
+                xs.append(x)
+                ys.append(y)
+            if no_fix:
+                fix = None
+            else:
+                fix = [fit_fmt.get_kwargs(i)["fix"] for i in indices]
+            bootstrap_func = (
+                linear_bootstrap if model is sm.OLS else robust_bootstrap
+            )
+            intercepts, slopes = bootstrap_func(
+                xs, ys, self.nboot.value, fix=fix
+            )
+            for j, i in enumerate(indices):
+                ret[i] = intercepts[j], slopes[j]
+        return ret
+
+    def calc_bootstrap_ci(self, i, which, da, x_line, **kwargs):
+        """Estimate the confidence interval through bootstrapping
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        which: float
+            The size of the confidence interval between 0 and 100
+        da: xarray.DataArray
+            The raw data array
+        x_line: np.ndarray
+            The x-data of the line
+        ``**kwargs``
+            Any other keyword argument for the fit (see
+            :meth:`LinearRegressionFit.get_kwargs`)
+
+        Returns
+        -------
+        np.ndarray of shape ``(2, len(x_line))``
+            The lower and upper bound of the confidence interval"""
+        return calc_ci(self.get_boot_dist(i, da, x_line, **kwargs), which, 0)
+
+    def get_boot_dist(self, i, da, x_line, **kwargs):
+        """Get the bootstrap distribution of the fit on the line
+
+        The distributions are cached for the fitted state of the :attr:`fit`
+        formatoption (see :meth:`LinearRegressionFit.get_state`), such that
+        an update of the size of the confidence interval only recomputes the
+        percentiles. For linear fits (including the robust and median-based
+        ones), the bootstrapped intercepts and slopes are cached and only
+        evaluated on the new line if `x_line` changes. The number of cached
+        distributions is limited by the
+        ``'plotter.linreg.bootstrap.cache_size'`` item of the
+        :attr:`~psyplot.config.rcsetup.rcParams`.
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        da: xarray.DataArray
+            The raw data array
+        x_line: np.ndarray
+            The x-data of the line
+        ``**kwargs``
+            Any other keyword argument for the fit
+
+        Returns
+        -------
+        np.ndarray of shape ``(nboot, len(x_line))``
+            The fits of the resamples evaluated on `x_line`"""
+        fit_fmt = self.fit
+        linear = fit_fmt.method in ["statsmodels", "median"]
+        cache_size = rcParams["plotter.linreg.bootstrap.cache_size"]
+        if not cache_size:
+            self._boot_cache.clear()
+        key = self._get_boot_key(i, x_line)
+        if key in self._boot_cache:
+            boot = self._boot_cache[key]
+            self._boot_cache.move_to_end(key)
+        else:
+            if i in self._batch_dists:
+                boot = self._batch_dists[i]
+            else:
+                x, xname, y, yname, weights = fit_fmt.get_xy(
+                    i, da, weighted=True
+                )
+                boot = self._bootstrap(
+                    i, x, y, x_line, weights=weights, **kwargs
+                )
+            if key is not None:
+                self._boot_cache[key] = boot
+                while len(self._boot_cache) > cache_size:
+                    self._boot_cache.popitem(last=False)
+        if linear:
+            intercepts, slopes = boot
+            return intercepts[:, np.newaxis] + np.outer(slopes, x_line)
+        return boot
+
+    def _get_boot_key(self, i, x_line=None):
+        """Get the key of the bootstrap distribution in the cache"""
+        fit_fmt = self.fit
+        state = fit_fmt._states.get(i)
+        if (
+            state is None
+            or not rcParams["plotter.linreg.bootstrap.cache_size"]
+        ):
+            return None
+        key = (state["id"], self.nboot.value) + tuple(
+            rcParams["plotter.linreg.bootstrap." + key]
+            for key in ["random_seed", "workers", "executor", "chunksize"]
+        )
+        fit_fmt.set_method(i)
+        if fit_fmt.method in ["statsmodels", "median"]:
+            return key
+        return key + (fingerprint(x_line),)
+
+    def _bootstrap(self, i, x, y, x_line, weights=None, **kwargs):
+        def make_fit(x_, y_, **kwargs):
+            return fit_fmt.make_fit(i, x_, y_, **kwargs)[1]
+
+        def fit_params(x_, y_, **kwargs):
+            attrs = fit_fmt.make_fit(i, x_, y_, x_line, **kwargs)[2]
+            return attrs["intercept"], attrs["slope"]
+
+        fit_fmt = self.fit
+        nboot = self.nboot.value
+        if fit_fmt.method == "curve_fit":
+            # start every resample from the fit to the full data
+            kwargs["p0"] = fit_fmt.fits[i].params
+        if fit_fmt.method == "statsmodels" and fit_fmt.model is sm.OLS:
+            return linear_bootstrap(
+                x, y, nboot, fix=kwargs.get("fix"), weights=weights
             )
-            min_range, max_range = calc_ci(boot, value, axis=0).astype(
-                da.dtype
+        elif fit_fmt.method == "statsmodels" and self.robust_irls(i):
+            return robust_bootstrap(x, y, nboot, fix=kwargs.get("fix"))
+        elif fit_fmt.method == "statsmodels":
+            # fit every resample with the statsmodels RLM
+            boot = bootstrap(x, y, func=fit_params, n_boot=nboot, **kwargs)
+            return boot[:, 0], boot[:, 1]
+        elif fit_fmt.method == "median":
+            return median_bootstrap(
+                x,
+                y,
+                nboot,
+                fit_fmt.model,
+                fix=kwargs.get("fix"),
+                params=fit_fmt.fits[i],
             )
-            ds = da_fit.to_dataset()
-            ds["min_err"] = DataArray(
-                min_range,
-                coords={coord.name: coord},
-                dims=(coord.name,),
-                name="min_err",
+        elif fit_fmt.method == "lowess":
+            return fit_fmt.fits[i].bootstrap(
+                x, y, x_line, nboot, weights=weights
             )
-            ds["max_err"] = DataArray(
-                max_range,
-                coords={coord.name: coord},
-                dims=(coord.name,),
-                name="max_err",
+        elif fit_fmt.method == "spline":
+            return fit_fmt.fits[i].bootstrap(x_line, nboot)
+        elif fit_fmt.method == "poly":
+            return poly_bootstrap(
+                x,
+                y,
+                fit_fmt.model.keywords["deg"],
+                nboot,
+                x_line,
+                weights=weights,
             )
-            new = DataArray(ds.to_array(name=da.name)).assign_coords(
-                **self._get_other_coords(da_fit)
+        elif (
+            weights is None
+            and rcParams["plotter.linreg.bootstrap.workers"] != 1
+        ):
+            return parallel_bootstrap(
+                x, y, fit_fmt.get_line_fit(i, x_line, **kwargs), nboot
+            )
+        else:
+            return bootstrap(
+                x,
+                y,
+                func=make_fit,
+                n_boot=nboot,
+                weights=weights,
+                x_line=x_line,
+                **kwargs,
+            )
+
+    def calc_analytic_ci(self, i, which, nobs, x_line, da_fit, fix=None):
+        """Calculate the confidence interval from the parameter covariance
+
+        This method computes the confidence band in closed form from the
+        covariance matrix of the fitted parameters (see
+        :func:`psy_reg.algorithms.analytic_ci`). For a callable :attr:`fit`,
+        the gradient of the function with respect to the parameters is
+        approximated through finite differences (delta method).
+
+        Parameters
+        ----------
+        i: int
+            The index of the array
+        which: float
+            The size of the confidence interval between 0 and 100
+        nobs: int
+            The number of data points of the fit
+        x_line: np.ndarray
+            The x-data of the line
+        da_fit: xarray.DataArray
+            The fitted data as computed by the :attr:`fit` formatoption
+        fix: list of float
+            The fix point of the fit
+
+        Returns
+        -------
+        np.ndarray of shape ``(2, len(x_line))`` or None
+            The lower and upper bound of the confidence interval or None, if
+            the fit does not provide a covariance matrix"""
+        fit_fmt = self.fit
+        fit = fit_fmt.fits[i]
+        method = fit_fmt.method
+        if method == "statsmodels":
+            params = np.asarray(fit.params)
+            cov = np.asarray(fit.cov_params())
+            dof = fit.df_resid if getattr(fit, "use_t", False) else None
+            if fix is None:
+                design = np.c_[np.ones_like(x_line), x_line]
+                offset = 0
+            else:
+                design = (x_line - fix[0])[:, np.newaxis]
+                offset = fix[1]
+            y_line = design.dot(params) + offset
+        elif method == "poly":
+            cov = fit
+            deg = len(cov) - 1
+            # the covariance is sorted from the highest to the lowest power
+            params = np.array(
+                [da_fit.attrs["c%i" % j] for j in range(deg, -1, -1)]
             )
-            new.psy.init_accessor(base=ds, arr_name=da.psy.arr_name)
-            self.set_data(new, i)
-            new.attrs.update(da_fit.attrs)
-            new.name = da.name
+            design = np.vander(x_line, deg + 1)
+            dof = nobs - deg - 1
+            y_line = design.dot(params)
+        elif method == "lowess":
+            y_line = fit.predict(x_line)
+            crit = stats.t.ppf(0.5 + which / 200.0, fit.dof)
+            err = crit * fit.stderr(x_line)
+            return np.array([y_line - err, y_line + err])
+        elif method == "poly_auto":
+            # the degree is treated as known
+            design = np.vander(x_line, fit.deg + 1)
+            cov = fit.cov
+            dof = fit.df_resid
+            y_line = fit.predict(x_line)
+        elif method == "segmented":
+            # the breakpoints are treated as known
+            design = fit.design(x_line)
+            cov = fit.cov_params()
+            dof = fit.df_resid
+            y_line = fit.predict(x_line)
+        elif method == "curve_fit" and fit.pcov is not None:
+            params = np.asarray(fit.params, dtype=float)
+            cov = fit.pcov
+            dof = nobs - len(params)
+            y_line = fit.predict(x_line)
+            design = np.empty((len(x_line), len(params)))
+            for j in range(len(params)):
+                step = np.sqrt(np.finfo(float).eps) * max(abs(params[j]), 1)
+                shifted = params.copy()
+                shifted[j] += step
+                design[:, j] = (fit.function(x_line, *shifted) - y_line) / step
+        else:
+            return None
+        return analytic_ci(design, cov, y_line, which, dof)
 
     def _get_other_coords(self, raw_da):
         return {
@@ -776,6 +2682,236 @@ class Ci(Formatoption):
         }
 
 
+class FitDimension(Formatoption):
+    """
+    The dimension to fit along
+
+    Possible types
+    --------------
+    None
+        Use the first dimension of the data
+    str
+        The name of the dimension
+
+    See Also
+    --------
+    fit
+    """
+
+    priority = START
+
+    group = "regression"
+
+    name = "Dimension to fit along"
+
+    def update(self, value):
+        """Does nothing. The work is done by the :class:`GriddedFit`
+        formatoption"""
+        pass
+
+
+class FitParameter(Formatoption):
+    """
+    The fitted parameter to visualize
+
+    Possible types
+    --------------
+    str
+        The name of a variable in the dataset of the
+        :func:`psy_reg.gridded.fit_along` function, e.g. ``'slope'``,
+        ``'intercept'``, ``'rsquared'``, ``'nobs'``, the standard error
+        ``'slope_err'`` or the width of the confidence interval
+        ``'slope_ci'``. For polynomials, the coefficients are ``'c0'``,
+        ``'c1'``, etc.
+
+    See Also
+    --------
+    fit
+    """
+
+    priority = START
+
+    group = "regression"
+
+    name = "Fitted parameter to visualize"
+
+    def update(self, value):
+        """Does nothing. The work is done by the :class:`GriddedFit`
+        formatoption"""
+        pass
+
+
+class ParameterCi(Formatoption):
+    """
+    The size of the confidence interval of the fitted parameters
+
+    Possible types
+    --------------
+    None
+        Do not calculate the confidence intervals
+    float
+        A quantile between 0 and 100 for the ``'<param>_ci'`` variables of
+        the :attr:`fit_param` formatoption
+
+    See Also
+    --------
+    fit
+    """
+
+    priority = START
+
+    group = "regression"
+
+    name = "Size of the confidence interval of the fitted parameters"
+
+    def update(self, value):
+        """Does nothing. The work is done by the :class:`GriddedFit`
+        formatoption"""
+        pass
+
+
+class GriddedFit(Formatoption):
+    """
+    Choose the fit method along the :attr:`fit_dim` dimension
+
+    This formatoption fits the data of every grid cell along the
+    :attr:`fit_dim` dimension at once (see
+    :func:`psy_reg.gridded.fit_along`) and visualizes the parameter of the
+    :attr:`fit_param` formatoption. The dataset with all parameters is
+    accessible through the ``params`` attribute.
+
+    Possible types
+    --------------
+    'fit' or 'linear'
+        make a linear fit
+    'poly<deg>'
+        Make a polynomial fit of the order ``'<deg>'``
+
+    See Also
+    --------
+    fix, fit_dim, fit_param
+    """
+
+    dependencies = ["fix", "fit_dim", "fit_param", "ci"]
+
+    priority = START
+
+    name = "Change the fit method"
+
+    data_dependent = True
+
+    group = "regression"
+
+    def __init__(self, *args, **kwargs):
+        super(GriddedFit, self).__init__(*args, **kwargs)
+        self._kwargs = {}
+
+    def update(self, value):
+        da = self.raw_data
+        fix = self._kwargs.get("fix", [None])[0]
+        self.params = ds = fit_along(
+            da, self.fit_dim.value, value, fix=fix, ci=self.ci.value
+        )
+        arr = ds[self.fit_param.value]
+        arr.psy.init_accessor(base=ds, arr_name=da.psy.arr_name)
+        self.set_data(arr)
+        self.set_decoder(CFDecoder(ds))
+
+
+class BinnedFit(Formatoption):
+    """
+    Fit the cells of the histogram instead of all points
+
+    If True, the data points are replaced by the centroids of the nonzero
+    cells of the 2D histogram (see the :attr:`bins`, :attr:`xrange` and
+    :attr:`yrange` formatoptions), weighted by the number of points in each
+    cell. The costs of the :attr:`fit` and the bootstrap of the :attr:`ci`
+    then scale with the number of bins rather than the number of points.
+    This is supported for all fits that accept weighted points (see
+    :meth:`LinearRegressionFit.supports_weights`), i.e. linear (non-robust),
+    polynomial (including the automatic degree selection), LOWESS, smoothing
+    spline, segmented and callable fits. Robust, Theil-Sen, Siegel and
+    custom estimator fits always use all points.
+
+    Possible types
+    --------------
+    bool
+        If True, fit the histogram, otherwise all points
+
+    See Also
+    --------
+    bins, fit, ci
+    """
+
+    priority = START
+
+    group = "regression"
+
+    name = "Fit the histogram instead of all points"
+
+    def update(self, value):
+        """Does nothing. The work is done by the :class:`fit` formatoption"""
+        pass
+
+
+def _bin_indices(x, xmin, xmax, nbins):
+    """Get the indices of the equally spaced bins between xmin and xmax"""
+    if xmax <= xmin:
+        return np.zeros(len(x), dtype=int)
+    indices = ((x - xmin) * (nbins / (xmax - xmin))).astype(int)
+    return np.clip(indices, 0, nbins - 1)
+
+
+class DensityRegressionFit(LinearRegressionFit):
+    __doc__ = substitution_pattern.sub(
+        r"%\g<0>", LinearRegressionFit.__doc__.rstrip() + ", binned\n"
+    )
+
+    dependencies = LinearRegressionFit.dependencies + ["binned", "bins"]
+
+    def _get_settings(self, i):
+        return repr(
+            (
+                super(DensityRegressionFit, self)._get_settings(i),
+                bool(self.binned.value),
+                list(self.bins.bins),
+            )
+        )
+
+    def compresses(self, i):
+        if self.binned.value and self.supports_weights(i):
+            return True
+        return super(DensityRegressionFit, self).compresses(i)
+
+    def compress(self, i, x, y):
+        """Compress the data into the cells of the histogram
+
+        The points of each nonzero cell are replaced by their centroid and
+        weighted by their number, if the :attr:`binned` formatoption is
+        True. Otherwise, identical points may be collapsed. See
+        :meth:`LinearRegressionFit.compress` for the parameters and
+        details"""
+        if (
+            not (self.binned.value and self.supports_weights(i))
+            or is_dask_array(x)
+            or not len(x)
+        ):
+            return super(DensityRegressionFit, self).compress(i, x, y)
+        xmin, xmax, ymin, ymax = self.get_ranges(i)
+        nx, ny = self.bins.bins
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        cells = _bin_indices(x, xmin, xmax, nx) * ny + _bin_indices(
+            y, ymin, ymax, ny
+        )
+        counts = np.bincount(cells)
+        nonzero = counts.nonzero()[0]
+        counts = counts[nonzero]
+        x = np.bincount(cells, x)[nonzero] / counts
+        y = np.bincount(cells, y)[nonzero] / counts
+        return x, y, counts
+
+
 class FitPointDensity(psyps.PointDensity):
     children = psyps.PointDensity.children + ["line_xlim"]
 
@@ -800,6 +2936,7 @@ class LinRegPlotter(psyps.LinePlotter):
     param_bounds = ParameterBounds("param_bounds")
     p0 = InitialParameters("p0")
     fit = LinearRegressionFit("fit")
+    groupby = GroupBy("groupby")
     fix = FixPoint("fix")
     nboot = NBoot("nboot")
     ci = Ci("ci")
@@ -833,7 +2970,9 @@ class DensityRegPlotter(
     # line plot formatoptions
     param_bounds = ParameterBounds("param_bounds", index_in_list=1)
     p0 = InitialParameters("p0", index_in_list=1)
-    fit = LinearRegressionFit("fit", index_in_list=1)
+    fit = DensityRegressionFit("fit", index_in_list=1)
+    binned = BinnedFit("binned", index_in_list=1)
+    groupby = GroupBy("groupby", index_in_list=1)
     fix = FixPoint("fix", index_in_list=1)
     nboot = NBoot("nboot", index_in_list=1)
     ci = Ci("ci", index_in_list=1)
@@ -856,3 +2995,22 @@ class DensityRegPlotter(
 for fmt in psyps.XYTickPlotter._get_formatoptions():
     fmto_cls = getattr(psyps.XYTickPlotter, fmt).__class__
     setattr(DensityRegPlotter, fmt, fmto_cls(fmt, index_in_list=1))
+
+
+class FitMapPlotter(psyps.Simple2DPlotter):
+    """A plotter to visualize the parameters of fits along one dimension
+
+    This plotter fits the data of every grid cell along the :attr:`fit_dim`
+    dimension (e.g. the time) and visualizes one of the fitted parameters
+    (:attr:`fit_param`), e.g. to create trend maps. Otherwise this plotter
+    behaves like the :class:`psyplot.plotter.simple.Simple2DPlotter`"""
+
+    _rcparams_string = ["plotter.fitmap."]
+
+    allowed_dims = 3
+
+    fit = GriddedFit("fit")
+    fix = FixPoint("fix")
+    fit_dim = FitDimension("fit_dim")
+    fit_param = FitParameter("fit_param")
+    ci = ParameterCi("ci")
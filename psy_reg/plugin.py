@@ -21,7 +21,7 @@ from psy_simple.plugin import (
     validate_none,
     validate_str,
 )
-from psyplot.config.rcsetup import RcParams
+from psyplot.config.rcsetup import RcParams, validate_bool
 
 from psy_reg import __version__ as plugin_version
 
@@ -78,7 +78,18 @@ def validate_callable(val):
 
 def validate_fit(val):
     def validate(val):
-        if isinstance(val, str) and val.startswith("poly"):
+        if isinstance(val, str) and val.startswith("poly_auto"):
+            try:
+                if val[9:]:
+                    int(val[9:])
+            except ValueError:
+                raise ValueError(
+                    "Automatic polynomials must be of the form 'poly_auto' "
+                    "or 'poly_auto<deg>' (e.g. 'poly_auto4'), not %s!" % val
+                )
+            else:
+                return val
+        elif isinstance(val, str) and val.startswith("poly"):
             try:
                 int(val[4:])
             except ValueError:
@@ -88,12 +99,45 @@ def validate_fit(val):
                 )
             else:
                 return val
+        elif isinstance(val, str) and val.startswith("spline") and val[6:]:
+            try:
+                float(val[6:])
+            except ValueError:
+                raise ValueError(
+                    "Smoothing splines must be of the form 'spline' or "
+                    "'spline<lam>' (e.g. 'spline0.5'), not %s!" % val
+                )
+            else:
+                return val
+        elif isinstance(val, str) and val.startswith("segmented") and val[9:]:
+            try:
+                int(val[9:])
+            except ValueError:
+                raise ValueError(
+                    "Segmented fits must be of the form 'segmented' or "
+                    "'segmented<k>' (e.g. 'segmented2'), not %s!" % val
+                )
+            else:
+                return val
         elif hasattr(val, "fit") and hasattr(val, "predict"):
             return val
         return try_and_error(
             validate_callable,
             validate_none,
-            ValidateInStrings("fit", ["fit", "linear", "robust"], True),
+            ValidateInStrings(
+                "fit",
+                [
+                    "fit",
+                    "linear",
+                    "robust",
+                    "theilsen",
+                    "siegel",
+                    "lowess",
+                    "spline",
+                    "segmented",
+                ],
+                True,
+            ),
         )(val)
 
     return list(map(validate, safe_list(val)))
@@ -266,6 +310,16 @@ rcParams = RcParams(
                     "default_slice": None,
                     "summary": "Draw a fit from x to y",
                 },
+                "fitmap": {
+                    "module": "psy_reg.plotters",
+                    "plotter_name": "FitMapPlotter",
+                    "prefer_list": False,
+                    "default_slice": None,
+                    "summary": (
+                        "Visualize the parameters of fits along one "
+                        "dimension of gridded data"
+                    ),
+                },
                 "densityreg": {
                     "module": "psy_reg.plotters",
                     "plotter_name": "DensityRegPlotter",
@@ -308,6 +362,26 @@ rcParams = RcParams(
             validate_p0,
             "fmt key to specify the initial parameters of the fit",
         ],
+        "plotter.linreg.p0.max_samples": [
+            10000,
+            try_and_error(validate_none, validate_int),
+            "The maximum number of data points to estimate the initial "
+            "parameters with the differential evolution. The result is then "
+            "polished on the full data",
+        ],
+        "plotter.linreg.p0.workers": [
+            1,
+            try_and_error(validate_none, validate_int),
+            "The number of processes for the differential evolution to "
+            "estimate the initial parameters if the fit function cannot "
+            "evaluate the population at once. None means all processors",
+        ],
+        "plotter.linreg.p0.maxfev": [
+            None,
+            try_and_error(validate_none, validate_int),
+            "The approximate maximum number of function evaluations to "
+            "estimate the initial parameters",
+        ],
         "plotter.linreg.fix": [
             None,
             validate_fix,
@@ -318,6 +392,11 @@ rcParams = RcParams(
             validate_fit,
             "The model to use for fitting a model",
         ],
+        "plotter.linreg.groupby": [
+            None,
+            try_and_error(validate_none, validate_str),
+            "The coordinate to group the data by for separate fits",
+        ],
         "plotter.linreg.nboot": [
             1000,
             validate_int,
@@ -328,6 +407,12 @@ rcParams = RcParams(
             try_and_error(validate_none, validate_float),
             "Size of the confidence interval",
         ],
+        "plotter.linreg.ci.method": [
+            "bootstrap",
+            ValidateInStrings("ci.method", ["bootstrap", "analytic"], True),
+            "The method to estimate the confidence interval. Either "
+            "'bootstrap' or 'analytic'",
+        ],
         "plotter.linreg.id_color": [
             None,
             psyps_rc.validate["plotter.simple.color"],
@@ -344,7 +429,158 @@ rcParams = RcParams(
             "The seed to use for the bootstrap algorithm to estimate the "
             "confidence interval",
         ],
+        "plotter.linreg.bootstrap.workers": [
+            1,
+            try_and_error(validate_none, validate_int),
+            "The number of workers to run the bootstrap algorithm in "
+            "parallel. If 1, the resamples are computed serially and if None, "
+            "the number of processors is used",
+        ],
+        "plotter.linreg.bootstrap.executor": [
+            "thread",
+            ValidateInStrings("executor", ["thread", "process"], True),
+            "The pool ('thread' or 'process') to run the bootstrap algorithm "
+            "in parallel",
+        ],
+        "plotter.linreg.bootstrap.chunksize": [
+            25,
+            validate_int,
+            "The number of resamples that are drawn from one random stream "
+            "in the parallel bootstrap algorithm",
+        ],
+        "plotter.linreg.bootstrap.cache_size": [
+            16,
+            validate_int,
+            "The maximum number of bootstrap distributions that are cached "
+            "per plotter. 0 disables the cache",
+        ],
+        "plotter.linreg.bootstrap.max_memory": [
+            100,
+            validate_float,
+            "The memory budget in megabytes for the vectorized bootstrap "
+            "algorithms",
+        ],
+        "plotter.linreg.bootstrap.median_size": [
+            300,
+            validate_int,
+            "The maximum number of points per bootstrap resample of a "
+            "Theil-Sen or Siegel fit without fix point. Larger data is "
+            "bootstrapped with resamples of this size whose spread is "
+            "scaled to the size of the data",
+        ],
+        "plotter.linreg.ols.engine": [
+            "sums",
+            ValidateInStrings("ols.engine", ["sums", "statsmodels"], True),
+            "The engine for linear fits. 'sums' computes the fit in closed "
+            "form from running sums and 'statsmodels' creates the full "
+            "statsmodels results. With 'sums', several arrays are fitted in "
+            "one batch, unless the xrange of a 1D array with a monotonic "
+            "coordinate excludes some of the data. Then the array is fitted "
+            "from its cumulative sums",
+        ],
+        "plotter.linreg.robust.engine": [
+            "irls",
+            ValidateInStrings("robust.engine", ["irls", "statsmodels"], True),
+            "The engine for robust linear fits and their bootstrap. 'irls' "
+            "iterates the fits in numpy (vectorized over bootstrap "
+            "resamples) and 'statsmodels' fits the data and every resample "
+            "with the statsmodels RLM",
+        ],
+        "plotter.linreg.compress": [
+            False,
+            validate_bool,
+            "Collapse identical (x, y) pairs into unique points with counts "
+            "before the fits that accept weighted points (linear, "
+            "polynomial, LOWESS, spline, segmented and callable fits) and "
+            "their bootstrap",
+        ],
+        "plotter.linreg.incremental": [
+            False,
+            validate_bool,
+            "Update the linear, polynomial and partial_fit fits of 1D data "
+            "with the appended data points only, if the data only grew "
+            "along the fit dimension",
+        ],
+        "plotter.linreg.lowess.frac": [
+            2.0 / 3.0,
+            validate_float,
+            "The fraction of the data that is used for each local fit of a "
+            "LOWESS fit",
+        ],
+        "plotter.linreg.lowess.bins": [
+            1000,
+            validate_int,
+            "The maximum number of bins along the x-axis that the data is "
+            "aggregated into for a LOWESS fit",
+        ],
+        "plotter.linreg.spline.bins": [
+            200,
+            validate_int,
+            "The maximum number of knots of a smoothing spline. For more "
+            "data points, the data is aggregated into bins along the "
+            "x-axis",
+        ],
+        "plotter.linreg.poly_auto.max_deg": [
+            6,
+            validate_int,
+            "The maximum degree of a polynomial fit with an automatically "
+            "selected degree ('poly_auto')",
+        ],
+        "plotter.linreg.poly_auto.criterion": [
+            "bic",
+            ValidateInStrings(
+                "poly_auto.criterion", ["aic", "bic", "press"], True
+            ),
+            "The criterion to select the degree of a 'poly_auto' fit. "
+            "Either the Akaike ('aic') or Bayesian ('bic') information "
+            "criterion or the leave-one-out cross-validation error ('press')",
+        ],
+        "plotter.linreg.siegel.max_pairs": [
+            2**24,
+            validate_int,
+            "The maximum number of slopes for a fit with Siegel's repeated "
+            "medians. For more data points, the median slope of every point "
+            "is estimated from a random subset of the other points",
+        ],
+        "plotter.linreg.ols.chunksize": [
+            1048576,
+            validate_int,
+            "The number of data points that are processed at once when "
+            "computing the sums for a linear fit",
+        ],
+        # maps of fitted parameters
+        "plotter.fitmap.fit": [
+            "fit",
+            validate_str,
+            "The fit method along the fit_dim dimension. Either 'fit' or "
+            "'poly<deg>'",
+        ],
+        "plotter.fitmap.fix": [
+            None,
+            validate_fix,
+            "Force the linear fits to go through a given point",
+        ],
+        "plotter.fitmap.fit_dim": [
+            None,
+            try_and_error(validate_none, validate_str),
+            "The dimension to fit along. If None, the first dimension is used",
+        ],
+        "plotter.fitmap.fit_param": [
+            "slope",
+            validate_str,
+            "The fitted parameter to visualize",
+        ],
+        "plotter.fitmap.ci": [
+            95,
+            try_and_error(validate_none, validate_float),
+            "Size of the confidence interval of the fitted parameters",
+        ],
         # combined density and linear regression plot
+        "plotter.densityreg.binned": [
+            False,
+            validate_bool,
+            "Fit the weighted cells of the histogram instead of all points",
+        ],
         "plotter.densityreg.lineplot": [
             "-",
             try_and_error(validate_none, validate_str, validate_stringlist),
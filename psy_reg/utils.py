@@ -7,15 +7,19 @@
 # SPDX-License-Identifier: LGPL-3.0-only
 
 import abc
+import copyreg
+import hashlib
 import inspect
+import weakref
 from itertools import cycle
 from warnings import warn
 
 import numpy as np
-from scipy.optimize import curve_fit, differential_evolution
+from psyplot import rcParams
+from scipy.optimize import curve_fit, differential_evolution, minimize
 
 
-def rsquared(sim, obs):
+def rsquared(sim, obs, weights=None):
     r"""Calculate the R-squared (coefficient of determination, $R^2$)
 
     $R^2$ is defined as
@@ -30,17 +34,99 @@ def rsquared(sim, obs):
         Simulated values
     obs: np.ndarray
         Observed values (broadcastable to `sim`)
+    weights: np.ndarray
+        The number of data points that each observation represents
 
     Returns
     -------
     float
         The R squared"""
     residuals = obs - sim
-    ss_res = (residuals**2).sum()
-    ss_tot = ((obs - obs.mean()) ** 2).sum()
+    if weights is None:
+        ss_res = (residuals**2).sum()
+        ss_tot = ((obs - obs.mean()) ** 2).sum()
+    else:
+        ss_res = (weights * residuals**2).sum()
+        ss_tot = (
+            weights * (obs - np.average(obs, weights=weights)) ** 2
+        ).sum()
     return 1 - (ss_res / ss_tot)
 
 
+def fingerprint(*arrays):
+    """Compute a fingerprint of numpy arrays
+
+    Parameters
+    ----------
+    ``*arrays``
+        The arrays to compute the fingerprint for
+
+    Returns
+    -------
+    str
+        The hexadecimal digest of the shapes, data types and data of the
+        given `arrays`"""
+    h = hashlib.sha1()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update(str((arr.shape, arr.dtype.str)).encode("utf-8"))
+        if arr.dtype.hasobject:
+            h.update(repr(arr.tolist()).encode("utf-8"))
+        elif arr.size:
+            h.update(arr.view(np.uint8).ravel())
+    return h.hexdigest()
+
+
+class SquaredErrors(object):
+    """The sum of squared errors of a function
+
+    This picklable objective is used for the estimation of the initial
+    parameters in :meth:`GenericModel.estimate_p0`.
+
+    Parameters
+    ----------
+    function: callable
+        The function that takes the x-data and the parameters
+    x: np.ndarray
+        The x-data
+    y: np.ndarray
+        The y-data"""
+
+    def __init__(self, function, x, y):
+        self.function = function
+        self.x = x
+        self.y = y
+
+    def __call__(self, params):
+        params = np.asarray(params)
+        if params.ndim == 1:
+            return np.sum((self.y - self.function(self.x, *params)) ** 2)
+        # vectorized evaluation of a population with shape (N, S)
+        predicted = self.function(self.x[:, np.newaxis], *params)
+        return np.sum((self.y[:, np.newaxis] - predicted) ** 2, axis=0)
+
+    def is_vectorized(self, bounds):
+        """Check whether the function broadcasts over a population
+
+        Parameters
+        ----------
+        bounds: list of tuples
+            The boundaries of the parameters
+
+        Returns
+        -------
+        bool
+            True, if the function can evaluate a whole population at once"""
+        population = np.array([np.linspace(*t, 3) for t in bounds])
+        try:
+            with np.errstate(all="ignore"):
+                ret = self(population)
+                ref = [self(params) for params in population.T]
+        except Exception:
+            return False
+        return np.shape(ret) == (3,) and np.allclose(ret, ref, equal_nan=True)
+
+
 class GenericModel(metaclass=abc.ABCMeta):
     """An abstract model for least-squares regression
 
@@ -85,11 +171,59 @@ class GenericModel(metaclass=abc.ABCMeta):
         return argspec.args[1:]
 
     @classmethod
-    def estimate_p0(cls, x, y, bounds):
-        def objective(params):
-            # the sum of squared errors
-            return np.sum((y - cls.function(x, *params)) ** 2)
+    def estimate_p0(
+        cls,
+        x,
+        y,
+        bounds,
+        max_samples=None,
+        workers=None,
+        maxfev=None,
+        random_seed=None,
+    ):
+        """Estimate the initial parameters for the fit
+
+        This method uses the :func:`scipy.optimize.differential_evolution`
+        function to minimize the sum of squared errors. If the
+        :meth:`function` supports broadcasting, the whole population is
+        evaluated at once. The search may be performed on a random subsample
+        of the data which is then polished on the full data using the
+        L-BFGS-B algorithm. The subsample and the differential evolution
+        are drawn from a local random state, such that the estimate is
+        reproducible and does not alter the global random state of numpy.
 
+        Parameters
+        ----------
+        x: np.ndarray
+            The x-data
+        y: np.ndarray
+            The y-data
+        bounds: list of tuples
+            The finite boundaries for each parameter
+        max_samples: int
+            The maximum number of data points for the differential
+            evolution. If None, the ``'plotter.linreg.p0.max_samples'`` item
+            of the :attr:`~psyplot.config.rcsetup.rcParams` is used
+        workers: int
+            The number of processes to evaluate the population in parallel
+            if the :meth:`function` does not support broadcasting. If None,
+            the ``'plotter.linreg.p0.workers'`` item of the
+            :attr:`~psyplot.config.rcsetup.rcParams` is used
+        maxfev: int
+            The approximate maximum number of function evaluations. If None,
+            the ``'plotter.linreg.p0.maxfev'`` item of the
+            :attr:`~psyplot.config.rcsetup.rcParams` is used
+        random_seed: int
+            The seed for the random state. If None, the
+            ``'plotter.linreg.bootstrap.random_seed'`` item of the
+            :attr:`~psyplot.config.rcsetup.rcParams` is used and, if this is
+            None as well, 0
+
+        Returns
+        -------
+        np.ndarray or None
+            The estimated parameters or None if they could not be estimated
+        """
         if bounds is None or np.isinf(bounds).any():
             warn(
                 "Need finite parameter boundaries for automatic initial "
@@ -97,13 +231,57 @@ class GenericModel(metaclass=abc.ABCMeta):
                 RuntimeWarning,
             )
             return None
+        if max_samples is None:
+            max_samples = rcParams["plotter.linreg.p0.max_samples"]
+        if workers is None:
+            workers = rcParams["plotter.linreg.p0.workers"]
+        if maxfev is None:
+            maxfev = rcParams["plotter.linreg.p0.maxfev"]
+        if random_seed is None:
+            random_seed = rcParams["plotter.linreg.bootstrap.random_seed"]
+        random_state = np.random.RandomState(
+            0 if random_seed is None else random_seed
+        )
         if np.ndim(bounds) == 1:
             bounds = [bounds]
         args = cls.func_args()
         bounds = [t for t, arg in zip(cycle(bounds), args)]
 
-        result = differential_evolution(objective, bounds)
-        if result.success:
+        x_full, y_full = np.asarray(x), np.asarray(y)
+        x, y = x_full, y_full
+        if max_samples and len(x) > max_samples:
+            indices = random_state.choice(len(x), max_samples, replace=False)
+            x, y = x[indices], y[indices]
+        objective = SquaredErrors(cls.function, x, y)
+
+        kws = {}
+        popsize = 15
+        if maxfev:
+            kws["maxiter"] = max(maxfev // (popsize * len(bounds)) - 1, 1)
+        if objective.is_vectorized(bounds):
+            kws["vectorized"] = True
+            kws["updating"] = "deferred"
+        elif workers is None or workers != 1:
+            kws["workers"] = workers or -1
+            kws["updating"] = "deferred"
+
+        result = differential_evolution(
+            objective,
+            bounds,
+            popsize=popsize,
+            polish=False,
+            seed=random_state,
+            **kws,
+        )
+        polished = minimize(
+            SquaredErrors(cls.function, x_full, y_full),
+            result.x,
+            method="L-BFGS-B",
+            bounds=bounds,
+        )
+        if polished.success:
+            return polished.x
+        elif result.success:
             return result.x
         else:  # return default values
             warn(
@@ -125,11 +303,96 @@ class GenericModel(metaclass=abc.ABCMeta):
         return self.function(x, *self.params)
 
     @classmethod
-    def fit(cls, x, y, *args, **kwargs):
+    def fit(cls, x, y, *args, weights=None, **kwargs):
+        """Fit the model to the data
+
+        Parameters
+        ----------
+        x: np.ndarray
+            The x-data
+        y: np.ndarray
+            The y-data
+        weights: np.ndarray
+            The number of data points that each point represents. They are
+            passed as ``sigma=1/sqrt(weights)`` to the
+            :func:`scipy.optimize.curve_fit` function and the covariance
+            matrix is scaled to the total number of data points
+        ``*args, **kwargs``
+            Any other argument for the :func:`scipy.optimize.curve_fit`
+            function
+
+        Returns
+        -------
+        GenericModel
+            The fitted model"""
+        if weights is not None:
+            kwargs["sigma"] = 1 / np.sqrt(weights)
         params, pcov = curve_fit(cls.function, x, y, *args, **kwargs)
         predicted = cls.function(x, *params)
-        attrs = dict(rsquared=rsquared(predicted, y), pcov=pcov)
+        if weights is not None:
+            # curve_fit scales the covariance with the degrees of freedom of
+            # the weighted points instead of the represented data points
+            nparams = len(params)
+            pcov = pcov * (len(x) - nparams) / (np.sum(weights) - nparams)
+        attrs = dict(rsquared=rsquared(predicted, y, weights), pcov=pcov)
         if pcov.size == 1:
             attrs["err"] = np.sqrt(pcov)[0, 0]
 
         return cls(*params, **attrs)
+
+
+class FunctionModelType(abc.ABCMeta):
+    """Metaclass for the models of plain functions
+
+    Classes of this type are created by the :func:`function_model` function
+    and can be pickled (as long as the underlying function can be pickled),
+    although they are created dynamically."""
+
+
+def _reduce_function_model(cls):
+    return function_model, (cls.function,)
+
+
+copyreg.pickle(FunctionModelType, _reduce_function_model)
+
+
+#: the cached models of the functions in :func:`function_model`
+_function_models = weakref.WeakKeyDictionary()
+
+
+def function_model(function):
+    """Get a :class:`GenericModel` subclass for a plain callable
+
+    The subclass is created only once per function (as long as it is in
+    use). The cache only holds weak references to the functions and their
+    models, such that it does not keep them alive. Callables that do not
+    support weak references get a new subclass for every call.
+
+    Parameters
+    ----------
+    function: callable
+        The function that takes the x-data as first argument and the
+        parameters that shall be fitted as further arguments
+
+    Returns
+    -------
+    type
+        A subclass of :class:`GenericModel` with the given `function`"""
+    try:
+        ref = _function_models.get(function)
+    except TypeError:  # not weak referenceable or not hashable
+        ref = None
+    model = None if ref is None else ref()
+    if model is not None:
+        return model
+    name = getattr(function, "__name__", "function")
+    model = FunctionModelType(
+        name + "Model",
+        (GenericModel,),
+        {"function": staticmethod(function), "__module__": __name__},
+    )
+    try:
+        _function_models[function] = weakref.ref(model)
+    except TypeError:
+        pass
+    return model
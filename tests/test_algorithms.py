@@ -0,0 +1,751 @@
+"""Test file for the vectorized algorithms of psy-reg."""
+
+# SPDX-FileCopyrightText: 2021-2024 Helmholtz-Zentrum hereon GmbH
+# SPDX-FileCopyrightText: 2020-2021 Helmholtz-Zentrum Geesthacht
+# SPDX-FileCopyrightText: 2016-2024 University of Lausanne
+#
+# SPDX-License-Identifier: LGPL-3.0-only
+
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import statsmodels.api as sm
+from scipy import stats
+from statsmodels.nonparametric.smoothers_lowess import lowess
+
+import psy_reg.algorithms as algos
+from psy_reg.plotters import LineFit, bootstrap, calc_ci
+
+
+class LinearBootstrapTest(unittest.TestCase):
+    """Test the :func:`psy_reg.algorithms.linear_bootstrap` function"""
+
+    n_boot = 50
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = np.linspace(0, 10, 200)
+        self.y = 2 + 3 * self.x + rs.randn(200)
+        self.x_line = np.linspace(0, 10, 20)
+
+    def _loop_bootstrap(self, fix=None):
+        def func(x, y):
+            if fix is None:
+                fit = sm.OLS(y, sm.add_constant(x)).fit()
+                intercept, slope = fit.params
+            else:
+                fit = sm.OLS(y - fix[1], x - fix[0]).fit()
+                slope = fit.params[0]
+                intercept = fix[1] - slope * fix[0]
+            return intercept + slope * self.x_line
+
+        return bootstrap(self.x, self.y, func, self.n_boot, random_seed=1)
+
+    def _vectorized_bootstrap(self, fix=None, **kwargs):
+        intercepts, slopes = algos.linear_bootstrap(
+            self.x, self.y, self.n_boot, fix=fix, random_seed=1, **kwargs
+        )
+        return intercepts[:, np.newaxis] + np.outer(slopes, self.x_line)
+
+    def test_linear(self):
+        """Test the bootstrap of a linear fit"""
+        ref = self._loop_bootstrap()
+        boot = self._vectorized_bootstrap()
+        np.testing.assert_allclose(boot, ref)
+        np.testing.assert_allclose(calc_ci(boot, axis=0), calc_ci(ref, axis=0))
+
+    def test_fix(self):
+        """Test the bootstrap of a linear fit through a fix point"""
+        ref = self._loop_bootstrap(fix=[1, 4])
+        np.testing.assert_allclose(self._vectorized_bootstrap([1, 4]), ref)
+
+    def test_max_memory(self):
+        """Test whether the memory budget does not change the results"""
+        ref = self._vectorized_bootstrap()
+        # budget for roughly one resample per block
+        boot = self._vectorized_bootstrap(max_memory=1e-3)
+        np.testing.assert_allclose(boot, ref)
+        self.assertEqual(algos.get_block_size(200, self.n_boot, 3, 1e-3), 1)
+
+
+class PolyBootstrapTest(unittest.TestCase):
+    """Test the :func:`psy_reg.algorithms.poly_bootstrap` function"""
+
+    n_boot = 50
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = np.round(np.linspace(0, 10, 200), 1)
+        self.y = np.round(2 + 3 * self.x - 0.5 * self.x**2 + rs.randn(200))
+        self.x_line = np.linspace(0, 10, 20)
+
+    def _loop_bootstrap(self, x, y, weights=None):
+        def func(x, y, weights=None):
+            if weights is None:
+                params = np.polyfit(x, y, 2)
+            else:
+                params = algos.polyfit(x, y, 2, weights=weights)[0]
+            return np.polyval(params, self.x_line)
+
+        return bootstrap(
+            x, y, func, self.n_boot, random_seed=1, weights=weights
+        )
+
+    def test_poly(self):
+        """Test the bootstrap of a polynomial fit"""
+        ref = self._loop_bootstrap(self.x, self.y)
+        boot = algos.poly_bootstrap(
+            self.x, self.y, 2, self.n_boot, self.x_line, random_seed=1
+        )
+        np.testing.assert_allclose(boot, ref)
+        # budget for roughly one resample per block
+        boot = algos.poly_bootstrap(
+            self.x,
+            self.y,
+            2,
+            self.n_boot,
+            self.x_line,
+            random_seed=1,
+            max_memory=1e-3,
+        )
+        np.testing.assert_allclose(boot, ref)
+
+    def test_weights(self):
+        """Test the multinomial bootstrap of a polynomial fit"""
+        x, y, counts = algos.unique_points(self.x, self.y)
+        ref = self._loop_bootstrap(x, y, counts)
+        boot = algos.poly_bootstrap(
+            x, y, 2, self.n_boot, self.x_line, random_seed=1, weights=counts
+        )
+        np.testing.assert_allclose(boot, ref)
+
+
+class LinearSumsTest(unittest.TestCase):
+    """Test the :class:`psy_reg.algorithms.LinearSums` class"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = np.linspace(1000, 1010, 500)
+        self.y = 2 + 3 * self.x + rs.randn(500)
+
+    def test_linear(self):
+        """Test the linear fit against statsmodels"""
+        ref = sm.OLS(self.y, sm.add_constant(self.x)).fit()
+        fit = algos.LinearSums(self.x, self.y).fit()
+        np.testing.assert_allclose(fit.params, ref.params)
+        np.testing.assert_allclose(fit.cov_params(), ref.cov_params())
+        np.testing.assert_allclose(fit.bse, ref.bse)
+        self.assertAlmostEqual(fit.rsquared, ref.rsquared)
+        self.assertEqual(fit.df_resid, ref.df_resid)
+
+    def test_fix(self):
+        """Test the fit through a fix point against statsmodels"""
+        ref = sm.OLS(self.y - 4, self.x - 1).fit()
+        fit = algos.LinearSums(self.x, self.y).fit(fix=[1, 4])
+        np.testing.assert_allclose(fit.params, ref.params)
+        np.testing.assert_allclose(fit.cov_params(), ref.cov_params())
+        self.assertAlmostEqual(fit.rsquared, ref.rsquared)
+
+    def test_chunks(self):
+        """Test whether the fit does not depend on the chunks"""
+        ref = algos.LinearSums(self.x, self.y).fit()
+        sums = algos.LinearSums(self.x[:100], self.y[:100], chunksize=7)
+        sums.update(self.x[100:], self.y[100:], chunksize=33)
+        fit = sums.fit()
+        self.assertEqual(sums.n, 500)
+        np.testing.assert_allclose(fit.params, ref.params)
+        np.testing.assert_allclose(fit.cov_params(), ref.cov_params())
+
+
+class WeightedFitTest(unittest.TestCase):
+    """Test the fits and the bootstrap of weighted points"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        x = rs.randint(0, 20, 500).astype(float)
+        y = np.round(2 + 3 * x + rs.randn(500))
+        self.x, self.y = x, y
+        unique, self.weights = np.unique(
+            np.c_[x, y], axis=0, return_counts=True
+        )
+        self.xu, self.yu = unique.T
+
+    def test_unique_points(self):
+        """Test the compression of identical points"""
+        x, y, counts = algos.unique_points(self.x, self.y)
+        np.testing.assert_array_equal(x, self.xu)
+        np.testing.assert_array_equal(y, self.yu)
+        np.testing.assert_array_equal(counts, self.weights)
+
+    def test_linear(self):
+        """Test the weighted sums against the repeated data"""
+        for fix in [None, [1, 4]]:
+            ref = algos.LinearSums(self.x, self.y).fit(fix)
+            fit = algos.LinearSums(self.xu, self.yu, weights=self.weights)
+            fit = fit.fit(fix)
+            np.testing.assert_allclose(fit.params, ref.params)
+            np.testing.assert_allclose(fit.cov_params(), ref.cov_params())
+            self.assertAlmostEqual(fit.rsquared, ref.rsquared)
+            self.assertEqual(fit.nobs, 500)
+
+    def test_polyfit(self):
+        """Test the weighted polynomial fit against the repeated data"""
+        ref = np.polyfit(self.x, self.y, 2, cov=True)
+        fit = algos.polyfit(self.xu, self.yu, 2, weights=self.weights)
+        np.testing.assert_allclose(fit[0], ref[0])
+        np.testing.assert_allclose(fit[1], ref[1])
+
+    def test_bootstrap(self):
+        """Test the multinomial bootstrap of a linear fit"""
+        n_boot = 100
+        for fix in [None, [1, 4]]:
+            intercepts, slopes = algos.linear_bootstrap(
+                self.xu, self.yu, n_boot, fix, 1, weights=self.weights
+            )
+            counts = np.vstack(
+                list(
+                    algos.iter_multinomial(
+                        self.weights, n_boot, np.random.RandomState(1), 30
+                    )
+                )
+            )
+            self.assertEqual(counts.shape, (n_boot, len(self.xu)))
+            np.testing.assert_array_equal(counts.sum(axis=1), 500)
+            for j in [0, n_boot - 1]:
+                ref = algos.LinearSums(
+                    self.xu, self.yu, weights=counts[j]
+                ).fit(fix)
+                self.assertAlmostEqual(slopes[j], ref.params[-1])
+            ref = algos.LinearSums(self.x, self.y).fit(fix)
+            self.assertAlmostEqual(
+                slopes.std(), ref.bse[-1], delta=0.3 * ref.bse[-1]
+            )
+
+
+class CumulativeSumsTest(unittest.TestCase):
+    """Test the :class:`psy_reg.algorithms.CumulativeSums` class"""
+
+    def test_window(self):
+        """Test the sums of x-ranges against the masked data"""
+        rs = np.random.RandomState(42)
+        x = np.sort(rs.rand(1000)) * 100
+        y = 2 + 3 * x + rs.randn(1000)
+        y[5] = np.nan
+        cumsums = algos.CumulativeSums(x, y)
+        for xmin, xmax in [(10, 20), (0, 100), (50, 50.5)]:
+            mask = (x >= xmin) & (x <= xmax) & ~np.isnan(y)
+            ref = algos.LinearSums(x[mask], y[mask])
+            for fix in [None, [1, 4]]:
+                fit = cumsums.window(xmin, xmax).fit(fix)
+                self.assertEqual(fit.nobs, mask.sum())
+                np.testing.assert_allclose(fit.params, ref.fit(fix).params)
+                np.testing.assert_allclose(
+                    fit.cov_params(), ref.fit(fix).cov_params()
+                )
+        self.assertEqual(cumsums.window(200, 300).n, 0)
+
+    def test_groups(self):
+        """Test the sums of groups against the fits of each group"""
+        rs = np.random.RandomState(42)
+        x = rs.rand(300) * 10
+        codes = np.arange(300) % 3
+        y = codes + (codes + 1) * x + rs.randn(300)
+        sums = algos.LinearSums.groups(x, y, codes)
+        np.testing.assert_array_equal(sums.n, [100, 100, 100])
+        for fix in [None, [1, 4]]:
+            results = sums.fit(fix)
+            for j in range(3):
+                ref = algos.LinearSums(x[codes == j], y[codes == j]).fit(fix)
+                np.testing.assert_allclose(results[j].params, ref.params)
+                np.testing.assert_allclose(results[j].bse, ref.bse)
+                self.assertAlmostEqual(results[j].rsquared, ref.rsquared)
+
+
+class PolynomialSumsTest(unittest.TestCase):
+    """Test the :class:`psy_reg.algorithms.PolynomialSums` class"""
+
+    def test_update(self):
+        """Test the sums of appended data against the fit of all data"""
+        rs = np.random.RandomState(42)
+        x = rs.rand(500) * 10
+        y = 1 + 2 * x - 0.3 * x**2 + rs.randn(500)
+        sums = algos.PolynomialSums(x[:100], y[:100], 2)
+        sums.update(x[100:300], y[100:300]).update(x[300:], y[300:])
+        params, cov, rsquared = sums.fit()
+        ref = np.polyfit(x, y, 2, cov=True)
+        np.testing.assert_allclose(params, ref[0])
+        np.testing.assert_allclose(cov, ref[1])
+        fitted = np.polyval(ref[0], x)
+        self.assertAlmostEqual(
+            rsquared,
+            1 - ((y - fitted) ** 2).sum() / ((y - y.mean()) ** 2).sum(),
+        )
+        self.assertEqual(sums.n, 500)
+
+
+class PolyfitAutoTest(unittest.TestCase):
+    """Test the :func:`psy_reg.algorithms.polyfit_auto` function"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = rs.rand(500) * 4 - 1
+        self.y = 1 + 2 * self.x - 3 * self.x**2 + 0.5 * self.x**3
+        self.y += rs.randn(500) * 0.5
+
+    def test_scores(self):
+        """Test the scores of all degrees against statsmodels"""
+        fit = algos.polyfit_auto(self.x, self.y, max_deg=5)
+        for deg in range(6):
+            ref = sm.OLS(self.y, np.vander(self.x, deg + 1)).fit()
+            hat = ref.get_influence().hat_matrix_diag
+            press = ((ref.resid / (1 - hat)) ** 2).sum()
+            self.assertAlmostEqual(fit.scores["aic"][deg], ref.aic)
+            self.assertAlmostEqual(fit.scores["bic"][deg], ref.bic)
+            self.assertAlmostEqual(fit.scores["press"][deg], press)
+
+    def test_fit(self):
+        """Test the selected fit against numpy"""
+        fit = algos.polyfit_auto(self.x, self.y)
+        self.assertEqual(fit.deg, 3)
+        params, cov = np.polyfit(self.x, self.y, 3, cov=True)
+        np.testing.assert_allclose(fit.params, params)
+        np.testing.assert_allclose(fit.cov, cov)
+        self.assertEqual(fit.attrs["degree"], 3)
+        self.assertEqual(len(fit.attrs["bic"]), 7)
+        for criterion in ["aic", "press"]:
+            fit = algos.polyfit_auto(self.x, self.y, criterion=criterion)
+            self.assertEqual(
+                fit.deg, int(np.argmin(fit.scores[criterion])), criterion
+            )
+        # the degree is limited by the distinct x-values
+        x = np.repeat([0.0, 1.0, 2.0], 5)
+        fit = algos.polyfit_auto(x, x**2, max_deg=5)
+        self.assertLessEqual(fit.deg, 2)
+        with self.assertRaises(ValueError):
+            algos.polyfit_auto(self.x, self.y, criterion="cv")
+
+    def test_weights(self):
+        """Test the fit of weighted points against the repeated data"""
+        x = np.round(self.x, 1)
+        y = np.round(self.y, 1)
+        xu, yu, counts = algos.unique_points(x, y)
+        fit = algos.polyfit_auto(xu, yu, weights=counts)
+        ref = algos.polyfit_auto(x, y)
+        self.assertEqual(fit.deg, ref.deg)
+        np.testing.assert_allclose(fit.params, ref.params)
+        np.testing.assert_allclose(fit.cov, ref.cov)
+        np.testing.assert_allclose(fit.scores["bic"], ref.scores["bic"])
+
+
+class LowessTest(unittest.TestCase):
+    """Test the :class:`psy_reg.algorithms.LowessFit` class"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = rs.rand(5000) * 10
+        self.y = np.sin(self.x) + rs.randn(5000) * 0.3
+        self.x_line = np.linspace(0.5, 9.5, 50)
+
+    def test_exact(self):
+        """Test the fit of unbinned data against statsmodels"""
+        x, y = self.x[:500], self.y[:500]
+        fit = algos.LowessFit(x, y, frac=0.3)
+        ref = lowess(y, x, frac=0.3, it=0, xvals=self.x_line)
+        np.testing.assert_allclose(fit.predict(self.x_line), ref)
+
+    def test_binned(self):
+        """Test the fit of binned data against statsmodels"""
+        fit = algos.LowessFit(self.x, self.y, frac=0.3, bins=200)
+        ref = lowess(self.y, self.x, frac=0.3, it=0, xvals=self.x_line)
+        np.testing.assert_allclose(fit.predict(self.x_line), ref, atol=0.01)
+
+    def test_weights(self):
+        """Test the fit of weighted points against the repeated data"""
+        x, y = np.round(self.x[:500]), np.round(self.y[:500], 1)
+        xu, yu, counts = algos.unique_points(x, y)
+        fit = algos.LowessFit(xu, yu, frac=0.5, weights=counts)
+        ref = algos.LowessFit(x, y, frac=0.5)
+        np.testing.assert_allclose(
+            fit.predict(self.x_line), ref.predict(self.x_line)
+        )
+        np.testing.assert_allclose(
+            fit.stderr(self.x_line), ref.stderr(self.x_line)
+        )
+        self.assertAlmostEqual(fit.rsquared, ref.rsquared)
+
+    def test_bootstrap(self):
+        """Test the bootstrap against the analytic standard error"""
+        fit = algos.LowessFit(self.x, self.y, frac=0.3, bins=200)
+        boot = fit.bootstrap(self.x, self.y, self.x_line, 300)
+        self.assertEqual(boot.shape, (300, 50))
+        np.testing.assert_allclose(
+            boot.mean(axis=0), fit.predict(self.x_line), atol=0.02
+        )
+        np.testing.assert_allclose(
+            boot.std(axis=0), fit.stderr(self.x_line), rtol=0.3
+        )
+
+
+@unittest.skipIf(algos.make_smoothing_spline is None, "requires scipy>=1.10")
+class SmoothingSplineTest(unittest.TestCase):
+    """Test the :class:`psy_reg.algorithms.SmoothingSpline` class"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = np.round(rs.rand(1000) * 10, 1)
+        self.y = np.sin(self.x) + rs.randn(1000) * 0.3
+        self.x_line = np.linspace(0, 10, 50)
+
+    def test_lam(self):
+        """Test the spline against scipy"""
+        xu, inverse = np.unique(self.x, return_inverse=True)
+        counts = np.bincount(inverse)
+        yu = np.bincount(inverse, self.y) / counts
+        for lam in [None, 0.5]:
+            fit = algos.SmoothingSpline(self.x, self.y, lam=lam)
+            ref = algos.make_smoothing_spline(xu, yu, w=counts, lam=lam)
+            np.testing.assert_allclose(
+                fit.predict(self.x_line), ref(self.x_line)
+            )
+        # the smoothing parameter of the cross-validation is recovered
+        fit = algos.SmoothingSpline(self.x, self.y)
+        ref = algos.SmoothingSpline(self.x, self.y, lam=fit.lam)
+        np.testing.assert_allclose(
+            fit.predict(self.x_line), ref.predict(self.x_line)
+        )
+
+    def test_weights(self):
+        """Test the spline of weighted points against the repeated data"""
+        xu, yu, counts = algos.unique_points(self.x, np.round(self.y, 1))
+        fit = algos.SmoothingSpline(xu, yu, lam=0.5, weights=counts)
+        ref = algos.SmoothingSpline(self.x, np.round(self.y, 1), lam=0.5)
+        np.testing.assert_allclose(
+            fit.predict(self.x_line), ref.predict(self.x_line)
+        )
+        self.assertAlmostEqual(fit.rsquared, ref.rsquared)
+
+    def test_bins(self):
+        """Test the spline of binned data against the one of all data"""
+        rs = np.random.RandomState(42)
+        x = rs.rand(5000) * 10
+        y = np.sin(x) + rs.randn(5000) * 0.3
+        fit = algos.SmoothingSpline(x, y, lam=0.5, bins=200)
+        self.assertEqual(len(fit.x), 200)
+        ref = algos.SmoothingSpline(x, y, lam=0.5)
+        np.testing.assert_allclose(
+            fit.predict(self.x_line), ref.predict(self.x_line), atol=0.01
+        )
+
+    def test_bootstrap(self):
+        """Test the residual bootstrap of the spline"""
+        fit = algos.SmoothingSpline(self.x, self.y, lam=0.5)
+        boot = fit.bootstrap(self.x_line, 200, 1, max_memory=0.1)
+        self.assertEqual(boot.shape, (200, 50))
+        np.testing.assert_allclose(
+            boot.mean(axis=0), fit.predict(self.x_line), atol=0.05
+        )
+        self.assertTrue((boot.std(axis=0) > 0).all())
+        # the splines are computed one after another with older scipy
+        with mock.patch.object(algos, "SPLINE_BATCHES", False):
+            ref = fit.bootstrap(self.x_line, 200, 1, max_memory=0.1)
+        np.testing.assert_allclose(boot, ref)
+
+
+class SegmentedTest(unittest.TestCase):
+    """Test the :func:`psy_reg.algorithms.segmented` function"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = rs.rand(1000) * 10
+        self.noise = rs.randn(1000) * 0.3
+        self.y = np.where(self.x < 4, 1 + 0.5 * self.x, 3 + 2 * (self.x - 4))
+        self.y += self.noise
+
+    def hinge_ols(self, x, y, breakpoints, weights=None):
+        exog = np.c_[
+            np.ones_like(x), x, np.maximum(x[:, np.newaxis] - breakpoints, 0)
+        ]
+        if weights is None:
+            return sm.OLS(y, exog).fit()
+        return sm.WLS(y, exog, weights).fit()
+
+    def test_fit(self):
+        """Test the fit against an OLS fit at the breakpoint"""
+        fit = algos.segmented(self.x, self.y)
+        self.assertAlmostEqual(fit.breakpoints[0], 4, delta=0.1)
+        ref = self.hinge_ols(self.x, self.y, fit.breakpoints)
+        self.assertAlmostEqual(fit.intercept, ref.params[0])
+        np.testing.assert_allclose(
+            fit.slopes, [ref.params[1], ref.params[1:].sum()]
+        )
+        # the breakpoint is another parameter of the fit
+        self.assertEqual(fit.df_resid, ref.df_resid - 1)
+        self.assertAlmostEqual(
+            fit.intercept_err,
+            ref.bse[0] * np.sqrt(ref.df_resid / fit.df_resid),
+        )
+        self.assertAlmostEqual(fit.rsquared, ref.rsquared)
+        np.testing.assert_allclose(fit.predict(self.x), ref.fittedvalues)
+        # no other breakpoint gives a better fit
+        for breakpoint in np.linspace(1, 9, 81):
+            self.assertGreaterEqual(
+                self.hinge_ols(self.x, self.y, [breakpoint]).ssr,
+                ref.ssr - 1e-8,
+            )
+
+    def test_weights(self):
+        """Test the fit of weighted points against the repeated data"""
+        x = np.round(self.x, 1)
+        y = np.round(self.y, 1)
+        xu, yu, counts = algos.unique_points(x, y)
+        fit = algos.segmented(xu, yu, weights=counts)
+        ref = algos.segmented(x, y)
+        np.testing.assert_allclose(fit.breakpoints, ref.breakpoints)
+        np.testing.assert_allclose(fit.slopes, ref.slopes)
+        np.testing.assert_allclose(fit.slopes_err, ref.slopes_err)
+        self.assertAlmostEqual(fit.rsquared, ref.rsquared)
+
+    def test_nbreaks(self):
+        """Test a fit with two breakpoints"""
+        x = self.x
+        y = np.where(x < 3, 1, np.where(x < 7, 1 + 2 * (x - 3), 9 - (x - 7)))
+        fit = algos.segmented(x, y + self.noise, nbreaks=2)
+        np.testing.assert_allclose(fit.breakpoints, [3, 7], atol=0.1)
+        np.testing.assert_allclose(fit.slopes, [0, 2, -1], atol=0.1)
+        self.assertEqual(
+            sorted(fit.attrs),
+            sorted(
+                ["intercept", "intercept_err", "rsquared"]
+                + ["breakpoint0", "breakpoint1"]
+                + ["slope%i" % i for i in range(3)]
+                + ["slope%i_err" % i for i in range(3)]
+            ),
+        )
+        with self.assertRaises(ValueError):
+            algos.segmented(x[:5], y[:5], nbreaks=2)
+
+
+class HuberIRLSTest(unittest.TestCase):
+    """Test the :func:`psy_reg.algorithms.huber_irls` function"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = np.linspace(0, 10, 200)
+        self.y = 2 + 0.5 * self.x + rs.standard_t(2, 200)
+
+    def test_fit(self):
+        """Test the robust fit against statsmodels"""
+        ref = sm.RLM(self.y, sm.add_constant(self.x)).fit()
+        fit = algos.huber_irls(self.x, self.y)
+        np.testing.assert_allclose(fit.params, ref.params)
+        np.testing.assert_allclose(fit.cov_params(), ref.cov_params())
+        self.assertAlmostEqual(fit.scale, ref.scale)
+        self.assertEqual(fit.iterations, ref.fit_history["iteration"])
+
+    def test_fix(self):
+        """Test the robust fit through a fix point against statsmodels"""
+        ref = sm.RLM(self.y - 4, self.x - 1).fit()
+        fit = algos.huber_irls(self.x, self.y, fix=[1, 4])
+        np.testing.assert_allclose(fit.params, ref.params)
+        np.testing.assert_allclose(fit.bse, ref.bse)
+
+    def test_batch(self):
+        """Test fitting several arrays at once"""
+        x = np.vstack([self.x, self.x + 1])
+        y = np.vstack([self.y, 2 * self.y])
+        fit = algos.huber_irls(x, y)
+        for i in range(2):
+            ref = algos.huber_irls(x[i], y[i])
+            np.testing.assert_allclose(fit.params[i], ref.params)
+            np.testing.assert_allclose(fit.bse[i], ref.bse)
+            self.assertEqual(fit.iterations[i], ref.iterations)
+
+    def test_bootstrap(self):
+        """Test the batched bootstrap against single robust fits"""
+        intercepts, slopes = algos.robust_bootstrap(
+            self.x, self.y, 20, random_seed=1, max_memory=0.05
+        )
+        rs = np.random.RandomState(1)
+        for i in range(20):
+            indices = rs.randint(0, 200, 200)
+            ref = sm.RLM(
+                self.y[indices], sm.add_constant(self.x[indices])
+            ).fit()
+            np.testing.assert_allclose(
+                [intercepts[i], slopes[i]], ref.params, rtol=1e-6
+            )
+
+
+class MedianFitTest(unittest.TestCase):
+    """Test the median-based linear fits"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        # rounded data with many equal slopes
+        self.x = np.round(rs.rand(1500) * 10, 1)
+        self.y = np.round(2 + 0.5 * self.x + rs.standard_t(2, 1500), 1)
+
+    def test_theil_sen(self):
+        """Test the Theil-Sen fit against scipy"""
+        ref = stats.theilslopes(self.y, self.x)
+        # a small memory budget forces the contraction of the interval
+        for max_memory in [None, 1e-3]:
+            intercept, slope = algos.theil_sen(
+                self.x, self.y, max_memory=max_memory
+            )
+            self.assertEqual(slope, ref.slope)
+            self.assertAlmostEqual(intercept, ref.intercept)
+
+    def test_theil_sen_collinear(self):
+        """Test the Theil-Sen fit of points on a line"""
+        intercept, slope = algos.theil_sen(
+            self.x, 2 * self.x + 1, max_memory=1e-3
+        )
+        self.assertAlmostEqual(slope, 2)
+        self.assertAlmostEqual(intercept, 1)
+
+    def test_siegel(self):
+        """Test the repeated medians against scipy"""
+        ref = stats.siegelslopes(self.y, self.x)
+        intercept, slope = algos.siegel(self.x, self.y)
+        self.assertAlmostEqual(slope, ref.slope)
+        self.assertAlmostEqual(intercept, ref.intercept)
+        # estimate the medians from random points
+        intercept, slope = algos.siegel(self.x, self.y, max_pairs=150000)
+        self.assertAlmostEqual(slope, ref.slope, 1)
+
+    def test_bootstrap(self):
+        """Test the bootstrap of fits through a fix point"""
+        intercepts, slopes = algos.median_bootstrap(
+            self.x, self.y, 20, algos.theil_sen, fix=[1, 2], random_seed=1
+        )
+        rs = np.random.RandomState(1)
+        for i in range(20):
+            indices = rs.randint(0, 1500, 1500)
+            ref = algos.theil_sen(self.x[indices], self.y[indices], fix=[1, 2])
+            self.assertAlmostEqual(slopes[i], ref[1])
+            self.assertAlmostEqual(intercepts[i], ref[0])
+
+    def test_bootstrap_subsamples(self):
+        """Test the bootstrap with smaller resamples than the data"""
+        for func in [algos.theil_sen, algos.siegel]:
+            rs = np.random.RandomState(1)
+            indices = rs.randint(0, 1500, (4, 300))
+            fits = algos._subsample_median_fits(self.x, self.y, indices, func)
+            for i, idx in enumerate(indices):
+                ref = func(self.x[idx], self.y[idx])
+                self.assertAlmostEqual(fits[0][i], ref[0])
+                self.assertAlmostEqual(fits[1][i], ref[1])
+            # the spread is scaled to the one of the full resamples
+            ref = algos.median_bootstrap(
+                self.x[:600], self.y[:600], 100, func, random_seed=1
+            )
+            intercepts, slopes = algos.median_bootstrap(
+                self.x[:600],
+                self.y[:600],
+                100,
+                func,
+                random_seed=1,
+                max_size=300,
+            )
+            self.assertAlmostEqual(slopes.std() / ref[1].std(), 1, delta=0.3)
+            self.assertAlmostEqual(
+                intercepts.std() / ref[0].std(), 1, delta=0.3
+            )
+
+    def test_bootstrap_runtime(self):
+        """Test the runtime of the bootstrap of large data"""
+        rs = np.random.RandomState(42)
+        x = rs.rand(20000) * 10
+        y = 2 + 0.5 * x + rs.standard_t(2, 20000)
+        for func in [algos.theil_sen, algos.siegel]:
+            params = func(x, y)
+            t0 = time.perf_counter()
+            intercepts, slopes = algos.median_bootstrap(
+                x, y, 200, func, random_seed=1, params=params
+            )
+            self.assertLess(time.perf_counter() - t0, 30)
+            self.assertEqual(len(slopes), 200)
+            self.assertTrue(np.isfinite(slopes).all())
+            self.assertAlmostEqual(np.median(slopes), params[1], delta=0.05)
+
+
+class DaskTest(unittest.TestCase):
+    """Test the fits of dask arrays"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = np.linspace(0, 10, 500)
+        self.y = np.poly1d([0.5, 3, 2])(self.x) + rs.randn(500)
+
+    def test_linear(self):
+        """Test the linear fit of dask arrays"""
+        import dask.array as dsa
+
+        ref = algos.LinearSums(self.x, self.y).fit(fix=[1, 4])
+        sums = algos.LinearSums(
+            dsa.from_array(self.x, chunks=77), dsa.from_array(self.y, 77)
+        )
+        self.assertEqual(sums.n, 500)
+        fit = sums.fit(fix=[1, 4])
+        np.testing.assert_allclose(fit.params, ref.params)
+        np.testing.assert_allclose(fit.cov_params(), ref.cov_params())
+
+    def test_polyfit(self):
+        """Test the polynomial fit of dask arrays"""
+        import dask.array as dsa
+
+        ref = np.polyfit(self.x, self.y, 2, cov=True)
+        fit = algos.polyfit(
+            dsa.from_array(self.x, chunks=77), dsa.from_array(self.y, 77), 2
+        )
+        np.testing.assert_allclose(fit[0], ref[0])
+        np.testing.assert_allclose(fit[1], ref[1])
+
+
+class ParallelBootstrapTest(unittest.TestCase):
+    """Test the :func:`psy_reg.algorithms.parallel_bootstrap` function"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = np.linspace(0, 10, 100)
+        self.y = 2 + 3 * self.x + rs.randn(100)
+        self.func = LineFit("statsmodels", sm.RLM, np.linspace(0, 10, 20))
+
+    def _bootstrap(self, **kwargs):
+        return algos.parallel_bootstrap(
+            self.x, self.y, self.func, 30, random_seed=1, chunksize=7, **kwargs
+        )
+
+    def test_threads(self):
+        """Test whether the results do not depend on the number of threads"""
+        ref = self._bootstrap(workers=1, executor="thread")
+        self.assertEqual(ref.shape, (30, 20))
+        np.testing.assert_array_equal(
+            self._bootstrap(workers=3, executor="thread"), ref
+        )
+
+    def test_thread_limits(self):
+        """Test whether the BLAS threads are limited once for all threads"""
+        ref = self._bootstrap(workers=1, executor="thread")
+        with mock.patch.object(algos, "threadpool_limits") as limits:
+            boot = self._bootstrap(workers=3, executor="thread")
+        limits.assert_called_once_with(limits=1)
+        limits.return_value.__exit__.assert_called_once()
+        np.testing.assert_array_equal(boot, ref)
+        with mock.patch.object(algos, "threadpool_limits", None):
+            boot = self._bootstrap(workers=3, executor="thread")
+        np.testing.assert_array_equal(boot, ref)
+
+    def test_processes(self):
+        """Test whether the results are the same for a process pool"""
+        ref = self._bootstrap(workers=1, executor="thread")
+        np.testing.assert_array_equal(
+            self._bootstrap(workers=2, executor="process"), ref
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""Test file for the gridded regressions of psy-reg."""
+
+# SPDX-FileCopyrightText: 2021-2024 Helmholtz-Zentrum hereon GmbH
+# SPDX-FileCopyrightText: 2020-2021 Helmholtz-Zentrum Geesthacht
+# SPDX-FileCopyrightText: 2016-2024 University of Lausanne
+#
+# SPDX-License-Identifier: LGPL-3.0-only
+
+import unittest
+import warnings
+
+import numpy as np
+import statsmodels.api as sm
+import xarray as xr
+
+from psy_reg.gridded import fit_along, rolling_fit
+
+
+class FitAlongTest(unittest.TestCase):
+    """Test the :func:`psy_reg.gridded.fit_along` function"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        t = np.arange(30.0)
+        y = 2 + rs.rand(4, 5)[np.newaxis] * t[:, np.newaxis, np.newaxis]
+        y += rs.randn(30, 4, 5)
+        y[3, 0, 0] = np.nan
+        y[:, 1, 1] = np.nan
+        self.da = xr.DataArray(
+            y,
+            dims=("time", "lat", "lon"),
+            coords={"time": t, "lat": np.arange(4.0), "lon": np.arange(5.0)},
+            name="tas",
+        )
+
+    def _iter_cells(self):
+        t = self.da.time.values
+        for i in range(4):
+            for j in range(5):
+                y = self.da.values[:, i, j]
+                mask = ~np.isnan(y)
+                if mask.any():
+                    yield i, j, t[mask], y[mask]
+
+    def test_linear(self):
+        """Test the linear fit against statsmodels"""
+        ds = fit_along(self.da)
+        self.assertEqual(ds.slope.dims, ("lat", "lon"))
+        self.assertTrue(np.isnan(ds.slope[1, 1]))
+        self.assertEqual(ds.nobs[0, 0], 29)
+        for i, j, x, y in self._iter_cells():
+            ref = sm.OLS(y, sm.add_constant(x)).fit()
+            np.testing.assert_allclose(
+                [ds.intercept[i, j], ds.slope[i, j]], ref.params
+            )
+            np.testing.assert_allclose(
+                [ds.intercept_err[i, j], ds.slope_err[i, j]], ref.bse
+            )
+            np.testing.assert_allclose(ds.rsquared[i, j], ref.rsquared)
+            ci = ref.conf_int(0.05)[1]
+            np.testing.assert_allclose(ds.slope_ci[i, j], ci[1] - ci[0])
+
+    def test_fix(self):
+        """Test the linear fit through a fix point"""
+        ds = fit_along(self.da, fix=2)
+        self.assertNotIn("intercept", ds)
+        for i, j, x, y in self._iter_cells():
+            ref = sm.OLS(y - 2, x).fit()
+            np.testing.assert_allclose(ds.slope[i, j], ref.params[0])
+
+    def test_poly(self):
+        """Test the polynomial fit against numpy"""
+        ds = fit_along(self.da, fit="poly2")
+        for i, j, x, y in self._iter_cells():
+            params, cov = np.polyfit(x, y, 2, cov=True)
+            np.testing.assert_allclose(
+                [ds.c2[i, j], ds.c1[i, j], ds.c0[i, j]], params
+            )
+            np.testing.assert_allclose(ds.c2_err[i, j], np.sqrt(cov[0, 0]))
+
+    def test_missing_cells(self):
+        """Test that grid cells without data do not raise warnings"""
+        for kwargs in [{}, {"fix": 2}, {"fit": "poly2"}]:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                ds = fit_along(self.da, **kwargs)
+            for name, arr in ds.data_vars.items():
+                if name != "nobs":
+                    self.assertTrue(np.isnan(arr[1, 1]).all(), msg=name)
+
+    def test_dask(self):
+        """Test the fit of dask arrays"""
+        ref = fit_along(self.da)
+        ds = fit_along(self.da.chunk({"lat": 2, "time": 10}))
+        self.assertIsNotNone(ds.slope.chunks)
+        xr.testing.assert_allclose(ds.compute(), ref)
+
+
+class RollingFitTest(unittest.TestCase):
+    """Test the :func:`psy_reg.gridded.rolling_fit` function"""
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        t = np.arange(100.0)
+        y = np.cumsum(rs.randn(100))
+        y[10] = np.nan
+        self.da = xr.DataArray(
+            y, dims=("time",), coords={"time": t}, name="tas"
+        )
+
+    def _check_window(self, ret, j, window, fix=None):
+        x = self.da.time.values[window]
+        y = self.da.values[window]
+        mask = ~np.isnan(y)
+        x, y = x[mask], y[mask]
+        fit = ret.isel(time=j)
+        self.assertEqual(fit.sel(parameter="nobs"), mask.sum())
+        if fix is None:
+            ref = sm.OLS(y, sm.add_constant(x)).fit()
+            np.testing.assert_allclose(
+                fit.sel(parameter="intercept"), ref.params[0]
+            )
+        else:
+            ref = sm.OLS(y - fix, x).fit()
+            self.assertAlmostEqual(float(fit.sel(parameter="intercept")), fix)
+        np.testing.assert_allclose(fit.sel(parameter="slope"), ref.params[-1])
+        np.testing.assert_allclose(fit.sel(parameter="slope_err"), ref.bse[-1])
+        np.testing.assert_allclose(fit.sel(parameter="rsquared"), ref.rsquared)
+
+    def test_linear(self):
+        """Test the rolling fits against statsmodels"""
+        ret = rolling_fit(self.da, 30)
+        self.assertEqual(ret.dims, ("parameter", "time"))
+        # the missing value is within the first windows
+        self.assertTrue(np.isnan(ret.sel(parameter="slope")[:40]).all())
+        self._check_window(ret, 40, slice(11, 41))
+        ret = rolling_fit(self.da, 30, min_periods=20)
+        self.assertTrue(np.isnan(ret.sel(parameter="slope")[:20]).all())
+        for j in [20, 35, 99]:
+            self._check_window(ret, j, slice(max(j - 29, 0), j + 1))
+
+    def test_center(self):
+        """Test the centered rolling fits with truncated windows"""
+        ret = rolling_fit(self.da, 30, center=True, min_periods=20)
+        self.assertTrue(np.isnan(ret.sel(parameter="slope")[:5]).all())
+        for j in [5, 50, 90]:
+            self._check_window(ret, j, slice(max(j - 14, 0), j + 16))
+        self.assertTrue(np.isnan(ret.sel(parameter="slope")[95:]).all())
+
+    def test_fix_xrange(self):
+        """Test the rolling fits through a fix point within a range"""
+        ret = rolling_fit(self.da, 20, fix=1, xrange=(0, 60), min_periods=5)
+        self._check_window(ret, 40, slice(21, 41), fix=1)
+        self._check_window(ret, 70, slice(51, 61), fix=1)
+        self.assertEqual(ret.sel(parameter="nobs")[99], 0)
+
+    def test_poly(self):
+        """Test whether polynomials are rejected"""
+        with self.assertRaises(ValueError):
+            rolling_fit(self.da, 30, fit="poly2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,16 +7,30 @@
 # SPDX-License-Identifier: LGPL-3.0-only
 
 
+import pickle
 import subprocess as spr
 import sys
 import unittest
+from unittest import mock
 
 import matplotlib.pyplot as plt
 import numpy as np
+import psy_simple.plotters as psyps
 import psyplot.data as psyd
+import statsmodels.api as sm
 import xarray as xr
-
+from psyplot import rcParams
+from scipy import stats
+
+import psy_reg.algorithms as algos
+import psy_reg.plotters as psyreg
+from psy_reg.algorithms import (
+    LinearFitResults,
+    RobustFitResults,
+    is_dask_array,
+)
 from psy_reg.plotters import DensityRegPlotter, LinRegPlotter
+from psy_reg.utils import GenericModel
 
 # check if the seaborn version is smaller than 0.8 (without actually importing
 # it), due to https://github.com/mwaskom/seaborn/issues/966
@@ -32,6 +46,41 @@ else:
     sns_version = sns_version.decode("utf-8")  # type: ignore
 
 
+def parabola(x, a):
+    """Test function for the picklable models"""
+    return a * a * x * (1 - x)
+
+
+class CountingModel(GenericModel):
+    """A model that counts the estimations of the initial parameters"""
+
+    function = staticmethod(parabola)
+
+    calls = 0
+
+    @classmethod
+    def estimate_p0(cls, x, y, bounds):
+        cls.calls += 1
+        return super(CountingModel, cls).estimate_p0(x, y, bounds)
+
+
+class MeanModel(object):
+    """A model of the mean of the y-data that can be updated"""
+
+    def fit(self, x, y):
+        self.n = len(y)
+        self.total = np.sum(y)
+        return self
+
+    def partial_fit(self, x, y):
+        self.n += len(y)
+        self.total += np.sum(y)
+        return self
+
+    def predict(self, x):
+        return np.full(np.shape(x), self.total / self.n)
+
+
 class LinRegPlotterTest(unittest.TestCase):
     default_slope = 3
     default_intercept = 2
@@ -238,6 +287,379 @@ class LinRegPlotterTest(unittest.TestCase):
         self.assertTrue(hasattr(err_fmt, "_plot") and len(err_fmt._plot) >= 1)
         self.assertTrue(all(a in ax.collections for a in err_fmt._plot))
 
+    def test_ci_cache(self):
+        """Test whether changing the ci level does not resample"""
+        self.test_nonfixed_fit()
+        data = self.plot_data
+        with mock.patch.object(
+            psyreg, "linear_bootstrap", wraps=psyreg.linear_bootstrap
+        ) as bootstrap:
+            self.plotter.update(ci=50)
+            bootstrap.assert_not_called()
+            self.assertLess(
+                (self.plot_data[2] - self.plot_data[1]).max(),
+                (data[2] - data[1]).max(),
+            )
+            self.plotter.update(nboot=50)
+            bootstrap.assert_called_once()
+
+    def test_ci_analytic(self):
+        """Test the analytic estimate of the confidence interval"""
+        da = self.define_data()
+        rcParams["plotter.linreg.ci.method"] = "analytic"
+        try:
+            self.plotter = self.plotter_cls(da, ci=90)
+        finally:
+            rcParams["plotter.linreg.ci.method"] = "bootstrap"
+        data = self.plot_data
+        raw = da if not isinstance(da, psyd.InteractiveList) else da[0]
+        x_line = data.coords[data.dims[-1]].values
+        fit = sm.OLS(raw.values, sm.add_constant(raw.x.values)).fit()
+        ref = fit.get_prediction(sm.add_constant(x_line)).conf_int(alpha=0.1)
+        self.assertEqual(data.shape[0], 3)
+        np.testing.assert_allclose(data[1].values, ref[:, 0])
+        np.testing.assert_allclose(data[2].values, ref[:, 1])
+
+    def test_ols_engine(self):
+        """Test whether the closed-form fit equals the one of statsmodels"""
+        self.test_fix1()
+        data = self.plot_data
+        self.assertIsInstance(self.plotter.fit.fits[0], LinearFitResults)
+        rcParams["plotter.linreg.ols.engine"] = "statsmodels"
+        try:
+            self.plotter.update(fit="linear", ci=None)
+        finally:
+            rcParams["plotter.linreg.ols.engine"] = "sums"
+        ref = self.plot_data
+        self.assertNotIsInstance(self.plotter.fit.fits[0], LinearFitResults)
+        for key in ["slope", "intercept", "rsquared", "slope_err"]:
+            self.assertAlmostEqual(data.attrs[key], ref.attrs[key], msg=key)
+        np.testing.assert_allclose(data[0].values, ref.values)
+
+    def test_median_fits(self):
+        """Test the Theil-Sen and Siegel fits"""
+        da = self.define_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        x, y = raw.x.values, raw.values
+        for fit, func in [
+            ("theilsen", stats.theilslopes),
+            ("siegel", stats.siegelslopes),
+        ]:
+            self.plotter = self.plotter_cls(da, fit=fit, nboot=50)
+            data = self.plot_data
+            ref = func(y, x)
+            self.assertAlmostEqual(data.slope, ref.slope, msg=fit)
+            self.assertAlmostEqual(data.intercept, ref.intercept, msg=fit)
+            self.assertGreater(data.rsquared, 0.8)
+            self.assertEqual(data.shape[0], 3)
+            self.plotter.update(fix=1)
+            data = self.plot_data
+            self.assertEqual(data.intercept, 1)
+            self.assertAlmostEqual(
+                data.slope, np.median((y[1:] - 1) / x[1:]), msg=fit
+            )
+
+    def test_range_sums(self):
+        """Test the fits of x-ranges from cumulative sums"""
+        da = self.define_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        x, y = raw.x.values, raw.values
+        self.plotter = self.plotter_cls(da, ci=None)
+        fit_fmt = self.plotter.fit
+        for xmin, xmax in [(2, 5), (0, 10), (7.5, 8)]:
+            with mock.patch.object(
+                fit_fmt, "get_xy", wraps=fit_fmt.get_xy
+            ) as get_xy:
+                self.plotter.update(xrange=(xmin, xmax))
+                get_xy.assert_not_called()
+            mask = (x >= xmin) & (x <= xmax)
+            ref = sm.OLS(y[mask], sm.add_constant(x[mask])).fit()
+            data = self.plot_data
+            self.assertAlmostEqual(data.intercept, ref.params[0])
+            self.assertAlmostEqual(data.slope, ref.params[1])
+            self.assertAlmostEqual(data.slope_err, ref.bse[1])
+            self.assertAlmostEqual(data.rsquared, ref.rsquared)
+        # a restrictive yrange requires to mask the data
+        yrange = np.percentile(y, [10, 90])
+        with mock.patch.object(
+            fit_fmt, "get_xy", wraps=fit_fmt.get_xy
+        ) as get_xy:
+            self.plotter.update(yrange=yrange)
+            get_xy.assert_called()
+        mask = (x >= xmin) & (x <= xmax) & (y >= yrange[0])
+        mask &= y <= yrange[1]
+        ref = sm.OLS(y[mask], sm.add_constant(x[mask])).fit()
+        self.assertAlmostEqual(self.plot_data.slope, ref.params[1])
+        # in-place edits of the data renew the cumulative sums
+        self.plotter.update(yrange="minmax")
+        y = next(fit_fmt.iter_raw_data).values
+        edit = np.zeros(y.shape, dtype=bool)
+        edit[1::7] = True
+        edit[[y.argmin(), y.argmax()]] = False
+        y[edit] = y.mean()
+        self.plotter.update(xrange=(2, 8))
+        mask = (x >= 2) & (x <= 8)
+        ref = sm.OLS(y[mask], sm.add_constant(x[mask])).fit()
+        self.assertAlmostEqual(self.plot_data.slope, ref.params[1])
+
+    def test_rolling(self):
+        """Test the rolling fits with the settings of the fit"""
+        da = self.define_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        x, y = raw.x.values, raw.values
+        self.plotter = self.plotter_cls(da, fix=1, xrange=(2, 8), ci=None)
+        ret = self.plotter.fit.rolling(100)
+        self.assertEqual(ret.dims, ("parameter", "x"))
+        slope = ret.sel(parameter="slope")
+        first = ((x >= 2) & (x <= 8)).nonzero()[0][0]
+        self.assertTrue(np.isnan(slope[: first + 99]).all())
+        window = slice(first, first + 100)
+        ref = sm.OLS(y[window] - 1, x[window]).fit()
+        self.assertAlmostEqual(float(slope[first + 99]), ref.params[0])
+        # the rolling slopes can be visualized by psy-simple
+        plotter = psyps.LinePlotter(slope)
+        self.assertEqual(len(plotter.plot._plot), 1)
+        plt.close(plotter.ax.figure)
+        self.plotter.update(fit="poly2")
+        with self.assertRaises(ValueError):
+            self.plotter.fit.rolling(100)
+
+    def test_groupby(self):
+        """Test the separate fits of the groups of a coordinate"""
+        da = self.define_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        codes = np.arange(raw.size) % 3
+        labels = np.array(["a", "b", "c"])[codes]
+        raw = raw.assign_coords(grp=("x", labels))
+        if isinstance(da, psyd.InteractiveList):
+            da = psyd.InteractiveList([raw])
+        else:
+            da = raw
+        x, y = raw.x.values, raw.values
+        self.plotter = self.plotter_cls(
+            da, groupby="grp", legendlabels="%(grp)s", legend=True
+        )
+        self.assertEqual(len(self.plotter.plot_data), 3)
+        self.assertEqual(len(self.fit_plot_fmt._plot), 3)
+        texts = self.plotter.ax.get_legend().get_texts()
+        self.assertEqual([t.get_text() for t in texts], ["a", "b", "c"])
+        for j, arr in enumerate(self.plotter.plot_data):
+            ref = sm.OLS(y[codes == j], sm.add_constant(x[codes == j])).fit()
+            self.assertAlmostEqual(arr.attrs["slope"], ref.params[1])
+            self.assertAlmostEqual(arr.attrs["intercept"], ref.params[0])
+            self.assertEqual(arr.attrs["grp"], "abc"[j])
+            self.assertEqual(arr.shape, (3, 100))
+            self.assertTrue((arr[1] <= arr[0]).all())
+            self.assertTrue((arr[2] >= arr[0]).all())
+        self.plotter.update(fix=1)
+        for j, arr in enumerate(self.plotter.plot_data):
+            ref = sm.OLS(y[codes == j] - 1, x[codes == j]).fit()
+            self.assertAlmostEqual(arr.attrs["slope"], ref.params[0])
+        rcParams["plotter.linreg.ci.method"] = "analytic"
+        try:
+            self.plotter.update(ci=90, fix=None)
+        finally:
+            rcParams["plotter.linreg.ci.method"] = "bootstrap"
+        arr = self.plotter.plot_data[0]
+        ref = sm.OLS(y[codes == 0], sm.add_constant(x[codes == 0])).fit()
+        pred = ref.get_prediction(sm.add_constant(arr.x.values))
+        np.testing.assert_allclose(
+            arr[1:].values.T, pred.conf_int(alpha=0.1), rtol=1e-6
+        )
+        self.plotter.update(groupby=None)
+        self.assertEqual(self.plot_data.shape, (3, 100))
+        self.assertEqual(len(self.fit_plot_fmt._plot), 1)
+        with self.assertRaises(ValueError):
+            self.plotter.update(groupby="grp", fit="poly2")
+
+    def test_incremental(self):
+        """Test the fits of appended data"""
+        da = self.define_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+
+        def wrap(arr):
+            if isinstance(da, psyd.InteractiveList):
+                return psyd.InteractiveList([arr])
+            return arr
+
+        get_mask = psyreg.LinearRegressionFit.get_mask
+        changed = raw.copy()
+        # edit a data point that is not part of a regular sample of the data
+        changed[1] = raw[2]
+        rcParams["plotter.linreg.incremental"] = True
+        try:
+            for fit, fix in [("fit", None), ("fit", 1), ("poly2", None)]:
+                self.plotter = self.plotter_cls(
+                    wrap(raw[:300].copy()), fit=fit, fix=fix, ci=None
+                )
+                with mock.patch.object(
+                    psyreg.LinearRegressionFit,
+                    "get_mask",
+                    autospec=True,
+                    side_effect=get_mask,
+                ) as mask:
+                    # only the appended data and the end of the previous
+                    # data is hashed
+                    with mock.patch.object(
+                        psyreg, "_checksum", wraps=psyreg._checksum
+                    ) as checksum:
+                        self.plotter.data = wrap(raw.copy())
+                        self.plotter.update(replot=True)
+                    self.assertEqual(len(mask.call_args[0][2]), 200)
+                    self.assertTrue(checksum.called)
+                    for call in checksum.call_args_list:
+                        self.assertLessEqual(len(call[0][0]), 200)
+                    fit_fmt = self.plotter.fit
+                    arr = next(fit_fmt.iter_raw_data)
+                    self.assertEqual(
+                        fit_fmt._states[0]["data"],
+                        psyreg._data_fingerprint(arr.variable, arr.x.variable),
+                    )
+                    # any other change requires a complete refit
+                    self.plotter.data = wrap(changed.copy())
+                    self.plotter.update(replot=True)
+                    self.assertEqual(len(mask.call_args[0][2]), 500)
+                data = self.plot_data
+                rcParams["plotter.linreg.incremental"] = False
+                self.plotter = self.plotter_cls(
+                    wrap(changed), fit=fit, fix=fix, ci=None
+                )
+                rcParams["plotter.linreg.incremental"] = True
+                ref = self.plot_data
+                for key in ["slope", "intercept", "slope_err", "c1", "c2"]:
+                    if key in ref.attrs:
+                        self.assertAlmostEqual(data.attrs[key], ref.attrs[key])
+                np.testing.assert_allclose(data.values, ref.values)
+            model = MeanModel()
+            self.plotter = self.plotter_cls(
+                wrap(raw[:300].copy()), fit=model, ci=None
+            )
+            self.plotter.data = wrap(raw.copy())
+            self.plotter.update(replot=True)
+        finally:
+            rcParams["plotter.linreg.incremental"] = False
+        fitted = self.plotter.fit.fits[0]
+        self.assertIsNot(fitted, model)
+        self.assertEqual(fitted.n, 500)
+        np.testing.assert_allclose(self.plot_data.values, raw.values.mean())
+
+    def test_compress(self):
+        """Test the fits of unique points of quantized data"""
+        da = self.define_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        raw = raw.copy(data=np.round(raw.values)).assign_coords(
+            x=np.round(raw.x.values)
+        )
+        if isinstance(da, psyd.InteractiveList):
+            da = psyd.InteractiveList([raw])
+        else:
+            da = raw
+        for fit, fix in [("fit", None), ("fit", 1), ("poly2", None)]:
+            self.plotter = self.plotter_cls(da, fit=fit, fix=fix, nboot=200)
+            ref = self.plot_data.copy()
+            rcParams["plotter.linreg.compress"] = True
+            try:
+                with mock.patch.object(
+                    psyreg, "unique_points", wraps=psyreg.unique_points
+                ) as unique:
+                    self.plotter.update(force=["fit"])
+                    unique.assert_called()
+                fit_fmt = self.plotter.fit
+                self.assertTrue(fit_fmt.compresses(0))
+                x, xname, y, yname, weights = fit_fmt.get_xy(
+                    0, raw, weighted=True
+                )
+            finally:
+                rcParams["plotter.linreg.compress"] = False
+            self.assertLess(len(x), raw.size)
+            self.assertEqual(weights.sum(), raw.size)
+            data = self.plot_data
+            for key in set(ref.attrs).intersection(
+                ["slope", "intercept", "slope_err", "rsquared", "c1", "c2"]
+            ):
+                self.assertAlmostEqual(data.attrs[key], ref.attrs[key])
+            np.testing.assert_allclose(data[0].values, ref[0].values)
+            # the multinomial resamples differ from the ones of all points
+            np.testing.assert_allclose(
+                data[2] - data[1], ref[2] - ref[1], rtol=0.5
+            )
+            plt.close(self.plotter.ax.figure)
+
+    def test_robust_engine(self):
+        """Test whether the numpy robust fit equals the one of statsmodels"""
+        self.plotter = self.plotter_cls(self.define_data(), fit="robust")
+        data = self.plot_data
+        self.assertIsInstance(self.plotter.fit.fits[0], RobustFitResults)
+        rcParams["plotter.linreg.robust.engine"] = "statsmodels"
+        try:
+            self.plotter.update(ci=None)
+        finally:
+            rcParams["plotter.linreg.robust.engine"] = "irls"
+        ref = self.plot_data
+        self.assertNotIsInstance(self.plotter.fit.fits[0], RobustFitResults)
+        for key in ["slope", "intercept", "slope_err", "intercept_err"]:
+            self.assertAlmostEqual(data.attrs[key], ref.attrs[key], msg=key)
+        np.testing.assert_allclose(data[0].values, ref.values)
+        # the bootstrap uses the engine of the fit as well
+        rcParams["plotter.linreg.robust.engine"] = "statsmodels"
+        try:
+            with (
+                mock.patch.object(
+                    psyreg, "robust_bootstrap", wraps=psyreg.robust_bootstrap
+                ) as bootstrap,
+                mock.patch.object(psyreg.sm, "RLM", wraps=sm.RLM) as rlm,
+            ):
+                self.plotter.update(ci=95, nboot=20)
+        finally:
+            rcParams["plotter.linreg.robust.engine"] = "irls"
+        bootstrap.assert_not_called()
+        self.assertGreaterEqual(rlm.call_count, 20)
+        boot = self.plot_data
+        self.assertEqual(boot.shape[0], 3)
+        self.assertTrue((boot[1] <= boot[2]).all())
+
+    def test_dask(self):
+        """Test whether dask arrays are fitted without loading them"""
+        da = self.define_data()
+        raw = da if not isinstance(da, psyd.InteractiveList) else da[0]
+        lazy = raw.chunk({"x": 77})
+        if isinstance(da, psyd.InteractiveList):
+            lazy = psyd.InteractiveList([lazy])
+        for fit in ["fit", "poly2"]:
+            self.plotter = self.plotter_cls(da, fit=fit, ci=None, fix=1)
+            ref = self.plot_data
+            with mock.patch.object(
+                psyreg.LinearRegressionFit,
+                "make_fit",
+                autospec=True,
+                side_effect=psyreg.LinearRegressionFit.make_fit,
+            ) as make_fit:
+                self.plotter = self.plotter_cls(lazy, fit=fit, ci=None, fix=1)
+            # the data has not been loaded into memory
+            self.assertTrue(is_dask_array(make_fit.call_args[0][3]))
+            data = self.plot_data
+            np.testing.assert_allclose(data.values, ref.values)
+            self.assertAlmostEqual(data.rsquared, ref.rsquared)
+            # the analytic confidence interval only counts the data points
+            self.plotter.update(ci=None, fix=None)
+            rcParams["plotter.linreg.ci.method"] = "analytic"
+            try:
+                with mock.patch.object(
+                    psyreg.LinearRegressionFit,
+                    "get_xy",
+                    autospec=True,
+                    side_effect=psyreg.LinearRegressionFit.get_xy,
+                ) as get_xy:
+                    self.plotter.update(ci=90)
+            finally:
+                rcParams["plotter.linreg.ci.method"] = "bootstrap"
+            for call in get_xy.call_args_list:
+                self.assertTrue(call[1].get("lazy"))
+            self.assertEqual(
+                self.plotter.fit.get_nobs(0, raw), raw.notnull().sum()
+            )
+            self.assertEqual(self.plot_data.shape[0], 3)
+
     def test_curve_fit(self):
         """Testing the fit of a polynom"""
 
@@ -257,11 +679,124 @@ class LinRegPlotterTest(unittest.TestCase):
         self.plotter.update(param_bounds=[-1, 2])
         self.assertIsNotNone(self.plotter.p0.p0())
 
+    def test_curve_fit_model(self):
+        """Test whether the model for a callable is created only once"""
+        da, func = self.define_curve_data()
+        self.plotter = plotter = self.plotter_cls(
+            da, fit=parabola, p0=[[1.0]], ci=None
+        )
+        model = plotter.fit.model
+        plotter.update(fit=parabola, p0=[[2.0]])
+        self.assertIs(plotter.fit.model, model)
+        self.assertIs(pickle.loads(pickle.dumps(model)), model)
+        fit = pickle.loads(pickle.dumps(plotter.fit.fits[0]))
+        self.assertEqual(fit.params, plotter.fit.fits[0].params)
+
+    def test_curve_fit_p0_once(self):
+        """Test whether p0 is estimated only once for the bootstrap"""
+        da, func = self.define_curve_data()
+        CountingModel.calls = 0
+        self.plotter = self.plotter_cls(
+            da, fit=CountingModel, param_bounds=[(0, 2)], nboot=20
+        )
+        self.assertEqual(CountingModel.calls, 1)
+        self.assertEqual(self.plot_data.shape[0], 3)
+
     def test_poly(self):
         """Testing the fit of a polynom"""
         da, deg = self.define_poly_data()
         self.plotter = self.plotter_cls(da, fit="poly%i" % deg)
 
+    def test_lowess(self):
+        """Test the LOWESS fit and its confidence intervals"""
+        da, deg = self.define_poly_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        self.plotter = self.plotter_cls(da, fit="lowess", nboot=300)
+        data = self.plot_data
+        ref = algos.LowessFit(raw.x.values, raw.values)
+        x_line = data.coords[data.dims[-1]].values
+        np.testing.assert_allclose(data[0], ref.predict(x_line))
+        self.assertAlmostEqual(data.attrs["rsquared"], ref.rsquared)
+        boot_width = (data[2] - data[1]).values
+        rcParams["plotter.linreg.ci.method"] = "analytic"
+        try:
+            self.plotter.update(ci=95, force=["ci"])
+        finally:
+            rcParams["plotter.linreg.ci.method"] = "bootstrap"
+        data = self.plot_data
+        np.testing.assert_allclose(
+            data[2] - data[0], data[0] - data[1], rtol=1e-6
+        )
+        # the noise of the test data is heteroscedastic
+        self.assertAlmostEqual(
+            float((data[2] - data[1]).mean()) / boot_width.mean(), 1, delta=0.5
+        )
+
+    def test_spline(self):
+        """Test the smoothing spline fit and its confidence interval"""
+        da, deg = self.define_poly_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        self.plotter = self.plotter_cls(da, fit="spline", nboot=100)
+        data = self.plot_data
+        ref = algos.SmoothingSpline(raw.x.values, raw.values, bins=200)
+        x_line = data.coords[data.dims[-1]].values
+        np.testing.assert_allclose(data[0], ref.predict(x_line))
+        self.assertAlmostEqual(data.attrs["lam"], ref.lam)
+        self.assertAlmostEqual(data.attrs["rsquared"], ref.rsquared)
+        self.assertTrue((data[1] <= data[2]).all())
+        self.plotter.update(fit="spline0.5")
+        self.assertEqual(self.plot_data.attrs["lam"], 0.5)
+
+    def test_poly_auto(self):
+        """Test the polynomial fit with an automatically selected degree"""
+        da, deg = self.define_poly_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        self.plotter = self.plotter_cls(da, fit="poly_auto4", nboot=100)
+        data = self.plot_data
+        ref = algos.polyfit_auto(raw.x.values, raw.values, max_deg=4)
+        x_line = data.coords[data.dims[-1]].values
+        np.testing.assert_allclose(data[0], ref.predict(x_line))
+        self.assertEqual(data.attrs["degree"], ref.deg)
+        self.assertEqual(len(data.attrs["bic"]), 5)
+        self.assertTrue((data[1] <= data[2]).all())
+        rcParams["plotter.linreg.ci.method"] = "analytic"
+        rcParams["plotter.linreg.poly_auto.criterion"] = "press"
+        try:
+            self.plotter.update(fit="poly_auto")
+        finally:
+            rcParams["plotter.linreg.ci.method"] = "bootstrap"
+            rcParams["plotter.linreg.poly_auto.criterion"] = "bic"
+        data = self.plot_data
+        self.assertEqual(data.attrs["criterion"], "press")
+        self.assertEqual(len(data.attrs["press"]), 7)
+        np.testing.assert_allclose(
+            data[2] - data[0], data[0] - data[1], rtol=1e-6
+        )
+
+    def test_segmented(self):
+        """Test the segmented fit and its confidence interval"""
+        da, deg = self.define_poly_data()
+        raw = da[0] if isinstance(da, psyd.InteractiveList) else da
+        self.plotter = self.plotter_cls(da, fit="segmented", nboot=100)
+        data = self.plot_data
+        ref = algos.segmented(raw.x.values, raw.values)
+        x_line = data.coords[data.dims[-1]].values
+        np.testing.assert_allclose(data[0], ref.predict(x_line))
+        for key, val in ref.attrs.items():
+            self.assertAlmostEqual(data.attrs[key], val, msg=key)
+        self.assertTrue((data[1] <= data[2]).all())
+        rcParams["plotter.linreg.ci.method"] = "analytic"
+        try:
+            self.plotter.update(fit="segmented2")
+        finally:
+            rcParams["plotter.linreg.ci.method"] = "bootstrap"
+        data = self.plot_data
+        self.assertIn("breakpoint1", data.attrs)
+        self.assertIn("slope2_err", data.attrs)
+        np.testing.assert_allclose(
+            data[2] - data[0], data[0] - data[1], rtol=1e-6
+        )
+
     def test_2fits(self):
         """Test 2 different fits"""
         sequence = self.define_data()
@@ -345,6 +880,64 @@ class LinRegPlotterTest(unittest.TestCase):
         self.assertEqual(plot_fmt._plot[-1].get_xdata().min(), vmin)
         self.assertEqual(plot_fmt._plot[-1].get_xdata().max(), vmax)
 
+    def test_line_xlim_no_refit(self):
+        """Test whether changing the line_xlim does not fit the data again"""
+        self.test_nonfixed_fit()
+        fit_fmt = self.plotter.fit
+        with (
+            mock.patch.object(
+                fit_fmt, "make_fit", wraps=fit_fmt.make_fit
+            ) as make_fit,
+            mock.patch.object(
+                fit_fmt, "get_xy", wraps=fit_fmt.get_xy
+            ) as get_xy,
+        ):
+            self.plotter.update(line_xlim=(-5, 5))
+            make_fit.assert_not_called()
+            get_xy.assert_not_called()
+            data = self.plot_data
+            self.plotter.update(fit="robust")
+            make_fit.assert_called()
+        x = data.coords[data.dims[-1]].values
+        self.assertEqual(x.min(), -5)
+        self.assertEqual(x.max(), 5)
+        np.testing.assert_allclose(
+            data[0].values, data.intercept + data.slope * x
+        )
+
+    def test_state_inplace_edit(self):
+        """Test whether an in-place edit of the data invalidates the fit"""
+        da, deg = self.define_poly_data()
+        self.plotter = self.plotter_cls(da, fit="poly1", ci=None)
+        raw = next(self.plotter.fit.iter_raw_data)
+        y = raw.values
+        # change data points that are not part of a regular sample of the
+        # data, but keep the data range (and therefore the yrange)
+        edit = np.zeros(y.shape, dtype=bool)
+        edit[1::7] = True
+        edit[[y.argmin(), y.argmax()]] = False
+        y[edit] = y.mean()
+        self.plotter.update(line_xlim=(-5, 5))
+        ref = np.polyfit(raw.x.values, y, 1)
+        self.assertAlmostEqual(self.plot_data.attrs["c1"], ref[0])
+
+    def test_state_fingerprint(self):
+        """Test whether an update hashes the data only once"""
+        da = self.define_data()
+        for fit in ["fit", "poly2"]:
+            self.plotter = self.plotter_cls(da, fit=fit, ci=None)
+            with mock.patch.object(
+                psyreg, "_data_fingerprint", wraps=psyreg._data_fingerprint
+            ) as fingerprint:
+                self.plotter.update(line_xlim=(-5, 5))
+            self.assertEqual(fingerprint.call_count, 1)
+            # a new window of the cumulative sums
+            with mock.patch.object(
+                psyreg, "_data_fingerprint", wraps=psyreg._data_fingerprint
+            ) as fingerprint:
+                self.plotter.update(xrange=(2, 8))
+            self.assertEqual(fingerprint.call_count, 1)
+
     def test_line_xlim_2(self):
         """Test the line_xlim with two arrays"""
         sequence = self.define_data()
@@ -355,6 +948,64 @@ class LinRegPlotterTest(unittest.TestCase):
         self.assertEqual(plotter.plot_data[1].x.min().values, 5)
         self.assertEqual(plotter.plot_data[1].x.max().values, 10)
 
+    def test_batch(self):
+        """Test the batched fits of several arrays"""
+        sequence = self.define_data()
+        for i in range(3):
+            sequence.append(self.define_data()[0], new_name=True)
+        rcParams["plotter.linreg.bootstrap.random_seed"] = 42
+        try:
+            for fit in ["fit", "robust", "poly2"]:
+                with mock.patch.object(
+                    psyreg.LinearRegressionFit,
+                    "make_fit",
+                    autospec=True,
+                    side_effect=psyreg.LinearRegressionFit.make_fit,
+                ) as make_fit:
+                    plotter = self.plotter_cls(
+                        sequence, fit=fit, fix=[None, [0, 1]], nboot=50
+                    )
+                # the linear and polynomial fits and their bootstrap are
+                # computed without make_fit
+                if fit != "robust":
+                    make_fit.assert_not_called()
+                for i, arr in enumerate(sequence):
+                    ref = self.plotter_cls(
+                        arr.psy.copy(True),
+                        fit=fit,
+                        fix=[None, 1][i % 2],
+                        nboot=50,
+                    )
+                    np.testing.assert_allclose(
+                        plotter.plot_data[i].values, ref.plot_data.values
+                    )
+                    for key in ["rsquared", "slope", "intercept", "c2"]:
+                        if key in ref.plot_data.attrs:
+                            self.assertAlmostEqual(
+                                plotter.plot_data[i].attrs[key],
+                                ref.plot_data.attrs[key],
+                            )
+        finally:
+            rcParams["plotter.linreg.bootstrap.random_seed"] = None
+
+    def test_batch_range_sums(self):
+        """Test the precedence of the batched fits and the cumulative sums"""
+        sequence = self.define_data()
+        sequence.append(self.define_data()[0], new_name=True)
+        with mock.patch.object(
+            algos.LinearSums, "batch", side_effect=algos.LinearSums.batch
+        ) as batch:
+            plotter = self.plotter_cls(sequence, ci=None)
+            # without a window, the monotonic arrays are fitted in a batch
+            batch.assert_called_once()
+            batch.reset_mock()
+            plotter.update(xrange=(2, 8))
+            batch.assert_not_called()
+        for i, arr in enumerate(sequence):
+            mask = (arr.x >= 2) & (arr.x <= 8)
+            ref = np.polyfit(arr.x[mask], arr[mask], 1)
+            self.assertAlmostEqual(plotter.plot_data[i].attrs["slope"], ref[0])
+
 
 class SingleLinRegPlotterTest(LinRegPlotterTest):
     """Test the :class:`psyplot.plotter.linreg.LinRegPlotter` with a single
@@ -392,6 +1043,14 @@ class SingleLinRegPlotterTest(LinRegPlotterTest):
     def test_2fits(self):
         pass
 
+    @unittest.skip("No need for two arrays")
+    def test_batch(self):
+        pass
+
+    @unittest.skip("No need for two arrays")
+    def test_batch_range_sums(self):
+        pass
+
 
 class DensityRegPlotterTest(unittest.TestCase):
     """Test whether the plot works in combination with the
@@ -498,6 +1157,81 @@ class DensityRegPlotterTestFits(SingleLinRegPlotterTest):
     def fit_plot_fmt(self):
         return self.plotter.lineplot
 
+    def test_groupby(self):
+        """Test that grouped fits are not supported"""
+        da = self.define_data()
+        da = da.assign_coords(grp=("x", np.arange(da.size) % 3))
+        with self.assertRaises(ValueError):
+            self.plotter = self.plotter_cls(da, groupby="grp")
+
+    def test_binned(self):
+        """Test the fit of the weighted cells of the histogram"""
+        da = self.define_data()
+        for fit, params in [("fit", ["intercept", "slope"]), ("poly2", [])]:
+            if not params:
+                params = ["c0", "c1", "c2"]
+            self.plotter = self.plotter_cls(da, fit=fit, bins=50, nboot=50)
+            ref = self.plot_data.copy()
+            self.plotter.update(binned=True)
+            fit_fmt = self.plotter.fit
+            self.assertTrue(fit_fmt.compresses(0))
+            x, xname, y, yname, weights = fit_fmt.get_xy(0, da, weighted=True)
+            self.assertLess(len(x), da.size)
+            self.assertEqual(weights.sum(), da.size)
+            data = self.plot_data
+            self.assertEqual(data.shape, ref.shape)
+            for param in params:
+                self.assertAlmostEqual(
+                    data.attrs[param], ref.attrs[param], delta=0.1
+                )
+            np.testing.assert_allclose(data.values, ref.values, atol=0.5)
+            plt.close(self.plotter.ax.figure)
+
+    def test_binned_robust(self):
+        """Test whether robust fits ignore the binned formatoption"""
+        da = self.define_data()
+        self.plotter = self.plotter_cls(da, fit="robust", binned=True, ci=None)
+        self.assertFalse(self.plotter.fit.compresses(0))
+        self.assertIsNone(self.plotter.fit.get_xy(0, da, weighted=True)[-1])
+
+    def test_binned_methods(self):
+        """Test which fit methods fit the binned data"""
+        da = self.define_data()
+        self.plotter = self.plotter_cls(da, binned=True, ci=None)
+        fit_fmt = self.plotter.fit
+        for fit in ["fit", "poly2", "poly_auto", "lowess", "segmented"]:
+            self.plotter.update(fit=fit)
+            self.assertTrue(fit_fmt.compresses(0), msg=fit)
+        for fit in ["robust", "theilsen"]:
+            self.plotter.update(fit=fit)
+            self.assertFalse(fit_fmt.compresses(0), msg=fit)
+
+
+class FitMapPlotterTest(unittest.TestCase):
+    """Test the :class:`psy_reg.plotters.FitMapPlotter`"""
+
+    def tearDown(self):
+        plt.close("all")
+
+    def test_plot(self):
+        """Test the visualization of the fitted parameters"""
+        rs = np.random.RandomState(42)
+        t = np.arange(30.0)
+        slope = rs.rand(4, 5)
+        y = 2 + slope[np.newaxis] * t[:, np.newaxis, np.newaxis]
+        da = xr.DataArray(
+            y + rs.randn(30, 4, 5) * 0.01,
+            dims=("time", "lat", "lon"),
+            coords={"time": t, "lat": np.arange(4.0), "lon": np.arange(5.0)},
+            name="tas",
+        )
+        plotter = psyreg.FitMapPlotter(da)
+        self.assertEqual(plotter.plot_data.dims, ("lat", "lon"))
+        np.testing.assert_allclose(plotter.plot_data.values, slope, atol=1e-3)
+        plotter.update(fit_param="c2", fit="poly2")
+        self.assertEqual(plotter.plot_data.name, "c2")
+        np.testing.assert_allclose(plotter.plot_data.values, 0, atol=1e-3)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,104 @@
+"""Test file for the utility functions of psy-reg."""
+
+# SPDX-FileCopyrightText: 2021-2024 Helmholtz-Zentrum hereon GmbH
+# SPDX-FileCopyrightText: 2020-2021 Helmholtz-Zentrum Geesthacht
+# SPDX-FileCopyrightText: 2016-2024 University of Lausanne
+#
+# SPDX-License-Identifier: LGPL-3.0-only
+
+import functools
+import gc
+import math
+import unittest
+import weakref
+
+import numpy as np
+
+from psy_reg.utils import SquaredErrors, function_model
+
+
+def exponential(x, a, b):
+    return a * np.exp(b * x)
+
+
+def scalar_exponential(x, a, b):
+    return np.array([a * math.exp(b * xi) for xi in x])
+
+
+class EstimateP0Test(unittest.TestCase):
+    """Test the :meth:`psy_reg.utils.GenericModel.estimate_p0` method"""
+
+    bounds = [(0, 5), (-2, 2)]
+
+    def setUp(self):
+        rs = np.random.RandomState(42)
+        self.x = np.linspace(0, 2, 20000)
+        self.y = exponential(self.x, 2, 0.5) + rs.randn(len(self.x)) * 0.01
+
+    def test_vectorized(self):
+        """Test the estimation with a function that broadcasts"""
+        objective = SquaredErrors(exponential, self.x, self.y)
+        self.assertTrue(objective.is_vectorized(self.bounds))
+        model = function_model(exponential)
+        p0 = model.estimate_p0(self.x, self.y, self.bounds, max_samples=500)
+        np.testing.assert_allclose(p0, [2, 0.5], rtol=1e-2)
+
+    def test_scalar(self):
+        """Test the estimation with a function that does not broadcast"""
+        x, y = self.x[::100], self.y[::100]
+        objective = SquaredErrors(scalar_exponential, x, y)
+        self.assertFalse(objective.is_vectorized(self.bounds))
+        model = function_model(scalar_exponential)
+        p0 = model.estimate_p0(x, y, self.bounds, maxfev=3000)
+        np.testing.assert_allclose(p0, [2, 0.5], rtol=1e-2)
+
+    def test_reproducible(self):
+        """Test whether the estimate does not depend on the global state"""
+        model = function_model(exponential)
+        state = np.random.get_state()
+        p0 = model.estimate_p0(self.x, self.y, self.bounds, max_samples=500)
+        after = np.random.get_state()
+        np.testing.assert_array_equal(state[1], after[1])
+        self.assertEqual(state[2], after[2])
+        np.random.seed(1)
+        ref = model.estimate_p0(self.x, self.y, self.bounds, max_samples=500)
+        np.testing.assert_array_equal(p0, ref)
+
+
+class FunctionModelTest(unittest.TestCase):
+    """Test the :func:`psy_reg.utils.function_model` function"""
+
+    def test_cache(self):
+        """Test whether the models are cached without leaking functions"""
+
+        def func(x, a):
+            return a * x
+
+        model = function_model(func)
+        self.assertIs(function_model(func), model)
+        self.assertIs(model.function, func)
+        self.assertIsNot(function_model(lambda x, a: a * x), model)
+        ref = weakref.ref(func)
+        del func, model
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_callables(self):
+        """Test the models of callables that do not accept attributes"""
+
+        class Slotted:
+            __slots__ = ()
+
+            def __call__(self, x, a):
+                return a * x
+
+        func = functools.partial(np.multiply, 2.0)
+        model = function_model(func)
+        self.assertIs(function_model(func), model)
+        self.assertFalse(hasattr(func, "_psy_reg_model"))
+        for func in [Slotted(), np.multiply, max]:
+            self.assertIs(function_model(func).function, func)
+
+
+if __name__ == "__main__":
+    unittest.main()